@@ -26,6 +26,7 @@ to one single stack file, ...).
 
 import sys
 import os
+import multiprocessing
 import time
 import re
 import tempfile
@@ -36,7 +37,7 @@ import tifffile as tf
 import qimage2ndarray
 ## Colored stdout, custom Qt functions (mostly to handle events), CSV handler
 ## and correlation algorithm
-from tdct import clrmsg, TDCT_debug, QtCustom, csvHandler, correlation
+from tdct import clrmsg, TDCT_debug, QtCustom, csvHandler, correlation, tiffMetadata
 from tools3dct.find_beads import find_beads_GUI
 from tools3dct.predict_FIB import predict_FIB_GUI
 
@@ -124,7 +125,7 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         self.layer1CustomColor_left = [255,0,255]
         self.layer2CustomColor_left = [255,0,255]
         self.layer3CustomColor_left = [255,0,255]
-        self.img_left_overlay = None
+        self.overlay_item_left = None
         # self.img_left_layer1 = None
         self.img_left_layer2 = None
         self.imgstack_left_layer2 = None
@@ -149,12 +150,29 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         self.layer1CustomColor_right = [255,0,255]
         self.layer2CustomColor_right = [255,0,255]
         self.layer3CustomColor_right = [255,0,255]
-        self.img_right_overlay = None
+        self.overlay_item_right = None
         # self.img_right_layer1 = None
         self.img_right_layer2 = None
         self.imgstack_right_layer2 = None
         self.img_right_layer3 = None
         self.imgstack_right_layer3 = None
+        ## Background image loading (see QtCustom.ImageLoader), progress is shown in the status bar
+        self.imageLoader_left = None
+        self.imageLoader_right = None
+        self.sceneLeft_previous = None
+        self.sceneRight_previous = None
+        self.imageStateLeft_previous = None
+        self.imageStateRight_previous = None
+        self.label_loadImage = QtWidgets.QLabel(self)
+        self.progressBar_loadImage = QtWidgets.QProgressBar(self)
+        self.progressBar_loadImage.setMaximumWidth(200)
+        self.toolButton_cancelLoadImage = QtWidgets.QToolButton(self)
+        self.toolButton_cancelLoadImage.setText('Cancel')
+        self.toolButton_cancelLoadImage.clicked.connect(self.cancelImageLoading)
+        self.statusbar.addWidget(self.label_loadImage)
+        self.statusbar.addPermanentWidget(self.progressBar_loadImage)
+        self.statusbar.addPermanentWidget(self.toolButton_cancelLoadImage)
+        self.imageLoaderCtrl()
         ## Initialize Images and connect image load buttons
         self.toolButton_loadLeftImage.clicked.connect(self.openImageLeft)
         self.toolButton_loadRightImage.clicked.connect(self.openImageRight)
@@ -168,6 +186,17 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         ## connect item change signal to write changes in model back to QGraphicItems as well as highlighting selected points
         self.modelLleft.itemChanged.connect(self.tableView_left.updateItems)
         self.modelRight.itemChanged.connect(self.tableView_right.updateItems)
+        ## Re-correlate after marker edits, warm-started from the last correlation. A marker move changes several
+        ## cells, the single shot timer runs recorrelate once after all of them.
+        self.correlationWarmStart = correlation.WarmStart()
+        self.correlation_live = None
+        self.correlation_markers = None
+        self.recorrelateTimer = QtCore.QTimer(self)
+        self.recorrelateTimer.setSingleShot(True)
+        self.recorrelateTimer.timeout.connect(self.recorrelate)
+        for model in [self.modelLleft, self.modelRight]:
+            model.itemChanged.connect(lambda: self.recorrelateTimer.start(0) if self.correlation_live else None)
+            model.rowsRemoved.connect(lambda: self.recorrelateTimer.start(0) if self.correlation_live else None)
         self.tableView_left.selectionModel().selectionChanged.connect(self.tableView_left.showSelectedItem)
         self.tableView_right.selectionModel().selectionChanged.connect(self.tableView_right.showSelectedItem)
         self.tableView_results.selectionModel().selectionChanged.connect(self.showSelectedResidual)
@@ -197,6 +226,8 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         self.comboBox_channelColorLayer1.currentIndexChanged.connect(self.changeColorChannel)
         self.comboBox_channelColorLayer2.currentIndexChanged.connect(self.changeColorChannel)
         self.comboBox_channelColorLayer3.currentIndexChanged.connect(self.changeColorChannel)
+        self.comboBox_overlayProjection.currentIndexChanged.connect(
+            lambda: self.spinBox_overlaySlab.setEnabled(self.comboBox_overlayProjection.currentText() == 'slab'))
 
         ## Radiobuttons
         self.radioButton_layer1.clicked.connect(self.setSliders)
@@ -263,6 +294,10 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         quit_msg = "Are you sure you want to exit the\n3DCT Correlation?\n\nUnsaved data will be lost!"
         reply = QtWidgets.QMessageBox.question(self, 'Message', quit_msg, QtWidgets.QMessageBox.Yes, QtWidgets.QMessageBox.No)
         if reply == QtWidgets.QMessageBox.Yes:
+            ## Stop loading images in the background
+            for loader in [self.imageLoader_left, self.imageLoader_right]:
+                if loader is not None:
+                    self.stopImageLoader(loader)
             event.accept()
             if self.parent:
                 self.parent.cleanUp()
@@ -345,8 +380,9 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                 else:
                     self.label_imagetype.setText('(3D)')
                     self.widget_sliceSelector.setVisible(True)
-                self.ctrlEnDisAble(True)
-                if self.mipCHKbox_left is False:
+                ## Image controls stay disabled while the image is loading
+                self.ctrlEnDisAble(not self.sceneLeft.loading)
+                if self.mipCHKbox_left is False and not self.sceneLeft.loading:
                     self.spinBox_slice.setEnabled(True)
             elif self.currentFocusedWidgetName == 'graphicsView_right':
                 self.borderControl(current)
@@ -360,8 +396,9 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                 else:
                     self.label_imagetype.setText('(3D)')
                     self.widget_sliceSelector.setVisible(True)
-                self.ctrlEnDisAble(True)
-                if self.mipCHKbox_right is False:
+                ## Image controls stay disabled while the image is loading
+                self.ctrlEnDisAble(not self.sceneRight.loading)
+                if self.mipCHKbox_right is False and not self.sceneRight.loading:
                     self.spinBox_slice.setEnabled(True)
 
         ## Label showing selected table
@@ -625,6 +662,13 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                                                 #################### START ####################
     def initImageLeft(self):
         if self.leftImage is not None:
+            if self.imageLoader_left is not None:
+                ## Another image is still loading. Stop it, the scene to fall back to on cancel stays the same.
+                self.stopImageLoader(self.imageLoader_left)
+            else:
+                ## Keep the current scene until the new image is loaded, so loading can be cancelled
+                self.sceneLeft_previous = getattr(self, 'sceneLeft', None)
+                self.transformLeft_previous = self.graphicsView_left.transform()
             ## Changed GraphicsSceneLeft(self) to QtCustom.QGraphicsSceneCustom(self.graphicsView_left) to reuse class for both scenes
             self.sceneLeft = QtCustom.QGraphicsSceneCustom(self.graphicsView_left,mainWidget=self,side='left',model=self.modelLleft)
             ## set pen color yellow
@@ -636,42 +680,42 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                 print(clrmsg.WARNING, e)
                 pass
             QtWidgets.QApplication.processEvents()
-            ## Get pixel size
-            self.sceneLeft.pixelSize = self.pxSize(self.leftImage)
+            ## Placeholder properties until the preview and image are loaded
+            self.sceneLeft.loading = True
+            self.sceneLeft.pixelSize = None
             self.sceneLeft.pixelSizeUnit = 'um'
-            ## Load image, assign it to scene and store image type information
-            self.img_left_layer1,self.sceneLeft.imagetype,self.imgstack_left_layer1 = self.imread(self.leftImage)
-            self.img_left_displayed_layer1 = np.copy(self.img_left_layer1)
-            self.img_adj_left_layer1 = np.copy(self.img_left_layer1)
-            ## Set slice spinbox maximum
-            if self.imgstack_left_layer1 is not None:
-                self.spinBox_slice.setValue(0)
-                self.slice_left = 0
-                self.spinBox_slice.setMaximum(self.imgstack_left_layer1.shape[0]-1)
-            ## link image to QTableview for determining z
-            self.tableView_left.img1 = self.imgstack_left_layer1
-            self.tableView_left.img2 = self.imgstack_left_layer2
-            self.tableView_left.img3 = self.imgstack_left_layer3
-            ## check if coloring z values in table is needed (correlation needs z=0 in 2D image, so no checking for valid z
-            ## with 2D images needed)
-            if self.imgstack_left_layer1 is None:
-                self.sceneLeft._z = False
-            else:
-                self.sceneLeft._z = True
-                self.setCustomRotCenter(max(self.imgstack_left_layer1.shape))
-            # self.pixmap_left = QtGui.QPixmap(self.leftImage)
-            self.pixmap_left = self.cv2Qimage(self.img_left_displayed_layer1)
-            self.pixmap_item_left = self.sceneLeft.addPixmap(self.pixmap_left)
+            self.sceneLeft.imagetype = 21
+            self.sceneLeft.imagetype_layer2 = None
+            self.sceneLeft.imagetype_layer3 = None
+            self.sceneLeft._z = False
+            ## Empty pixmap item as background, filled with the preview once available (see previewImageLeft/Right)
+            self.sceneLeft.previewItem = self.sceneLeft.addPixmap(QtGui.QPixmap())
+            self.sceneLeft.previewItem.setZValue(-10)
             ## connect scenes to GUI elements
             self.graphicsView_left.setScene(self.sceneLeft)
-            ## reset scaling (needed for reinitialization)
-            self.graphicsView_left.resetTransform()
-            ## scaling scene, not image
-            scaling_factor = float(self.size)/max(self.pixmap_left.width(), self.pixmap_left.height())
-            self.graphicsView_left.scale(scaling_factor,scaling_factor)
+            ## No image data for z determination until loaded
+            self.tableView_left.img1 = None
+            self.tableView_left.img2 = None
+            self.tableView_left.img3 = None
+            ## Load image in a worker thread. A downsampled preview is displayed first (previewImageLeft), the image data is
+            ## set up once the whole file is read (initImageLeftFinished).
+            self.imageLoader_left = QtCustom.ImageLoader(self.leftImage, self.imread, self.pxSize)
+            self.imageLoader_left.signals.progress.connect(self.imageLoaderProgress)
+            self.imageLoader_left.signals.preview.connect(self.previewImageLeft)
+            self.imageLoader_left.signals.finished.connect(self.initImageLeftFinished)
+            self.imageLoader_left.signals.cancelled.connect(self.imageLoaderCancelledLeft)
+            self.imageLoaderCtrl()
+            QtCore.QThreadPool.globalInstance().start(self.imageLoader_left)
 
     def initImageRight(self):
         if self.rightImage is not None:
+            if self.imageLoader_right is not None:
+                ## Another image is still loading. Stop it, the scene to fall back to on cancel stays the same.
+                self.stopImageLoader(self.imageLoader_right)
+            else:
+                ## Keep the current scene until the new image is loaded, so loading can be cancelled
+                self.sceneRight_previous = getattr(self, 'sceneRight', None)
+                self.transformRight_previous = self.graphicsView_right.transform()
             self.sceneRight = QtCustom.QGraphicsSceneCustom(self.graphicsView_right,mainWidget=self,side='right',model=self.modelRight)
             ## set pen color yellow
             self.sceneRight.pen = QtGui.QPen(QtCore.Qt.yellow)
@@ -682,39 +726,256 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                 print(clrmsg.WARNING, e)
                 pass
             QtWidgets.QApplication.processEvents()
-            ## Get pixel size
-            self.sceneRight.pixelSize = self.pxSize(self.rightImage)
+            ## Placeholder properties until the preview and image are loaded
+            self.sceneRight.loading = True
+            self.sceneRight.pixelSize = None
             self.sceneRight.pixelSizeUnit = 'um'
-            ## Load image, assign it to scene and store image type information
-            self.img_right_layer1,self.sceneRight.imagetype,self.imgstack_right_layer1 = self.imread(self.rightImage)
-            self.img_right_displayed_layer1 = np.copy(self.img_right_layer1)
-            self.img_adj_right_layer1 = np.copy(self.img_right_layer1)
-            ## Set slice spinbox maximum
-            if self.imgstack_right_layer1 is not None:
-                self.spinBox_slice.setValue(0)
-                self.slice_left = 0
-                self.spinBox_slice.setMaximum(self.imgstack_right_layer1.shape[0]-1)
-            ## link image to QTableview for determining z
-            self.tableView_right.img1 = self.imgstack_right_layer1
-            self.tableView_right.img2 = self.imgstack_right_layer2
-            self.tableView_right.img3 = self.imgstack_right_layer3
-            ## check if coloring z values in table is needed (correlation needs z=0 in 2D image, so no checking for valid z
-            ## with 2D images needed)
-            if self.imgstack_right_layer1 is None:
-                self.sceneRight._z = False
-            else:
-                self.sceneRight._z = True
-                self.setCustomRotCenter(max(self.imgstack_right_layer1.shape))
-            # self.pixmap_right = QtGui.QPixmap(self.rightImage)
-            self.pixmap_right = self.cv2Qimage(self.img_right_displayed_layer1)
-            self.pixmap_item_right = self.sceneRight.addPixmap(self.pixmap_right)
+            self.sceneRight.imagetype = 21
+            self.sceneRight.imagetype_layer2 = None
+            self.sceneRight.imagetype_layer3 = None
+            self.sceneRight._z = False
+            ## Empty pixmap item as background, filled with the preview once available (see previewImageLeft/Right)
+            self.sceneRight.previewItem = self.sceneRight.addPixmap(QtGui.QPixmap())
+            self.sceneRight.previewItem.setZValue(-10)
             ## connect scenes to GUI elements
             self.graphicsView_right.setScene(self.sceneRight)
-            ## reset scaling (needed for reinitialization)
-            self.graphicsView_right.resetTransform()
-            ## scaling scene, not image
-            scaling_factor = float(self.size)/max(self.pixmap_right.width(), self.pixmap_right.height())
-            self.graphicsView_right.scale(scaling_factor,scaling_factor)
+            ## No image data for z determination until loaded
+            self.tableView_right.img1 = None
+            self.tableView_right.img2 = None
+            self.tableView_right.img3 = None
+            ## Load image in a worker thread. A downsampled preview is displayed first (previewImageRight), the image data is
+            ## set up once the whole file is read (initImageRightFinished).
+            self.imageLoader_right = QtCustom.ImageLoader(self.rightImage, self.imread, self.pxSize)
+            self.imageLoader_right.signals.progress.connect(self.imageLoaderProgress)
+            self.imageLoader_right.signals.preview.connect(self.previewImageRight)
+            self.imageLoader_right.signals.finished.connect(self.initImageRightFinished)
+            self.imageLoader_right.signals.cancelled.connect(self.imageLoaderCancelledRight)
+            self.imageLoaderCtrl()
+            QtCore.QThreadPool.globalInstance().start(self.imageLoader_right)
+
+    def previewImageLeft(self,preview,step,imagetype):
+        ## Provisional image type, so markers get the right z handling while the full image is loading
+        self.sceneLeft.imagetype = imagetype
+        self.sceneLeft._z = '{0:b}'.format(imagetype)[-1] == '0'
+        pixmap = self.cv2Qimage(preview)
+        self.sceneLeft.previewItem.setPixmap(pixmap)
+        ## Scale preview to full resolution, so markers placed on it have full resolution image coordinates
+        self.sceneLeft.previewItem.setScale(step)
+        ## reset scaling (needed for reinitialization)
+        self.graphicsView_left.resetTransform()
+        ## scaling scene, not image
+        scaling_factor = float(self.size)/(step*max(pixmap.width(), pixmap.height()))
+        self.graphicsView_left.scale(scaling_factor,scaling_factor)
+
+    def previewImageRight(self,preview,step,imagetype):
+        ## Provisional image type, so markers get the right z handling while the full image is loading
+        self.sceneRight.imagetype = imagetype
+        self.sceneRight._z = '{0:b}'.format(imagetype)[-1] == '0'
+        pixmap = self.cv2Qimage(preview)
+        self.sceneRight.previewItem.setPixmap(pixmap)
+        ## Scale preview to full resolution, so markers placed on it have full resolution image coordinates
+        self.sceneRight.previewItem.setScale(step)
+        ## reset scaling (needed for reinitialization)
+        self.graphicsView_right.resetTransform()
+        ## scaling scene, not image
+        scaling_factor = float(self.size)/(step*max(pixmap.width(), pixmap.height()))
+        self.graphicsView_right.scale(scaling_factor,scaling_factor)
+
+    def initImageLeftFinished(self,result):
+        self.imageLoader_left = None
+        self.imageLoaderCtrl()
+        if result is None:
+            QtWidgets.QMessageBox.critical(self, "Error", "Could not load image:\n{0}".format(self.leftImage))
+            self.restoreImageLeft()
+            return
+        ## Assign image and pixel size to scene and store image type information
+        self.img_left_layer1,self.sceneLeft.imagetype,self.imgstack_left_layer1,self.sceneLeft.pixelSize = result
+        self.sceneLeft.loading = False
+        self.img_left_displayed_layer1 = np.copy(self.img_left_layer1)
+        self.img_adj_left_layer1 = np.copy(self.img_left_layer1)
+        ## Set slice spinbox maximum
+        if self.imgstack_left_layer1 is not None:
+            self.spinBox_slice.setValue(0)
+            self.slice_left = 0
+            self.spinBox_slice.setMaximum(self.imgstack_left_layer1.shape[0]-1)
+        ## link image to QTableview for determining z
+        self.tableView_left.img1 = self.imgstack_left_layer1
+        self.tableView_left.img2 = self.imgstack_left_layer2
+        self.tableView_left.img3 = self.imgstack_left_layer3
+        ## check if coloring z values in table is needed (correlation needs z=0 in 2D image, so no checking for valid z
+        ## with 2D images needed)
+        if self.imgstack_left_layer1 is None:
+            self.sceneLeft._z = False
+        else:
+            self.sceneLeft._z = True
+            self.setCustomRotCenter(max(self.imgstack_left_layer1.shape))
+        ## Replace preview by full resolution image pyramid. View scaling was already set for the preview.
+        width, height = self.imageSize(self.img_left_displayed_layer1)
+        self.pixmap_item_left = QtCustom.QGraphicsPyramidItem(
+            width,height,self.composeImage([(self.img_left_displayed_layer1,False)]))
+        self.sceneLeft.addItem(self.pixmap_item_left)
+        ## fix bug, where markers vanished behind image, by setting z value low enough
+        self.pixmap_item_left.setZValue(-10)
+        self.sceneLeft.removeItem(self.sceneLeft.previewItem)
+        self.sceneLeft.previewItem = None
+        ## Release the scene of the previously loaded image
+        self.overlay_item_left = None
+        if self.sceneLeft_previous is not None:
+            self.sceneLeft_previous.clear()
+            self.sceneLeft_previous = None
+        ## Update controls (GUI) if this image is selected
+        if self.currentFocusedWidgetName == 'graphicsView_left':
+            self.changedFocusSlot(None, self.graphicsView_left)
+
+    def initImageRightFinished(self,result):
+        self.imageLoader_right = None
+        self.imageLoaderCtrl()
+        if result is None:
+            QtWidgets.QMessageBox.critical(self, "Error", "Could not load image:\n{0}".format(self.rightImage))
+            self.restoreImageRight()
+            return
+        ## Assign image and pixel size to scene and store image type information
+        self.img_right_layer1,self.sceneRight.imagetype,self.imgstack_right_layer1,self.sceneRight.pixelSize = result
+        self.sceneRight.loading = False
+        self.img_right_displayed_layer1 = np.copy(self.img_right_layer1)
+        self.img_adj_right_layer1 = np.copy(self.img_right_layer1)
+        ## Set slice spinbox maximum
+        if self.imgstack_right_layer1 is not None:
+            self.spinBox_slice.setValue(0)
+            self.slice_left = 0
+            self.spinBox_slice.setMaximum(self.imgstack_right_layer1.shape[0]-1)
+        ## link image to QTableview for determining z
+        self.tableView_right.img1 = self.imgstack_right_layer1
+        self.tableView_right.img2 = self.imgstack_right_layer2
+        self.tableView_right.img3 = self.imgstack_right_layer3
+        ## check if coloring z values in table is needed (correlation needs z=0 in 2D image, so no checking for valid z
+        ## with 2D images needed)
+        if self.imgstack_right_layer1 is None:
+            self.sceneRight._z = False
+        else:
+            self.sceneRight._z = True
+            self.setCustomRotCenter(max(self.imgstack_right_layer1.shape))
+        ## Replace preview by full resolution image pyramid. View scaling was already set for the preview.
+        width, height = self.imageSize(self.img_right_displayed_layer1)
+        self.pixmap_item_right = QtCustom.QGraphicsPyramidItem(
+            width,height,self.composeImage([(self.img_right_displayed_layer1,False)]))
+        self.sceneRight.addItem(self.pixmap_item_right)
+        ## fix bug, where markers vanished behind image, by setting z value low enough
+        self.pixmap_item_right.setZValue(-10)
+        self.sceneRight.removeItem(self.sceneRight.previewItem)
+        self.sceneRight.previewItem = None
+        ## Release the scene of the previously loaded image
+        self.overlay_item_right = None
+        if self.sceneRight_previous is not None:
+            self.sceneRight_previous.clear()
+            self.sceneRight_previous = None
+        ## Update controls (GUI) if this image is selected
+        if self.currentFocusedWidgetName == 'graphicsView_right':
+            self.changedFocusSlot(None, self.graphicsView_right)
+
+    def imageLoaderProgress(self,value,msg):
+        self.label_loadImage.setText(msg)
+        self.progressBar_loadImage.setValue(value)
+
+    def imageLoaderCtrl(self):
+        """Show progress bar while images are loading. Cancelling is possible if there is an image to fall back to."""
+        loading = self.imageLoader_left is not None or self.imageLoader_right is not None
+        self.label_loadImage.setVisible(loading)
+        self.progressBar_loadImage.setVisible(loading)
+        self.toolButton_cancelLoadImage.setVisible(loading)
+        self.toolButton_cancelLoadImage.setEnabled(
+            (self.imageLoader_left is not None and self.sceneLeft_previous is not None) or
+            (self.imageLoader_right is not None and self.sceneRight_previous is not None))
+
+    def stopImageLoader(self,loader):
+        """Cancel image loader without calling its connected slots (image is replaced by another one)"""
+        loader.signals.progress.disconnect()
+        loader.signals.preview.disconnect()
+        loader.signals.finished.disconnect()
+        loader.signals.cancelled.disconnect()
+        loader.cancel()
+
+    def cancelImageLoading(self):
+        if self.imageLoader_left is not None and self.sceneLeft_previous is not None:
+            self.imageLoader_left.cancel()
+        if self.imageLoader_right is not None and self.sceneRight_previous is not None:
+            self.imageLoader_right.cancel()
+
+    def imageLoaderCancelledLeft(self):
+        self.imageLoader_left = None
+        self.imageLoaderCtrl()
+        self.restoreImageLeft()
+
+    def imageLoaderCancelledRight(self):
+        self.imageLoader_right = None
+        self.imageLoaderCtrl()
+        self.restoreImageRight()
+
+    def imageState(self,side):
+        """Display settings and additional layers of the left or right image, see restoreImageLeft/Right"""
+        names = [
+            'brightness_{0}_layer1','brightness_{0}_layer2','brightness_{0}_layer3',
+            'contrast_{0}_layer1','contrast_{0}_layer2','contrast_{0}_layer3',
+            'selectedLayer_{0}','slice_{0}','mipCHKbox_{0}','layer2CHKbox_{0}','layer3CHKbox_{0}',
+            'layer1Color_{0}','layer2Color_{0}','layer3Color_{0}',
+            'img_adj_{0}_layer1','img_{0}_displayed_layer1',
+            'img_{0}_layer2','img_adj_{0}_layer2','img_{0}_displayed_layer2','imgstack_{0}_layer2',
+            'img_{0}_layer3','img_adj_{0}_layer3','img_{0}_displayed_layer3','imgstack_{0}_layer3']
+        return {name.format(side): getattr(self, name.format(side), None) for name in names}
+
+    def restoreImageLeft(self):
+        """Fall back to the previously loaded image after loading was cancelled or failed"""
+        if self.sceneLeft_previous is None:
+            return
+        self.sceneLeft.clear()
+        self.sceneLeft = self.sceneLeft_previous
+        self.sceneLeft_previous = None
+        self.leftImage = self.leftImage_previous
+        for name, value in self.imageStateLeft_previous.items():
+            setattr(self, name, value)
+        self.imageStateLeft_previous = None
+        self.graphicsView_left.setScene(self.sceneLeft)
+        self.graphicsView_left.setTransform(self.transformLeft_previous)
+        self.tableView_left._scene = self.sceneLeft
+        self.tableView_left.img1 = self.imgstack_left_layer1
+        self.tableView_left.img2 = self.imgstack_left_layer2
+        self.tableView_left.img3 = self.imgstack_left_layer3
+        ## Markers might have been added or moved while loading
+        self.sceneLeft.clearMarkers()
+        for i in range(self.tableView_left._model.rowCount()):
+            self.sceneLeft.addCircle(0.0,0.0,0.0)
+        self.tableView_left.updateItems()
+        self.displayImage(side='left')
+        ## Feed restored settings to the controls if this image is selected
+        if self.currentFocusedWidgetName == 'graphicsView_left':
+            self.changedFocusSlot(None, self.graphicsView_left)
+
+    def restoreImageRight(self):
+        """Fall back to the previously loaded image after loading was cancelled or failed"""
+        if self.sceneRight_previous is None:
+            return
+        self.sceneRight.clear()
+        self.sceneRight = self.sceneRight_previous
+        self.sceneRight_previous = None
+        self.rightImage = self.rightImage_previous
+        for name, value in self.imageStateRight_previous.items():
+            setattr(self, name, value)
+        self.imageStateRight_previous = None
+        self.graphicsView_right.setScene(self.sceneRight)
+        self.graphicsView_right.setTransform(self.transformRight_previous)
+        self.tableView_right._scene = self.sceneRight
+        self.tableView_right.img1 = self.imgstack_right_layer1
+        self.tableView_right.img2 = self.imgstack_right_layer2
+        self.tableView_right.img3 = self.imgstack_right_layer3
+        ## Markers might have been added or moved while loading
+        self.sceneRight.clearMarkers()
+        for i in range(self.tableView_right._model.rowCount()):
+            self.sceneRight.addCircle(0.0,0.0,0.0)
+        self.tableView_right.updateItems()
+        self.displayImage(side='right')
+        ## Feed restored settings to the controls if this image is selected
+        if self.currentFocusedWidgetName == 'graphicsView_right':
+            self.changedFocusSlot(None, self.graphicsView_right)
 
     def openImageLeft(self):
         ## *.png *.jpg *.bmp not yet supported
@@ -724,6 +985,11 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         if path != '':
             ## Set focus to corresponding side to properly reset layer checkboxes
             self.graphicsView_left.setFocus()
+            ## The correlation does not apply to the new image
+            self.resetCorrelation()
+            ## Keep display settings and layers of the current image, restored if loading is cancelled or fails
+            if self.imageLoader_left is None:
+                self.imageStateLeft_previous = self.imageState('left')
             ## reset brightness contrast
             self.brightness_left_layer1 = 0
             self.brightness_left_layer2 = 0
@@ -737,8 +1003,8 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             ## Reset Layers
             self.spinBox_slice.setValue(0)
             self.checkBox_MIP.setChecked(True)
-            self.img_left_layer2,self.img_adj_left_layer2,self.sceneLeft.imagetype_layer2,self.imgstack_left_layer2 = None, None, None, None
-            self.img_left_layer3,self.img_adj_left_layer3,self.sceneLeft.imagetype_layer3,self.imgstack_left_layer3 = None, None, None, None
+            self.img_left_layer2,self.img_adj_left_layer2,self.imgstack_left_layer2 = None, None, None
+            self.img_left_layer3,self.img_adj_left_layer3,self.imgstack_left_layer3 = None, None, None
             self.tableView_left.img2 = self.imgstack_left_layer2
             self.tableView_left.img3 = self.imgstack_left_layer3
             self.layer2CHKbox_left = False
@@ -748,9 +1014,10 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             self.comboBox_channelColorLayer1.setCurrentIndex(0)
             self.comboBox_channelColorLayer2.setCurrentIndex(0)
             self.comboBox_channelColorLayer3.setCurrentIndex(0)
-            ## Load new image
+            ## Load new image (previous scene is kept until loading has finished, see initImageLeftFinished)
+            if self.imageLoader_left is None:
+                self.leftImage_previous = self.leftImage
             self.leftImage = path
-            self.sceneLeft.clear()
             self.initImageLeft()
             self.tableView_left._scene = self.sceneLeft
             for i in range(self.tableView_left._model.rowCount()):
@@ -768,6 +1035,11 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         if path != '':
             ## Set focus to corresponding side to properly reset layer checkboxes
             self.graphicsView_right.setFocus()
+            ## The correlation does not apply to the new image
+            self.resetCorrelation()
+            ## Keep display settings and layers of the current image, restored if loading is cancelled or fails
+            if self.imageLoader_right is None:
+                self.imageStateRight_previous = self.imageState('right')
             ## reset brightness contrast
             self.brightness_right_layer1 = 0
             self.brightness_right_layer2 = 0
@@ -781,8 +1053,8 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             ## Reset Layers
             self.spinBox_slice.setValue(0)
             self.checkBox_MIP.setChecked(True)
-            self.img_right_layer2,self.img_adj_right_layer2,self.sceneRight.imagetype_layer2,self.imgstack_right_layer2 = None, None, None, None
-            self.img_right_layer3,self.img_adj_right_layer3,self.sceneRight.imagetype_layer3,self.imgstack_right_layer3 = None, None, None, None
+            self.img_right_layer2,self.img_adj_right_layer2,self.imgstack_right_layer2 = None, None, None
+            self.img_right_layer3,self.img_adj_right_layer3,self.imgstack_right_layer3 = None, None, None
             self.tableView_right.img2 = self.imgstack_right_layer2
             self.tableView_right.img3 = self.imgstack_right_layer3
             self.layer2CHKbox_right = False
@@ -792,9 +1064,10 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             self.comboBox_channelColorLayer1.setCurrentIndex(0)
             self.comboBox_channelColorLayer2.setCurrentIndex(0)
             self.comboBox_channelColorLayer3.setCurrentIndex(0)
-            ## Load new image
+            ## Load new image (previous scene is kept until loading has finished, see initImageRightFinished)
+            if self.imageLoader_right is None:
+                self.rightImage_previous = self.rightImage
             self.rightImage = path
-            self.sceneRight.clear()
             self.initImageRight()
             self.tableView_right._scene = self.sceneRight
             for i in range(self.tableView_right._model.rowCount()):
@@ -821,7 +1094,10 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             self.horizontalSlider_contrast.setValue(10)
         # print img.shape
         ## Reset Overlay
-        self.img_left_overlay = None
+        self.resetCorrelation()
+        if self.overlay_item_left is not None and self.overlay_item_left.scene() is self.sceneLeft:
+            self.sceneLeft.removeItem(self.overlay_item_left)
+        self.overlay_item_left = None
         ## Load original
         self.img_left_displayed_layer1 = np.copy(img)
         self.img_adj_left_layer1 = np.copy(img)
@@ -847,7 +1123,10 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             self.horizontalSlider_contrast.setValue(10)
         # print img.shape
         ## Reset Overlay
-        self.img_right_overlay = None
+        self.resetCorrelation()
+        if self.overlay_item_right is not None and self.overlay_item_right.scene() is self.sceneRight:
+            self.sceneRight.removeItem(self.overlay_item_right)
+        self.overlay_item_right = None
         ## Load original
         self.img_right_displayed_layer1 = np.copy(img)
         self.img_adj_right_layer1 = np.copy(img)
@@ -980,10 +1259,11 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                                                 ######    Image processing functions     ######
                                                 #################### START ####################
     ## Read image
-    def imread(self,path,normalize=True):
+    def imread(self,path,normalize=True,img=None):
         """
         Returns a 2D numpy array (maximum intensity projection for stack image files), the kind of image as 5 bit
         encoded image property and the original stack file as a numpy array or 'None' if file is 2D image.
+        If img (numpy array) is passed, e.g. already read by QtCustom.ImageLoader, the file is not read again.
 
         return 5 bit encoded image property:
             1 = 2D
@@ -994,7 +1274,8 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         """
         if debug is True: print(clrmsg.DEBUG + "===== imread")
         try:
-            img = tf.imread(path)
+            if img is None:
+                img = tf.imread(path)
             if debug is True: print(clrmsg.DEBUG + "Image shape/dtype:", img.shape, img.dtype)
             ## Displaying issues with uint16 images -> convert to uint8
             if img.dtype == 'uint16':
@@ -1024,57 +1305,27 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             return None, None, None
 
     def pxSize(self,img_path,z=False):
-        with tf.TiffFile(img_path) as tif:
-            try:
-                pixelSize = float(tif.pages[0].tags['FEI_HELIOSs'].value['Scan']['PixelWidth'])
-                if debug is True: print(clrmsg.DEBUG + "Pixel size found. FEI_HELIOS standard.")
-                return pixelSize*1E6  # from meters to microns
-            except KeyError:
-                if debug is True: print(clrmsg.DEBUG + "Pixel size not found.")
-                return np.nan  # so imageProps is passed to correlation.main()
-        # Old pixel size parser
-        # with tf.TiffFile(img_path) as tif:
-        #     for page in tif.pages:
-        #         for tag in list(page.tags.values()):
-        #             if isinstance(tag.value, str):
-        #                 for keyword in ['PhysicalSizeX','PixelWidth','PixelSize'] if not z else ['PhysicalSizeZ','FocusStepSize']:
-        #                     tagposs = [m.start() for m in re.finditer(keyword, tag.value)]
-        #                     for tagpos in tagposs:
-        #                         if keyword == 'PhysicalSizeX' or keyword == 'PhysicalSizeZ':
-        #                             for piece in tag.value[tagpos:tagpos+30].split('"'):
-        #                                 try:
-        #                                     pixelSize = float(piece)
-        #                                     if debug is True: print(clrmsg.DEBUG + "Pixel size from exif metakey:", keyword)
-        #                                     ## Value is in um from CorrSight/LA tiff files
-        #                                     if z:
-        #                                         pixelSize = pixelSize*1000
-        #                                     return pixelSize
-        #                                 except Exception as e:
-        #                                     if debug is True: print(clrmsg.DEBUG + "Pixel size parser:", e)
-        #                                     pass
-        #                         elif keyword == 'PixelWidth':
-        #                             for piece in tag.value[tagpos:tagpos+30].split('='):
-        #                                 try:
-        #                                     try:
-        #                                         pixelSize = float(piece.strip().split('\r\n')[0])
-        #                                     except:
-        #                                         pixelSize = float(piece.strip().split(r'\r\n')[0])
-        #                                     if debug is True: print(clrmsg.DEBUG + "Pixel size from exif metakey:", keyword)
-        #                                     ## *1E6 because these values from SEM/FIB image is in m
-        #                                     return pixelSize*1E6
-        #                                 except Exception as e:
-        #                                     if debug is True: print(clrmsg.DEBUG + "Pixel size parser:", e)
-        #                                     pass
-        #                         elif keyword == 'PixelSize' or 'FocusStepSize':
-        #                             for piece in tag.value[tagpos:tagpos+30].split('"'):
-        #                                 try:
-        #                                     pixelSize = float(piece)
-        #                                     if debug is True: print(clrmsg.DEBUG + "Pixel size from exif metakey:", keyword)
-        #                                     ## Value is in um from CorrSight/LA tiff files
-        #                                     return pixelSize
-        #                                 except Exception as e:
-        #                                     if debug is True: print(clrmsg.DEBUG + "Pixel size parser:", e)
-        #                                     pass
+        """
+        Pixel size (z=False) or focus step size (z=True) from the tiff meta data (see tiffMetadata). PixelWidth of dual
+        beam images is converted from meters to microns, PhysicalSizeZ of CorrSight/LA images is multiplied by 1000.
+        Returns nan if not found.
+        """
+        meta = tiffMetadata.read(img_path)
+        if z:
+            pixelSize, key = meta.focusStepSize, meta.focusStepSizeKey
+        else:
+            pixelSize, key = meta.pixelSize, meta.pixelSizeKey
+        if pixelSize is None:
+            if debug is True: print(clrmsg.DEBUG + "Pixel size not found.")
+            return np.nan  # so imageProps is passed to correlation.main()
+        if debug is True: print(clrmsg.DEBUG + "Pixel size from exif metakey:", key)
+        if key == 'PixelWidth':
+            return pixelSize*1E6  # from meters to microns
+        elif key == 'PhysicalSizeZ':
+            return pixelSize*1000
+        else:
+            ## Value is in um from CorrSight/LA tiff files
+            return pixelSize
 
     ## Convert opencv image (numpy array in BGR) to RGB QImage and return pixmap. Only takes 2D images
     def cv2Qimage(self,img,combobox=None):
@@ -1298,9 +1549,9 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
 
     def colorCoder(self,code,side,layer):
         if code == 0:
-            if side == 'left' and self.img_left_overlay is not None:
+            if side == 'left' and self.overlay_item_left is not None:
                 return [255,255,255]
-            elif side == 'right' and self.img_right_overlay is not None:
+            elif side == 'right' and self.overlay_item_right is not None:
                 return [255,255,255]
             else:
                 return None
@@ -1329,64 +1580,81 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
     def displayImage(self,side=None,save=False,keepRGB=False):
         """
         Display all active images. Set side to 'left' or 'right' for specific refresh, otherwise the active focused image side is used.
+        Layers are blended per visible tile of the image pyramid (see composeImage and QtCustom.QGraphicsPyramidItem).
         """
         if debug is True: ping = time.time()
         if side is None:
             side = self.label_selimg.text()
         if side == 'left':
             if self.layer1CHKbox_left is True:
-                if not (self.layer2CHKbox_left, self.layer3CHKbox_left, self.img_left_overlay):
-                    image_list = [self.img_adj_left_layer1]
+                if not (self.layer2CHKbox_left, self.layer3CHKbox_left, self.overlay_item_left):
+                    layers = [(self.img_adj_left_layer1,False)]
                 else:
-                    image_list = [self.colorizeImage(self.img_adj_left_layer1,color=self.colorCoder(self.layer1Color_left,'left',1))]
+                    layers = [(self.img_adj_left_layer1,self.colorCoder(self.layer1Color_left,'left',1))]
             else:
-                image_list = []
+                layers = []
             if self.img_left_layer2 is not None and self.layer2CHKbox_left is True:
-                image_list.append(self.colorizeImage(self.img_adj_left_layer2,color=self.colorCoder(self.layer2Color_left,'left',2)))
+                layers.append((self.img_adj_left_layer2,self.colorCoder(self.layer2Color_left,'left',2)))
             if self.img_left_layer3 is not None and self.layer3CHKbox_left is True:
-                image_list.append(self.colorizeImage(self.img_adj_left_layer3,color=self.colorCoder(self.layer3Color_left,'left',3)))
-            if self.img_left_overlay is not None:
-                image_list.append(self.img_left_overlay)
-            img_blend = self.blendImages(image_list)
-            ## Display image
-            ## Remove image (item)
-            self.sceneLeft.removeItem(self.pixmap_item_left)
-            self.pixmap_left = self.cv2Qimage(img_blend)
-            self.pixmap_item_left = self.sceneLeft.addPixmap(self.pixmap_left)
-            ## Put exchanged image into background
-            QtWidgets.QGraphicsItem.stackBefore(self.pixmap_item_left, list(self.sceneLeft.items())[-1])
-            ## fix bug, where markers vanished behind image, by setting z value low enough
-            self.pixmap_item_left.setZValue(-10)
+                layers.append((self.img_adj_left_layer3,self.colorCoder(self.layer3Color_left,'left',3)))
+            compose = self.composeImage(layers)
+            ## Display image, tiles are recomposited when they are painted
+            self.pixmap_item_left.setCompose(compose)
+            pixmap_item = self.pixmap_item_left
+            overlay_item = self.overlay_item_left
         elif side == 'right':
             if self.layer1CHKbox_right is True:
-                if not (self.layer2CHKbox_right, self.layer3CHKbox_right, self.img_right_overlay):
-                    image_list = [self.img_adj_right_layer1]
+                if not (self.layer2CHKbox_right, self.layer3CHKbox_right, self.overlay_item_right):
+                    layers = [(self.img_adj_right_layer1,False)]
                 else:
-                    image_list = [self.colorizeImage(self.img_adj_right_layer1,color=self.colorCoder(self.layer1Color_right,'right',1))]
+                    layers = [(self.img_adj_right_layer1,self.colorCoder(self.layer1Color_right,'right',1))]
             else:
-                image_list = []
+                layers = []
             if self.img_right_layer2 is not None and self.layer2CHKbox_right is True:
-                image_list.append(self.colorizeImage(self.img_adj_right_layer2,color=self.colorCoder(self.layer2Color_right,'right',2)))
+                layers.append((self.img_adj_right_layer2,self.colorCoder(self.layer2Color_right,'right',2)))
             if self.img_right_layer3 is not None and self.layer3CHKbox_right is True:
-                image_list.append(self.colorizeImage(self.img_adj_right_layer3,color=self.colorCoder(self.layer3Color_right,'right',3)))
-            if self.img_right_overlay is not None:
-                image_list.append(self.img_right_overlay)
-            img_blend = self.blendImages(image_list)
-            ## Display image
-            ## Remove image (item)
-            self.sceneRight.removeItem(self.pixmap_item_right)
-            self.pixmap_right = self.cv2Qimage(img_blend)
-            self.pixmap_item_right = self.sceneRight.addPixmap(self.pixmap_right)
-            ## Put exchanged image into background
-            QtWidgets.QGraphicsItem.stackBefore(self.pixmap_item_right, list(self.sceneRight.items())[-1])
-            ## fix bug, where markers vanished behind image, by setting z value low enough
-            self.pixmap_item_right.setZValue(-10)
+                layers.append((self.img_adj_right_layer3,self.colorCoder(self.layer3Color_right,'right',3)))
+            compose = self.composeImage(layers)
+            ## Display image, tiles are recomposited when they are painted
+            self.pixmap_item_right.setCompose(compose)
+            pixmap_item = self.pixmap_item_right
+            overlay_item = self.overlay_item_right
         if save is True:
+            ## Blend full resolution image only for saving
+            img_blend = compose(0,pixmap_item.height,0,pixmap_item.width)
+            if overlay_item is not None:
+                img_blend = overlay_item.rasterize(img_blend)
             timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
             cv2.imwrite(os.path.join(self.workingdir,timestamp+"_image.tif"), cv2.cvtColor(img_blend,cv2.COLOR_RGB2BGR))
         if debug is True: pong = time.time()
         if debug is True: print(clrmsg.DEBUG + 'displaying image in s:', pong-ping)
 
+    def composeImage(self,layers):
+        """
+        Returns a function compose(y0,y1,x0,x1,step=1) blending the image region [y0:y1:step,x0:x1:step] of all layers,
+        used for the tiles of QtCustom.QGraphicsPyramidItem. layers is a list of (image, color) tuples, color is passed
+        to colorizeImage or is False to blend the image as it is.
+        """
+        def compose(y0,y1,x0,x1,step=1):
+            images = []
+            for img, color in layers:
+                if img.ndim == 3 and img.shape[0] <= 4:
+                    ## c,y,x to y,x,c
+                    img = img.transpose(1,2,0)
+                region = np.ascontiguousarray(img[y0:y1:step,x0:x1:step])
+                images.append(region if color is False else self.colorizeImage(region,color=color))
+            if len(images) == 0:
+                ## "white image", see blendImages
+                return np.zeros([len(range(y0,y1,step)),len(range(x0,x1,step))],dtype=np.uint8)-1
+            return self.blendImages(images)
+        return compose
+
+    def imageSize(self,img):
+        """Returns (width, height) of a 2D image with or without (first or last axis) color channels."""
+        if img.ndim == 3 and img.shape[0] <= 4:
+            return img.shape[2], img.shape[1]
+        return img.shape[1], img.shape[0]
+
     def blendImages(self,images,blendmode='screen'):
         """
         Blends multiple images (same numpy size and type) and returns a single image (numpy array). Images are passed in as a list argument.
@@ -1672,10 +1940,16 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             os.path.dirname(self.leftImage) if side == 'left' else os.path.dirname(self.rightImage),
             "Tabstop separated (*.csv *.txt);;Comma separated (*.csv *.txt)")
         self.activateWindow()
-        if str(filterdialog).startswith('Comma') is True:
-            csvHandler.model2csv(model,csv_file_out,delimiter=",")
-        elif str(filterdialog).startswith('Tabstop') is True:
-            csvHandler.model2csv(model,csv_file_out,delimiter="\t")
+        if csv_file_out != "":
+            try:
+                markers = self.model2np(model,[0,model.rowCount()])
+            except (TypeError, ValueError) as e:
+                QtWidgets.QMessageBox.warning(self, "Export", "Could not export the markers, not all coordinates are numbers.\n\n{0}".format(e))
+                return
+            if str(filterdialog).startswith('Comma') is True:
+                csvHandler.array2csv(markers,csv_file_out,delimiter=",")
+            elif str(filterdialog).startswith('Tabstop') is True:
+                csvHandler.array2csv(markers,csv_file_out,delimiter="\t")
 
     def importPoints(self):
         ## bugfix for KDE file dialog
@@ -1689,24 +1963,16 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             self.activateWindow()
             try:
                 if str(filterdialog).startswith('Comma') is True:
-                    itemlist = csvHandler.csv2list(csv_file_in,delimiter=",",parent=self,sniff=True)
+                    markers = csvHandler.csv2array(csv_file_in,delimiter=",",parent=self,sniff=True)
                 elif str(filterdialog).startswith('Tabstop') is True:
-                    itemlist = csvHandler.csv2list(csv_file_in,delimiter="\t",parent=self,sniff=True)
+                    markers = csvHandler.csv2array(csv_file_in,delimiter="\t",parent=self,sniff=True)
+                ## Markers are added in one batch, only their rows are appended to the model
                 if side == 'left':
-                    for item in itemlist: self.sceneLeft.addCircle(
-                        float(item[0]),
-                        float(item[1]),
-                        float(item[2]) if len(item) > 2 else 0)
-                    self.sceneLeft.itemsToModel()
-                    # csvHandler.csvAppend2model(csv_file_in,self.modelLleft,delimiter="\t",parent=self,sniff=True)
+                    self.sceneLeft.markersToModel(self.sceneLeft.addCircles(markers))
                 elif side == 'right':
-                    for item in itemlist: self.sceneRight.addCircle(
-                        float(item[0]),
-                        float(item[1]),
-                        float(item[2]) if len(item) > 2 else 0)
-                    self.sceneRight.itemsToModel()
-                    # csvHandler.csvAppend2model(csv_file_in,self.modelRight,delimiter="\t",parent=self,sniff=True)
-            except ValueError:
+                    self.sceneRight.markersToModel(self.sceneRight.addCircles(markers))
+            except ValueError as e:
+                QtWidgets.QMessageBox.warning(self, "Import", "Could not import the markers, not all coordinates are numbers.\n\n{0}".format(e))
                 return
 
                                                 ##################### END #####################
@@ -1723,15 +1989,15 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         Pass the model and the range of rows to convert. E.g. if the model has rows nr 1,2,3,4,5,6,7,8
         model2np(model, [3,7]) would convert rows 4,5,6,7 of the model to a numpy array.
         """
-        listarray = []
-        for rowNumber in range(*rows):
-            fields = [
-                    float(model.data(model.index(rowNumber, columnNumber), QtCore.Qt.DisplayRole))
-                    for columnNumber in range(model.columnCount())]
-            listarray.append(fields)
+        ## Collect the cell texts and convert them in one go
+        columns = range(model.columnCount())
+        listarray = [[model.item(rowNumber, columnNumber).text() for columnNumber in columns] for rowNumber in range(*rows)]
         return np.array(listarray).astype(float)
 
     def correlate(self):
+        if self.sceneLeft.loading or self.sceneRight.loading:
+            QtWidgets.QMessageBox.critical(self, "Data Structure", 'Images are still loading. Please wait until loading has finished.')
+            return
         if '{0:b}'.format(self.sceneLeft.imagetype)[-1] == '1' and '{0:b}'.format(self.sceneRight.imagetype)[-1] == '0':
             model2D = self.modelLleft
             model3D = self.modelRight
@@ -1882,7 +2148,9 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                                                         results_file=''.join([
                                                             self.workingdir,'/',timestamp, '_correlation.txt'
                                                             ] if self.checkBox_writeReport.isChecked() else ''),
-                                                        imageProps=imageProps
+                                                        imageProps=imageProps,
+                                                        robust='ransac' if self.checkBox_robust.isChecked() else None,
+                                                        warm_start=self.correlationWarmStart
                                                         )
             else:
                 QtWidgets.QMessageBox.critical(self, "Data Structure", "The two datasets do not contain the same amount of markers!")
@@ -1891,88 +2159,209 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
             QtWidgets.QMessageBox.critical(self, "Data Structure",'At least THREE markers are needed to do the correlation')
             return
 
+        ## Held-out (leave-one-out) residual of each marker, a misplaced marker stands out more than in delta2D
+        self.correlation_loo = correlation.leave_one_out(
+            self.model2np(model3D,[0,nrRowsModel2D]),self.model2np(model2D,[0,nrRowsModel2D]),self.correlation_results[0])
+        overlay = self.correlationOverlay()
+        if self.checkBox_writeReport.isChecked():
+            ## Overlay is only rasterized for the exported image
+            cv2.imwrite(os.path.join(self.workingdir,timestamp+"_correlated.tif"), cv2.cvtColor(overlay.rasterize(img),cv2.COLOR_RGB2BGR))
+            if imageProps is not None:
+                ## Light microscope channels resampled into the 2D image's pixel grid, written in a worker thread
+                self.exportOverlay(os.path.join(self.workingdir,timestamp+"_overlay.tif"),imgSide,imgShape)
+        self.showCorrelationOverlay(overlay,imgSide)
+        ## Layer 1 is displayed in gray scale (see colorCoder) while the overlay is shown
+        self.displayImage(side=imgSide,keepRGB=False)
+
+        # self.displayResults(frame=False,framesize=None)
+        self.displayResults(frame=self.checkBox_scatterPlotFrame.isChecked(),framesize=self.doubleSpinBox_scatterPlotFrameSize.value())
+        self.drawResidualArrows(model2D)
+        ## Marker edits from now on re-correlate warm-started from this correlation (see recorrelate)
+        self.correlation_live = (model2D,model3D,imageProps,imgSide)
+        self.correlation_markers = (self.model2np(model3D,[0,nrRowsModel3D]),self.model2np(model2D,[0,nrRowsModel2D]))
+        if self.checkBox_poiUncertainty.isChecked() and nrRowsModel3D > nrRowsModel2D:
+            ## Resampling takes a fit per sample, estimated after the correlation is shown (see estimateUncertainty)
+            self.estimateUncertainty(
+                self.correlation_markers[0][:nrRowsModel2D],self.correlation_markers[1],
+                self.correlation_markers[0][nrRowsModel2D:],imageProps,imgSide,img,
+                os.path.join(self.workingdir,timestamp) if self.checkBox_writeReport.isChecked() else None)
+
+    def estimateUncertainty(self,markers_3d,markers_2d,spots_3d,imageProps,imgSide,img,report=None):
+        """Estimates the POI uncertainties of the last correlation (see correlation.poi_uncertainty) in a worker thread
+
+        When finished, the 95% confidence ellipses are drawn. If report (path and timestamp of the report written by
+        correlate) is given, the report and the correlated image (img) are written again with them. The estimate is
+        discarded if the correlation changed in the meantime (e.g. re-correlation after a marker edit or image reset).
+        """
+        results = self.correlation_results
+        rotation_center = list(self.rotation_center)
+        ## Markers rejected by the robust correlation are not resampled
+        inliers = getattr(results[0],'inliers',None)
+        used = slice(None) if inliers is None else inliers
+        estimator = QtCustom.UncertaintyEstimator(markers_3d[used],markers_2d[used],spots_3d,results[0])
+
+        def finished(cov):
+            if self.correlation_results is not results or self.correlation_live is None:
+                return
+            results[6] = cov
+            overlay = self.correlationOverlay()
+            self.showCorrelationOverlay(overlay,imgSide)
+            if report is not None:
+                correlation.write_results(
+                    transf=results[0], res_file_name=report+'_correlation.txt',
+                    spots_3d=spots_3d.transpose(), spots_2d=results[2],
+                    markers_3d=markers_3d.transpose(), transformed_3d=results[1], markers_2d=markers_2d[:,:2].transpose(),
+                    rotation_center=rotation_center, modified_translation=results[5], imageProps=imageProps,
+                    spots_cov=cov)
+                cv2.imwrite(report+"_correlated.tif", cv2.cvtColor(overlay.rasterize(img),cv2.COLOR_RGB2BGR))
+            print(clrmsg.OK + "POI uncertainty estimated")
+
+        estimator.signals.finished.connect(finished)
+        estimator.signals.failed.connect(lambda msg: QtWidgets.QMessageBox.critical(
+            self, "POI uncertainty", "Estimating the POI uncertainty failed:\n{0}".format(msg)))
+        QtCore.QThreadPool.globalInstance().start(estimator)
+
+    def correlationOverlay(self):
+        """Vector overlay of the correlated markers and POIs of the last correlation"""
         transf_3d = self.correlation_results[1]
         alpha = self.doubleSpinBox_markerAlpha.value()
         radius = self.spinBox_markerRadius.value()
         poiAlpha = self.doubleSpinBox_poiAlpha.value()
         poiSize = self.spinBox_poiSize.value()
         poiForm = self.comboBox_poiForm.currentIndex()
-        ## convert RGB to BGR for cv2 handling
-        img = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
-        img_orig = np.copy(img)
-        img_overlay = np.zeros(img.shape,dtype=img.dtype)
+        ## Correlated markers and POIs are drawn as vector overlay on top of the image (no pixel blending)
+        markerColor = QtGui.QColor(self.markerColor[2],self.markerColor[1],self.markerColor[0])
+        poiColor = QtGui.QColor(self.poiColor[2],self.poiColor[1],self.poiColor[0])
+        overlay = QtCustom.QGraphicsOverlayItem()
+        markerPath = QtGui.QPainterPath()
         for i in range(transf_3d.shape[1]):
-            cv2.circle(img, (int(round(transf_3d[0,i])), int(round(transf_3d[1,i]))), radius, self.markerColor, -1)
-            cv2.circle(img_overlay, (int(round(transf_3d[0,i])), int(round(transf_3d[1,i]))), radius, self.markerColor, -1)
-        img = cv2.addWeighted(img, alpha, img_orig, 1-alpha, 0.0)
-        img_overlay = cv2.addWeighted(img_overlay, alpha, np.zeros(img.shape,dtype=img.dtype), 1-alpha, 0.0)
-        img_orig = np.copy(img)
-        img_overlay_orig = np.copy(img_overlay)
+            markerPath.addEllipse(QtCore.QPointF(transf_3d[0,i],transf_3d[1,i]),radius,radius)
+        overlay.addLayer(markerPath,brush=QtGui.QBrush(markerColor),opacity=alpha)
         if self.correlation_results[2] is not None:
             calc_spots_2d = self.correlation_results[2]
-            # draw POI cv2.circle(img, (center x, center y), radius, [b,g,r], thickness(-1 for filled))
+            poiPath = QtGui.QPainterPath()
             for i in range(calc_spots_2d.shape[1]):
+                x, y = calc_spots_2d[0,i], calc_spots_2d[1,i]
                 if poiForm == 0:
-                    if poiSize in [1,2,3]:
-                        poiCrossLength = poiSize
-                        poiCrossThick = 1
-                    else:
-                        poiCrossLength = poiSize
-                        poiCrossThick = int(round(poiSize*0.33))
                     ## horizontal cross line
-                    cv2.line(img, (int(round(calc_spots_2d[0,i] - poiCrossLength)), int(round(calc_spots_2d[1,i]))),
-                                  (int(round(calc_spots_2d[0,i] + poiCrossLength)), int(round(calc_spots_2d[1,i]))), self.poiColor, poiCrossThick)
-                    cv2.line(img_overlay, (int(round(calc_spots_2d[0,i] - poiCrossLength)), int(round(calc_spots_2d[1,i]))),
-                                          (int(round(calc_spots_2d[0,i] + poiCrossLength)), int(round(calc_spots_2d[1,i]))), self.poiColor, poiCrossThick)
+                    poiPath.moveTo(x - poiSize, y)
+                    poiPath.lineTo(x + poiSize, y)
                     ## vertikal cross line
-                    cv2.line(img, (int(round(calc_spots_2d[0,i])), int(round(calc_spots_2d[1,i]) - poiCrossLength)),
-                                  (int(round(calc_spots_2d[0,i])), int(round(calc_spots_2d[1,i]) + poiCrossLength)), self.poiColor, poiCrossThick)
-                    cv2.line(img_overlay, (int(round(calc_spots_2d[0,i])), int(round(calc_spots_2d[1,i]) - poiCrossLength)),
-                                          (int(round(calc_spots_2d[0,i])), int(round(calc_spots_2d[1,i]) + poiCrossLength)), self.poiColor, poiCrossThick)
-
+                    poiPath.moveTo(x, y - poiSize)
+                    poiPath.lineTo(x, y + poiSize)
                 elif poiForm == 1:
-                    cv2.circle(img, (int(round(calc_spots_2d[0,i])), int(round(calc_spots_2d[1,i]))), poiSize, self.poiColor, -1)
-                    cv2.circle(img_overlay, (int(round(calc_spots_2d[0,i])), int(round(calc_spots_2d[1,i]))), poiSize, self.poiColor, -1)
-        img = cv2.addWeighted(img, poiAlpha, img_orig, 1-poiAlpha, 0.0)
-        img_overlay = cv2.addWeighted(img_overlay, poiAlpha, img_overlay_orig, 1-poiAlpha, 0.0)
-        if self.checkBox_writeReport.isChecked():
-            cv2.imwrite(os.path.join(self.workingdir,timestamp+"_correlated.tif"), img)
-        ## back to RGB again for displaying in QT
-        try:
-            img = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
-            img_overlay = cv2.cvtColor(img_overlay,cv2.COLOR_BGR2RGB)
-        except:
-            pass
-        ## Display image
-        if imgSide == 'left':
-            ## reset brightness contrast
-            # self.brightness_left_layer1 = 0
-            # self.contrast_left_layer1 = 10
-            # self.horizontalSlider_brightness.setValue(0)
-            # self.horizontalSlider_contrast.setValue(10)
-
-            # self.img_left_displayed_layer1 = np.copy(img)
-            # self.img_adj_left_layer1 = np.copy(img)
-            self.img_left_overlay = np.copy(img_overlay)
-            self.displayImage(side='left',keepRGB=False)
-        else:
-            ## reset brightness contrast
-            # self.brightness_right_layer1 = 0
-            # self.contrast_right_layer1 = 10
-            # self.horizontalSlider_brightness.setValue(0)
-            # self.horizontalSlider_contrast.setValue(10)
+                    poiPath.addEllipse(QtCore.QPointF(x,y),poiSize,poiSize)
+            if poiForm == 0:
+                poiCrossThick = 1 if poiSize in [1,2,3] else int(round(poiSize*0.33))
+                overlay.addLayer(poiPath,pen=QtGui.QPen(poiColor,poiCrossThick),opacity=poiAlpha)
+            elif poiForm == 1:
+                overlay.addLayer(poiPath,brush=QtGui.QBrush(poiColor),opacity=poiAlpha)
+            ## 95% confidence ellipses of the POIs (see correlation.poi_uncertainty)
+            if self.correlation_results[6] is not None:
+                ellipsePath = QtGui.QPainterPath()
+                for i, (major, minor, angle) in enumerate(correlation.confidence_ellipses(self.correlation_results[6])):
+                    if np.isfinite(major):
+                        ellipse = QtGui.QPainterPath()
+                        ellipse.addEllipse(QtCore.QPointF(0,0),major,minor)
+                        ellipsePath.addPath(QtGui.QTransform().translate(
+                            calc_spots_2d[0,i],calc_spots_2d[1,i]).rotate(angle).map(ellipse))
+                overlay.addLayer(ellipsePath,pen=QtGui.QPen(poiColor,0),opacity=poiAlpha)
+        return overlay
+
+    def showCorrelationOverlay(self,overlay,imgSide):
+        """Display overlay in front of the image of imgSide but behind the markers, replacing the previous one"""
+        overlay.setZValue(-5)
+        scene = self.sceneLeft if imgSide == 'left' else self.sceneRight
+        previous = getattr(self,'overlay_item_{0}'.format(imgSide))
+        ## The previous overlay might belong to the scene of a replaced image
+        if previous is not None and previous.scene() is scene:
+            scene.removeItem(previous)
+        setattr(self,'overlay_item_{0}'.format(imgSide),overlay)
+        scene.addItem(overlay)
+
+    def drawResidualArrows(self,model2D):
+        """Arrows from the clicked 2D markers to the correlated 3D markers of the last correlation"""
+        nrRowsModel2D = model2D.rowCount()
+        markers_2d = self.model2np(model2D,[0,nrRowsModel2D])
+        model2D.tableview._scene.deleteArrows()
+        for i in range(nrRowsModel2D):
+            model2D.tableview._scene.addArrow(markers_2d[i,:2],self.correlation_results[1][:2,i],arrowangle=45,color=QtCore.Qt.red)
 
-            # self.img_right_displayed_layer1 = np.copy(img)
-            # self.img_adj_right_layer1 = np.copy(img)
-            self.img_right_overlay = np.copy(img_overlay)
-            self.displayImage(side='right',keepRGB=False)
+    def resetCorrelation(self):
+        """Stop re-correlating after marker edits (see recorrelate), e.g. when an image or the overlay is reset"""
+        self.recorrelateTimer.stop()
+        self.correlation_live = None
+        self.correlation_markers = None
+        self.correlationWarmStart.reset()
 
-        # self.displayResults(frame=False,framesize=None)
+    def recorrelate(self):
+        """Correlation after a marker edit, warm-started from the last one (see correlation.WarmStart)
+
+        Only the residual arrows, the correlated markers and POIs and the results tab are updated, no report is written
+        and neither POI uncertainties nor held-out residuals are estimated.
+        """
+        if self.correlation_live is None:
+            return
+        model2D, model3D, imageProps, imgSide = self.correlation_live
+        nrRowsModel2D = model2D.rowCount()
+        nrRowsModel3D = model3D.rowCount()
+        if nrRowsModel2D < 3 or nrRowsModel2D > nrRowsModel3D:
+            return
+        try:
+            markers = (self.model2np(model3D,[0,nrRowsModel3D]),self.model2np(model2D,[0,nrRowsModel2D]))
+        except (TypeError, ValueError):
+            ## Cell being edited, not a number (yet)
+            return
+        ## Item changes without coordinate changes (e.g. marker colors) need no correlation
+        if self.correlation_markers is not None and all(
+                a.shape == b.shape and (a == b).all() for a, b in zip(markers, self.correlation_markers)):
+            return
+        self.correlation_markers = markers
+        self.correlation_results = correlation.main(
+                                                markers_3d=self.model2np(model3D,[0,nrRowsModel2D]),
+                                                markers_2d=self.model2np(model2D,[0,nrRowsModel2D]),
+                                                spots_3d=self.model2np(model3D,[nrRowsModel2D,nrRowsModel3D]),
+                                                rotation_center=self.rotation_center,
+                                                results_file='',
+                                                imageProps=imageProps,
+                                                robust='ransac' if self.checkBox_robust.isChecked() else None,
+                                                warm_start=self.correlationWarmStart
+                                                )
+        ## Held-out residuals take a fit per marker, they are only calculated by Correlate (shown as nan until then)
+        self.correlation_loo = None
+        self.showCorrelationOverlay(self.correlationOverlay(),imgSide)
         self.displayResults(frame=self.checkBox_scatterPlotFrame.isChecked(),framesize=self.doubleSpinBox_scatterPlotFrameSize.value())
-        model2D.tableview._scene.deleteArrows()
-        for i in range(nrRowsModel2D):
-            model2D.tableview._scene.addArrow(self.model2np(
-                model2D,[0,nrRowsModel2D])[i,:2],self.correlation_results[1][:2,i],arrowangle=45,color=QtCore.Qt.red)
+        self.drawResidualArrows(model2D)
+
+    def exportOverlay(self,path,imgSide,imgShape):
+        """Saves the projections (max, mean or slab, see comboBox_overlayProjection) of all 3D layers in the pixel grid
+        of the 2D image (imgSide) with the 2D image as first channel. Multichannel stacks (c,z,y,x) are split into their
+        channels. The slab is the z range of the correlated POIs plus/minus spinBox_overlaySlab px."""
+        stackSide = 'right' if imgSide == 'left' else 'left'
+        channels = []
+        for layer in [1,2,3]:
+            stack = getattr(self,'imgstack_{0}_layer{1}'.format(stackSide,layer))
+            if stack is not None:
+                channels.extend(list(stack) if stack.ndim == 4 else [stack])
+        if not channels:
+            return
+        projection = self.comboBox_overlayProjection.currentText()
+        depth = None
+        if projection == 'slab':
+            spots_2d = self.correlation_results[2]
+            if spots_2d is None or spots_2d.shape[1] == 0:
+                QtWidgets.QMessageBox.warning(
+                    self, "Overlay export", "The slab projection needs POIs to place the slab. Overlay not exported.")
+                return
+            halfThickness = self.spinBox_overlaySlab.value()
+            depth = (
+                int(np.floor(spots_2d[2,:].min())) - halfThickness, int(np.ceil(spots_2d[2,:].max())) + halfThickness)
+        image = getattr(self,'img_{0}_layer1'.format(imgSide))[:imgShape[0],:imgShape[1]]
+        exporter = QtCustom.OverlayExporter(path,channels,self.correlation_results[0],image,projection=projection,depth=depth)
+        exporter.signals.finished.connect(lambda path: print(clrmsg.OK + "Correlated overlay saved:", path))
+        exporter.signals.failed.connect(lambda msg: QtWidgets.QMessageBox.critical(
+            self, "Overlay export", "Exporting the correlated overlay failed:\n{0}".format(msg)))
+        QtCore.QThreadPool.globalInstance().start(exporter)
 
     def displayResults(self,frame=False,framesize=None):
         """Populates the result tab with the appropriate information from the correlation result
@@ -2030,20 +2419,33 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
 
             ## Populate tableView_results
             self.modelResults.removeRows(0,self.modelResults.rowCount())
+            ## Held-out residuals (see correlation.leave_one_out)
+            delta2D_loo = getattr(self, "correlation_loo", None)
+            if delta2D_loo is None or delta2D_loo.shape != delta2D.shape:
+                delta2D_loo = np.full(delta2D.shape, np.nan)
             if self.checkBox_resultsAbsolute.isChecked():
                 delta2D = np.absolute(delta2D)
+                delta2D_loo = np.absolute(delta2D_loo)
             for i in range(delta2D.shape[1]):
                 item = [
                     QtGui.QStandardItem(str(i+1)),
                     QtGui.QStandardItem('{0:.5f}'.format(delta2D[0,i])),
-                    QtGui.QStandardItem('{0:.5f}'.format(delta2D[1,i]))]
+                    QtGui.QStandardItem('{0:.5f}'.format(delta2D[1,i])),
+                    QtGui.QStandardItem('{0:.5f}'.format(delta2D_loo[0,i])),
+                    QtGui.QStandardItem('{0:.5f}'.format(delta2D_loo[1,i]))]
+                ## Markers rejected by the robust correlation (not used for the transformation)
+                if getattr(transf, 'inliers', None) is not None and not transf.inliers[i]:
+                    for cell in item:
+                        cell.setForeground(QtGui.QBrush(QtCore.Qt.red))
+                        cell.setToolTip('outlier, not used for the correlation')
                 self.modelResults.appendRow(item)
             self.modelResults.setHeaderData(0, QtCore.Qt.Horizontal,'Nr.')
             self.modelResults.setHeaderData(1, QtCore.Qt.Horizontal,'dx')
-            self.modelResults.setHeaderData(1, QtCore.Qt.Horizontal,'dx')
             self.modelResults.setHeaderData(2, QtCore.Qt.Horizontal,'dy')
-            self.tableView_results.setColumnWidth(1, 86)
-            self.tableView_results.setColumnWidth(2, 86)
+            self.modelResults.setHeaderData(3, QtCore.Qt.Horizontal,'held-out dx')
+            self.modelResults.setHeaderData(4, QtCore.Qt.Horizontal,'held-out dy')
+            for column in range(1,5):
+                self.tableView_results.setColumnWidth(column, 86)
 
         else:
             # QtWidgets.QMessageBox.critical(self, "Error", "No data to display!")
@@ -2090,10 +2492,9 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                 graphicsView.transform().m33(),
                 ))
             if debug is True: print(clrmsg.DEBUG, graphicsView.transform().m11(), graphicsView.transform().m22())
-            ## Center on coordinate
-            graphicsView.centerOn(
-                float(tableView1._model.data(tableView1._model.index(markerNr, 0))),
-                float(tableView1._model.data(tableView1._model.index(markerNr, 1))))
+            ## Center on marker (row -> marker lookup in the scene's marker store)
+            if markerNr < len(tableView1._scene.markers):
+                graphicsView.centerOn(tableView1._scene.markers[markerNr])
 
     def cmTableViewResults(self,pos):
         """Context menu for residuals table (results tab)"""
@@ -2118,10 +2519,8 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
         else:
             tableView = self.tableView_right
             scene = self.sceneRight
-        items = []
-        for item in list(scene.items()):
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                items.append(item)
+        items = scene.markers
+        shifted = []
         if indices:
             ## Filter selected rows
             rows = set(index.row() for index in indices)
@@ -2140,6 +2539,7 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                             tableView._model.index(markerNr, 0)))+self.correlation_results[3][0,markerNr],
                         float(tableView._model.data(
                             tableView._model.index(markerNr, 1)))+self.correlation_results[3][1,markerNr])
+                    shifted.append(items[markerNr])
                     self.modelResults.itemFromIndex(self.modelResultsProxy.mapToSource((
                         self.modelResultsProxy.index(row, 0)))).setBackground(QtGui.QColor(*BackColor))
                     self.modelResults.itemFromIndex(self.modelResultsProxy.mapToSource((
@@ -2152,7 +2552,9 @@ class MainWidget(QtWidgets.QMainWindow, Ui_WidgetWindow):
                         self.modelResultsProxy.index(row, 1)))).setForeground(QtGui.QColor(*ForeColor))
                     self.modelResults.itemFromIndex(self.modelResultsProxy.mapToSource((
                         self.modelResultsProxy.index(row, 2)))).setForeground(QtGui.QColor(*ForeColor))
-        scene.itemsToModel()
+        ## Only the rows of the shifted markers have to be updated
+        for item in shifted:
+            scene.markerToModel(item)
         self.tableView_results.clearSelection()
 
                                                 ##################### END #####################
@@ -2259,6 +2661,8 @@ class Main():
 
 
 if __name__ == "__main__":
+    ## Frozen (PyInstaller) executables start themselves as worker processes (see correlation.poi_uncertainty)
+    multiprocessing.freeze_support()
     if debug is True:
         print(clrmsg.DEBUG + 'Debug Test')
         print(clrmsg.OK + 'OK Test')
@@ -62,6 +62,7 @@ A test dataset can be downloaded here: http://3dct.semper.space/download/3D_corr
 
 import sys
 import os
+import multiprocessing
 import tempfile
 import time
 # For pyinstaller matlab
@@ -71,7 +72,7 @@ import webbrowser
 # GUI imports
 from subprocess import call
 from PyQt5 import QtCore, QtGui, QtWidgets, uic
-from tdct import clrmsg, TDCT_debug, helpdoc, stackProcessing
+from tdct import clrmsg, TDCT_debug, helpdoc, stackProcessing, tiffMetadata
 import TDCT_correlation
 from tools3dct.project_fluo import fluo_project_GUI
 from tools3dct.create_mask import create_mask_GUI
@@ -174,6 +175,21 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
         # Checkbox
         # DEL self.checkBox_cubeVoxels.stateChanged.connect(lambda: self.cubeVoxelsState(self.checkBox_cubeVoxels.isChecked()))
 
+        ## Background jobs (see startJob), queued when more jobs are started than worker threads are available
+        self.jobPool = QtCore.QThreadPool(self)
+        self.jobPool.setMaxThreadCount(2)
+        self.jobs = {}
+        self.jobCounter = 0
+        self.label_jobs = QtWidgets.QLabel(self)
+        self.toolButton_cancelJob = QtWidgets.QToolButton(self)
+        self.toolButton_cancelJob.setText('Cancel')
+        self.toolButton_cancelJob.setPopupMode(QtWidgets.QToolButton.InstantPopup)
+        self.toolButton_cancelJob.setMenu(QtWidgets.QMenu(self))
+        self.toolButton_cancelJob.menu().aboutToShow.connect(self.jobMenu)
+        self.statusbar.addPermanentWidget(self.label_jobs)
+        self.statusbar.addPermanentWidget(self.toolButton_cancelJob)
+        self.jobCtrl()
+
         # Initialize Working directory
         self.workingdir = os.path.expanduser("~")
         self.lineEdit_WorkingDirPath.setText(self.workingdir)
@@ -353,8 +369,14 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
         Exit dialog. If accepted, close other windows first.
         """
         quit_msg = "Are you sure you want to exit the\n3D Correlation Toolbox?\n\nUnsaved data will be lost!"
+        if self.jobs:
+            quit_msg += "\n\n{0} running/queued job(s) will be cancelled.".format(len(self.jobs))
         reply = QtWidgets.QMessageBox.question(self, 'Message', quit_msg, QtWidgets.QMessageBox.Yes, QtWidgets.QMessageBox.No)
         if reply == QtWidgets.QMessageBox.Yes:
+            ## Running jobs stop at their next progress update
+            for jobid in list(self.jobs):
+                self.cancelJob(jobid)
+            self.jobPool.waitForDone()
             ## if loaded, close correlationModul
             if hasattr(self, "correlationModul"):
                 if hasattr(self.correlationModul, "window"):
@@ -404,8 +426,8 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
         sender = self.sender()
         if sender == self.toolButton_ImageStackGetPixelSize:
             try:
-                pixelSizeXY = stackProcessing.pxSize(str(self.lineEdit_ImageStackPath.text()))
-                pixelSizeZ = stackProcessing.pxSize(str(self.lineEdit_ImageStackPath.text()),z=True)
+                meta = tiffMetadata.read(str(self.lineEdit_ImageStackPath.text()))
+                pixelSizeXY, pixelSizeZ = meta.pixelSize, meta.focusStepSize
                 if debug is True: print(clrmsg.DEBUG + "Pixelsize xy/z", pixelSizeXY, pixelSizeZ)
                 if pixelSizeXY:
                     self.doubleSpinBox_ImageStackFocusStepSizeReslized.setValue(pixelSizeXY*1000)
@@ -422,10 +444,9 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
         elif sender == self.toolButton_ImageSequenceGetPixelSize:
             try:
                 print(os.path.join(str(self.lineEdit_ImageSequencePath.text()),"Tile_001-001-000_0-000.tif"))
-                pixelSizeXY = stackProcessing.pxSize(
+                meta = tiffMetadata.read(
                     os.path.join(str(self.lineEdit_ImageSequencePath.text()),"Tile_001-001-000_0-000.tif"))
-                pixelSizeZ = stackProcessing.pxSize(
-                    os.path.join(str(self.lineEdit_ImageSequencePath.text()),"Tile_001-001-000_0-000.tif"),z=True)
+                pixelSizeXY, pixelSizeZ = meta.pixelSize, meta.focusStepSize
                 if debug is True: print(clrmsg.DEBUG + "Pixelsize xy/z", pixelSizeXY, pixelSizeZ)
                 if pixelSizeXY:
                     self.doubleSpinBox_ImageSequenceFocusStepSizeReslized.setValue(pixelSizeXY*1000)
@@ -547,10 +568,8 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
         By default the new resliced image stack is saved in the same direction as the original file. This directory is
         checked for write permission. If it is a read only directory, the user is asked to select a different directory or
         to aboard the process.
+        The reslicing runs as background job (see startJob).
         """
-        self.progressBar_ImageStack.setVisible(True)
-        self.progressBar_ImageStack.setMaximum(0)
-        QtWidgets.QApplication.processEvents()  # Update GUI to display progressbar
         img_path = str(self.lineEdit_ImageStackPath.text())
         customSaveDir = self.checkDirectoryPrivileges(
             os.path.split(img_path)[0],question="Do you want me to save the data to another directory?")
@@ -558,17 +577,10 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
             ss_in = self.doubleSpinBox_ImageStackFocusStepSizeOrig.value()
             ss_out = self.doubleSpinBox_ImageStackFocusStepSizeReslized.value()
             if debug is True: print(clrmsg.DEBUG, img_path, ss_in, ss_out, customSaveDir)
-            self.progressBar_ImageStack.setMaximum(100)
-            QtWidgets.QApplication.processEvents()
-            stackProcessing.main(
-                img_path, ss_in, ss_out, qtprocessbar=self.progressBar_ImageStack,
+            self.startJob(
+                "Reslice {0}".format(os.path.basename(img_path)), self.progressBar_ImageStack, stackProcessing.main,
+                img_path, ss_in, ss_out,
                 interpolationmethod='linear', flip=self.checkBox_ImageStackFlip.isChecked(), saveorigstack=False, showgraph=False, customSaveDir=customSaveDir)
-            self.progressBar_ImageStack.reset()
-            self.progressBar_ImageStack.setVisible(False)
-        else:
-            self.progressBar_ImageStack.setMaximum(100)
-            self.progressBar_ImageStack.reset()
-            self.progressBar_ImageStack.setVisible(False)
 
     def imageSequence(self):
         """
@@ -580,10 +592,8 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
         By default the new merged and/or resliced image stack is saved in the same direction as the original file. This directory is
         checked for write permission. If it is a read only directory, the user is asked to select a different directory or
         to aboard the process.
+        The processing runs as background job (see startJob).
         """
-        self.progressBar_ImageSequence.setVisible(True)
-        self.progressBar_ImageSequence.setMaximum(0)
-        QtWidgets.QApplication.processEvents()
         dirPath = str(self.lineEdit_ImageSequencePath.text())
         customSaveDir = self.checkDirectoryPrivileges(dirPath,question="Do you want me to save the data to another directory?")
         if os.path.isdir(dirPath) and customSaveDir:
@@ -592,67 +602,128 @@ class APP(QtWidgets.QMainWindow, Ui_MainWindow):
                 ss_out = self.doubleSpinBox_ImageSequenceFocusStepSizeReslized.value()
                 if debug is True: print(clrmsg.DEBUG, dirPath, ss_in, ss_out, str(
                     self.checkBox_ImageSequenceSaveOrigStack.isChecked()), customSaveDir)
-                self.progressBar_ImageSequence.setMaximum(100)
-                QtWidgets.QApplication.processEvents()
-                stackProcessing.main(
-                    dirPath, ss_in, ss_out, qtprocessbar=self.progressBar_ImageSequence, interpolationmethod='linear',
+                self.startJob(
+                    "Reslice {0}".format(os.path.basename(os.path.normpath(dirPath))), self.progressBar_ImageSequence,
+                    stackProcessing.main, dirPath, ss_in, ss_out, interpolationmethod='linear',
                     flip=self.checkBox_ImageSequenceFlip.isChecked(), saveorigstack=self.checkBox_ImageSequenceSaveOrigStack.isChecked(),
                     showgraph=False, customSaveDir=customSaveDir)
-                self.progressBar_ImageSequence.reset()
             else:
                 if debug is True: print(clrmsg.DEBUG, 'no reslicing')
-                self.progressBar_ImageSequence.setMaximum(100)
-                QtWidgets.QApplication.processEvents()
-                stackProcessing.main(
-                    dirPath, 0, 0,
-                    qtprocessbar=self.progressBar_ImageSequence,
+                self.startJob(
+                    "Merge {0}".format(os.path.basename(os.path.normpath(dirPath))), self.progressBar_ImageSequence,
+                    stackProcessing.main, dirPath, 0, 0,
                     saveorigstack=True, interpolationmethod='none', customSaveDir=customSaveDir)
-                self.progressBar_ImageSequence.reset()
-                self.progressBar_ImageSequence.setVisible(False)
-        else:
-            self.progressBar_ImageSequence.setMaximum(100)
-            self.progressBar_ImageSequence.reset()
-            self.progressBar_ImageSequence.setVisible(False)
 
     def normalize(self):
-        self.progressBar_Normalize.setVisible(True)
-        self.progressBar_Normalize.setMaximum(0)
-        QtWidgets.QApplication.processEvents()
         img_path = str(self.lineEdit_NormalizePath.text())
         customSaveDir = self.checkDirectoryPrivileges(
             os.path.split(img_path)[0],question="Do you want me to save the data to another directory?")
         if img_path and self.lineEdit_NormalizePath.fileIsTiff is True and customSaveDir:
             if debug is True: print(clrmsg.DEBUG, 'In/out:', img_path, customSaveDir)
-            self.progressBar_Normalize.setMaximum(100)
-            QtWidgets.QApplication.processEvents()
-            stackProcessing.normalize(img_path, qtprocessbar=self.progressBar_Normalize, flip=self.checkBox_NormalizeFlip.isChecked(), customSaveDir=customSaveDir)
-            self.progressBar_Normalize.reset()
-            self.progressBar_Normalize.setVisible(False)
-        else:
-            self.progressBar_Normalize.setMaximum(100)
-            self.progressBar_Normalize.reset()
-            self.progressBar_Normalize.setVisible(False)
+            self.startJob(
+                "Normalize {0}".format(os.path.basename(img_path)), self.progressBar_Normalize, stackProcessing.normalize,
+                img_path, flip=self.checkBox_NormalizeFlip.isChecked(), customSaveDir=customSaveDir)
 
     def mip(self):
-        self.progressBar_Mip.setVisible(True)
-        self.progressBar_Mip.setMaximum(0)
-        QtWidgets.QApplication.processEvents()
         img_path = str(self.lineEdit_MipPath.text())
         customSaveDir = self.checkDirectoryPrivileges(
             os.path.split(img_path)[0],question="Do you want me to save the data to another directory?")
         if img_path and self.lineEdit_MipPath.fileIsTiff is True and customSaveDir:
             if debug is True: print(clrmsg.DEBUG, 'In/out/normalize:', img_path, customSaveDir, self.checkBox_MipNormalize.isChecked())
-            self.progressBar_Mip.setMaximum(100)
-            QtWidgets.QApplication.processEvents()
-            stackProcessing.mip(
-                img_path, qtprocessbar=self.progressBar_Mip,
-                customSaveDir=customSaveDir, flip=self.checkBox_MipFlip.isChecked(), normalize=self.checkBox_MipNormalize.isChecked())
-            self.progressBar_Mip.reset()
-            self.progressBar_Mip.setVisible(False)
+            self.startJob(
+                "MIP {0}".format(os.path.basename(img_path)), self.progressBar_Mip, stackProcessing.mip,
+                img_path, customSaveDir=customSaveDir, flip=self.checkBox_MipFlip.isChecked(), normalize=self.checkBox_MipNormalize.isChecked())
+
+    ## Background jobs
+    def startJob(self, name, progressBar, function, *args, **kwargs):
+        """
+        Queue function(*args, progress=..., cancel=..., **kwargs) as background job. The progress bar shows the progress
+        of the most recently started job using it and is hidden when all of its jobs are done.
+        """
+        self.jobCounter += 1
+        job = Job(self.jobCounter, name, function, *args, **kwargs)
+        job.signals.started.connect(self.jobStarted)
+        job.signals.progress.connect(self.jobProgress)
+        job.signals.finished.connect(self.jobFinished)
+        job.signals.cancelled.connect(self.jobCancelled)
+        self.jobs[job.id] = {'job': job, 'progressBar': progressBar, 'state': 'queued'}
+        progressBar.job = job.id
+        progressBar.setVisible(True)
+        progressBar.setMaximum(0)  # busy indicator until the first progress update
+        self.jobPool.start(job)
+        self.jobCtrl()
+        return job
+
+    def jobCtrl(self):
+        running = len([jobid for jobid in self.jobs if self.jobs[jobid]['state'] == 'running'])
+        queued = len(self.jobs) - running
+        self.label_jobs.setText("Jobs: {0} running, {1} queued".format(running, queued))
+        self.label_jobs.setVisible(bool(self.jobs))
+        self.toolButton_cancelJob.setVisible(bool(self.jobs))
+
+    def jobMenu(self):
+        """Cancel menu of the status bar listing all running and queued jobs"""
+        menu = self.toolButton_cancelJob.menu()
+        menu.clear()
+        for jobid in self.jobs:
+            action = menu.addAction("{0} ({1})".format(self.jobs[jobid]['job'].name, self.jobs[jobid]['state']))
+            action.triggered.connect(lambda checked=False, jobid=jobid: self.cancelJob(jobid))
+        menu.addSeparator()
+        menu.addAction('Cancel all').triggered.connect(lambda: [self.cancelJob(jobid) for jobid in list(self.jobs)])
+
+    def cancelJob(self, jobid):
+        if jobid not in self.jobs:
+            return
+        job = self.jobs[jobid]['job']
+        job.cancel()
+        ## Queued jobs are taken off the queue right away, running jobs stop at their next progress update
+        if self.jobs[jobid]['state'] == 'queued' and self.jobPool.tryTake(job):
+            self.jobCancelled(jobid)
+        else:
+            self.jobs[jobid]['state'] = 'cancelling'
+
+    def jobStarted(self, jobid):
+        if jobid in self.jobs and self.jobs[jobid]['state'] == 'queued':
+            self.jobs[jobid]['state'] = 'running'
+        self.jobCtrl()
+
+    def jobProgress(self, jobid, value):
+        if jobid in self.jobs and self.jobs[jobid]['progressBar'].job == jobid:
+            self.jobs[jobid]['progressBar'].setMaximum(100)
+            self.jobs[jobid]['progressBar'].setValue(value)
+
+    def jobDone(self, jobid):
+        entry = self.jobs.pop(jobid, None)
+        if entry is None:
+            return None
+        progressBar = entry['progressBar']
+        if progressBar.job == jobid:
+            ## Show remaining job of the same tab, if any
+            remaining = [other for other in self.jobs if self.jobs[other]['progressBar'] is progressBar]
+            progressBar.setMaximum(100)
+            progressBar.reset()
+            if remaining:
+                progressBar.job = remaining[-1]
+                progressBar.setMaximum(0)
+            else:
+                progressBar.job = None
+                progressBar.setVisible(False)
+        self.jobCtrl()
+        return entry
+
+    def jobFinished(self, jobid, error):
+        entry = self.jobDone(jobid)
+        if entry is None:
+            return
+        if error:
+            QtWidgets.QMessageBox.warning(self, "Warning", "{0} failed.\n\n{1}".format(entry['job'].name, error))
         else:
-            self.progressBar_Mip.setMaximum(100)
-            self.progressBar_Mip.reset()
-            self.progressBar_Mip.setVisible(False)
+            self.statusbar.showMessage("{0} finished.".format(entry['job'].name), 5000)
+
+    def jobCancelled(self, jobid):
+        entry = self.jobDone(jobid)
+        if entry is not None:
+            self.statusbar.showMessage("{0} cancelled.".format(entry['job'].name), 5000)
 
 
 class MovieSplashScreen(QtWidgets.QSplashScreen):
@@ -707,26 +778,70 @@ class MovieSplashScreen(QtWidgets.QSplashScreen):
         return self.movie.scaledSize()
 
 
-## Class to outsource work to an independent thread. Not used anymore at the moment.
-class GenericThread(QtCore.QThread):
-    def __init__(self, function, *args, **kwargs):
-        QtCore.QThread.__init__(self)
+## Classes to outsource the processing tabs' work to worker threads (see APP.startJob)
+class JobSignals(QtCore.QObject):
+    """Signals of Job (QRunnable is no QObject and cannot emit signals itself)."""
+    started = QtCore.pyqtSignal(int)
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(int, str)
+    cancelled = QtCore.pyqtSignal(int)
+
+
+class Job(QtCore.QRunnable):
+    def __init__(self, jobid, name, function, *args, **kwargs):
+        """
+        Runs function(*args, progress=callback, cancel=stackProcessing.CancelToken, **kwargs) in a worker thread.
+        Start with QThreadPool.start(job). Widgets must not be touched from the worker thread, progress is forwarded
+        to the GUI thread as signal.
+
+        Signals (see self.signals):
+            started:	(job id) when a worker thread picked up the job
+            progress:	(job id, percent)
+            finished:	(job id, error message), the message is empty on success
+            cancelled:	(job id) emitted instead of finished after cancel() was called
+        """
+        super().__init__()
+        self.signals = JobSignals()
+        self.id = jobid
+        self.name = name
         self.function = function
         self.args = args
         self.kwargs = kwargs
+        self.token = stackProcessing.CancelToken()
+
+    def cancel(self):
+        """Stop the job. Checked at the job's next progress update, files written up to then are kept."""
+        self.token.cancel()
 
-    def __del__(self):
-        self.wait()
+    def isCancelled(self):
+        return self.token.isCancelled()
+
+    def progress(self, value):
+        self.signals.progress.emit(self.id, int(value))
 
     def run(self):
-        self.function(*self.args,**self.kwargs)
-        return
+        if self.isCancelled():
+            self.signals.cancelled.emit(self.id)
+            return
+        self.signals.started.emit(self.id)
+        try:
+            self.function(*self.args, progress=self.progress, cancel=self.token, **self.kwargs)
+        except stackProcessing.Cancelled:
+            self.signals.cancelled.emit(self.id)
+            return
+        except Exception as e:
+            print(clrmsg.ERROR + "Job failed:", self.name, e)
+            self.signals.finished.emit(self.id, str(e))
+            return
+        self.signals.finished.emit(self.id, '')
 
 
 ########## Executed when running in standalone ###################################
 ##################################################################################
 
 if __name__ == "__main__":
+    ## Frozen (PyInstaller) executables start themselves as worker processes (see correlation.poi_uncertainty)
+    multiprocessing.freeze_support()
     if debug is True:
         print(clrmsg.DEBUG + 'Debug active')
         print(clrmsg.OK + 'Main imports OK')
@@ -15,6 +15,7 @@ import logging
 import numpy
 import scipy
 import scipy.linalg as linalg
+import scipy.ndimage
 from functools import reduce
 
 class Affine(object):
@@ -35,6 +36,8 @@ class Affine(object):
     Main methods:
 
       - find(): finds a transformation between two sets of points
+      - findBatch(): finds transformations for many pairs of point sets at 
+      once
       - findTwoStep(): finds a transformation between two sets of points in 
       two steps
       - findTranslation(): finds a translation between two sets of points
@@ -76,6 +79,13 @@ class Affine(object):
       'point_dim' (default, so for n points in d dimensions the points 
       matrixs hape is nxd) or 'dim_point' (points shape is dxn).
 
+    Derived quantities (scale, parity, rmsError and the angles and shear of 
+    subclasses) are calculated when first accessed and cached. The cache is 
+    invalidated when gl, d, error or a transformation parameter (q, p, s, m, 
+    u, v) is set. Setting gl directly (not by composeGl()) also marks the 
+    transformation parameters as stale, so they are recalculated by 
+    decompose() when needed. Note that in-place modifications of these 
+    arrays (such as self.gl[0, 1] = 2) are not detected.
     """
 
     ##############################################################
@@ -86,6 +96,11 @@ class Affine(object):
     # Axis that is flipped in case of negative parity
     parity_axis = -1
 
+    # Attributes that invalidate cached derived quantities when set
+    cache_dependencies = (
+        'gl', 'd', 'q', 'p', 's', 'm', 'u', 'v', 'error', '_rmsError', 'order',
+        'xy_axes')
+
     ##############################################################
     #
     # Initialization
@@ -139,6 +154,56 @@ class Affine(object):
         for name in self.param_names:
             self.__setattr__(name, None)
 
+    def __setattr__(self, name, value):
+        """
+        Sets attribute. If the attribute is listed in self.cache_dependencies,
+        removes the cached derived quantities. In addition, setting gl marks 
+        the transformation parameters (q, p, s, m, u, v) as stale, and 
+        setting one of them marks them as current.
+        """
+        if name in self.cache_dependencies:
+            self.__dict__.pop('_cache', None)
+            if name == 'gl':
+                self.__dict__['_stale'] = True
+            elif name in ('q', 'p', 's', 'm', 'u', 'v'):
+                self.__dict__['_stale'] = False
+        object.__setattr__(self, name, value)
+
+    def _getCached(self, name, compute):
+        """
+        Returns the derived quantity name from the cache. If it is not cached,
+        calculates it by calling compute() and saves it in the cache.
+
+        Arrays are returned as copies, so that the cached values can not be 
+        modified.
+
+        Arguments:
+          - name: name of the quantity
+          - compute: function without arguments that calculates the quantity
+        """
+        try:
+            value = self.__dict__['_cache'][name]
+        except KeyError:
+
+            # compute() may decompose, which invalidates the cache
+            value = compute()
+            self.__dict__.setdefault('_cache', {})[name] = value
+
+        if isinstance(value, numpy.ndarray):
+            value = value.copy()
+        return value
+
+    def _getParam(self, name):
+        """
+        Returns transformation parameter name (one of self.param_names). 
+        Decomposes gl (self.decompose()) first if the parameter does not 
+        exist, or if gl was set after the parameters.
+        """
+        if (self.__dict__.get('_stale', False) 
+            or (getattr(self, name, None) is None)):
+            self.decompose()
+        return getattr(self, name)
+
 
     ##############################################################
     #
@@ -228,15 +293,12 @@ class Affine(object):
 
     def getScale(self):
         """
-        Extracts and returns scale. First tries to get scale from self.s. If
-        self.s doesn't exist decomposes this transformation (self.decompose()).
+        Extracts and returns scale from self.s. If self.s doesn't exist, or 
+        if gl was set after it, decomposes this transformation first 
+        (self.decompose()). The result is cached.
         """
-        try:
-            rr = self.s
-        except AttributeError:
-            self.decompose()
-        res = numpy.abs(self.s.diagonal())
-        return res
+        return self._getCached(
+            'scale', lambda: numpy.abs(self._getParam('s').diagonal()))
     scale = property(fget=getScale, doc='Scale vector')
 
     def setScale(self, scale):
@@ -247,21 +309,22 @@ class Affine(object):
           - scale: (1d-array) scale 
         """
         self.s = numpy.diag(scale)
-        self.composeGl()
+        self.recomposeGl()
 
     scale = property(fget=getScale, fset=setScale, doc='scale')
 
     def getParity(self):
         """
         Extracts and returns parity. First tries to get parity from self.p. If
-        self.p doesn't exist, calculates parity from det(self.gl).
+        self.p doesn't exist, or if gl was set after it, calculates parity 
+        from det(self.gl). The result is cached.
         """
-        try:
-            pp = self.p
-        except AttributeError:
-            res = numpy.sign(linalg.det(self.gl))
-        res = self.p.diagonal().prod()
-        return res
+        def compute():
+            if (self.__dict__.get('_stale', False) 
+                or (getattr(self, 'p', None) is None)):
+                return numpy.sign(linalg.det(self.gl))
+            return self.p.diagonal().prod()
+        return self._getCached('parity', compute)
     parity = property(fget=getParity, doc='Parity')
 
     def getTranslation(self):
@@ -276,7 +339,14 @@ class Affine(object):
         Root mean square of the error. 
 
         First tries to calculate it from self.error. If self.error is not
-        defined, returns self._rmsError or None if it doesn't exist) 
+        defined, returns self._rmsError or None if it doesn't exist).
+        The result is cached.
+        """
+        return self._getCached('rmsError', self._computeRMSError)
+
+    def _computeRMSError(self):
+        """
+        Calculates the root mean square error (see getRMSError()).
         """
         try:
             if self.xy_axes == 'point_dim':
@@ -438,6 +508,172 @@ class Affine(object):
         # return
         return inst
         
+    @classmethod
+    def findBatch(cls, x, y, order='qpsm', xy_axes='point_dim', 
+                  x_ref='cm', y_ref='cm'):
+        """
+        Finds affine transformations like find(), but for many sets of points
+        at once. All least square problems and decompositions are solved by
+        stacked (batched) numpy.linalg functions instead of a Python loop,
+        which is much faster for many small sets of points.
+
+        The Gl transformations are obtained using the pseudo-inverse of x 
+        (in the reference frame), which gives the same (minimum norm) 
+        solution as scipy.linalg.lstsq() used in find().
+
+        Arguments:
+          - x, y: stacked sets of points, both having shape 
+          (n_sets, n_points, n_dim) for xy_axes 'point_dim' or 
+          (n_sets, n_dim, n_points) for 'dim_point'
+          - x_ref, y_ref: 'cm' to use center of mass of each set, or 
+          coordinates of reference points, shape (n_dim) or (n_sets, n_dim)
+          - order: gl decomposition order 'qpsm' (same as 'qr'), 'psmq' (same 
+          as 'rq'), or 'usv' (see decompose())
+          - xy_axes: indicates the order of axes in x and y (see find())
+
+        Returns dictionary of stacked arrays (first axis n_sets):
+          - gl: general linear transformation matrices
+          - d: translation vectors
+          - error: difference between y and transformed x values (same shape 
+          as x and y)
+          - rmsError: root mean square errors
+          - q, p, s, m for order 'qpsm', 'qr', 'psmq' or 'rq', or u, p, s, v
+          for order 'usv': decomposition matrices (see decomposeBatch())
+        """
+
+        # bring x and y to n_sets x n_points x n_dim shape 
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        if xy_axes == 'point_dim':
+            pass
+        elif xy_axes == 'dim_point':
+            x = x.transpose(0, 2, 1)
+            y = y.transpose(0, 2, 1)
+        else:
+            raise ValueError(
+                "Argument xy_axes was not understood. Possible values are: "
+                + "'point_dim' and 'dim_point'.")
+
+        # bring x and y to reference frame
+        refs = []
+        for points, ref in [(x, x_ref), (y, y_ref)]:
+            if isinstance(ref, str) and (ref == 'cm'):
+                ref = points.mean(axis=1)
+            elif isinstance(ref, (list, tuple, numpy.ndarray)):
+                ref = numpy.broadcast_to(
+                    numpy.asarray(ref, dtype=float), 
+                    (points.shape[0], points.shape[2]))
+            else:
+                raise ValueError(
+                    'Argument x_ref or y_ref: ', ref, ' was not understood.',
+                    " Allowed values are 'cm', or an array.") 
+            refs.append(ref)
+        x_ref, y_ref = refs
+        x_prime = x - x_ref[:, numpy.newaxis, :]
+        y_prime = y - y_ref[:, numpy.newaxis, :]
+
+        # find gl transformations and translations
+        gl = numpy.matmul(numpy.linalg.pinv(x_prime), y_prime).transpose(0, 2, 1)
+        d = y_ref - numpy.einsum('bij,bj->bi', gl, x_ref)
+
+        # errors
+        error = y - numpy.matmul(x, gl.transpose(0, 2, 1)) - d[:, numpy.newaxis, :]
+        rms_error = numpy.sqrt(numpy.square(error).sum(axis=(1, 2)) 
+                               / float(x.shape[1]))
+        if xy_axes == 'dim_point':
+            error = error.transpose(0, 2, 1)
+        res = {'gl': gl, 'd': d, 'error': error, 'rmsError': rms_error}
+
+        # decompose
+        if (order == 'usv'):
+            names = ['u', 'p', 's', 'v']
+        else:
+            names = ['q', 'p', 's', 'm']
+        res.update(list(zip(names, cls.decomposeBatch(gl=gl, order=order))))
+
+        return res
+
+    @classmethod
+    def decomposeBatch(cls, gl, order='qpsm'):
+        """
+        Decomposes stacked Gl matrices like decompose(), using stacked 
+        (batched) numpy.linalg functions. Gives the same matrices as 
+        decomposeQR() for each of the stacked matrices. Matrices u and v
+        of the singular value decomposition are determined up to the 
+        inherent sign ambiguity of singular vectors, as in decomposeSV() 
+        (with correction 'u').
+
+        Arguments:
+          - gl: (ndarray, shape (n_sets, n_dim, n_dim)) general linear 
+          transformations
+          - order: decomposition order 'qpsm' (same as 'qr'), 'psmq' (same as 
+          'rq'), or 'usv'
+
+        Returns stacked decomposition matrices:
+          - (q, p, s, m) if order 'qpsm', 'qr', 'psmq' or 'rq'
+          - (u, p, s, v) if order 'usv'
+        """
+
+        gl = numpy.asarray(gl, dtype=float)
+        n_sets, ndim = gl.shape[:2]
+        axis = cls.parity_axis
+        identity = numpy.broadcast_to(numpy.identity(ndim), gl.shape)
+
+        if (order == 'qpsm') or (order == 'qr'):
+
+            # gl = q r, then r = p s m
+            q, r = numpy.linalg.qr(gl)
+            r_diag = numpy.diagonal(r, axis1=1, axis2=2)
+            m = r / r_diag[:, :, numpy.newaxis]
+            s_diag = numpy.abs(r_diag)
+            q = q * numpy.sign(r_diag)[:, numpy.newaxis, :]
+
+            # make det(q) > 0, flip the parity axis of q if needed
+            negative = numpy.linalg.det(q) < 0
+            q[negative, :, axis] *= -1 
+
+        elif (order == 'psmq') or (order == 'rq'):
+
+            # rq from qr of the flipped transposed matrix: gl = r q
+            q_t, r_t = numpy.linalg.qr(gl[:, ::-1, :].transpose(0, 2, 1))
+            r = r_t.transpose(0, 2, 1)[:, ::-1, ::-1]
+            q = q_t.transpose(0, 2, 1)[:, ::-1, :]
+            r_diag = numpy.diagonal(r, axis1=1, axis2=2)
+            s_diag = numpy.abs(r_diag)
+            p_diag = numpy.sign(r_diag)
+            m = (r / s_diag[:, :, numpy.newaxis]) * p_diag[:, numpy.newaxis, :]
+            q = q * p_diag[:, :, numpy.newaxis]
+
+            # make det(q) > 0, flip the parity axis of q and m if needed
+            negative = numpy.linalg.det(q) < 0
+            q[negative, axis, :] *= -1 
+            m[negative, axis, :] *= -1 
+            m[negative, :, axis] *= -1 
+
+        elif order == 'usv':
+
+            # gl = u s v, make det(u) and det(v) +1
+            u, s_diag, v = numpy.linalg.svd(gl)
+            u_negative = numpy.linalg.det(u) < 0
+            v_negative = numpy.linalg.det(v) < 0
+            u[u_negative, :, axis] *= -1
+            v[v_negative, axis, :] *= -1
+            negative = u_negative ^ v_negative
+
+        else:
+            raise ValueError("Argument order: " + str(order) + 
+                             " not understood.") 
+
+        # parity and scale matrices
+        p = numpy.array(identity, dtype=int)
+        p[negative, axis, axis] = -1
+        s = identity * s_diag[:, numpy.newaxis, :]
+
+        if order == 'usv':
+            return u, p, s, v
+        else:
+            return q, p, s, m
+
     @classmethod
     def findTwoStep(cls, x, y, x_gl, y_gl, type_='gl', order='qpsm'):
         """
@@ -564,6 +800,220 @@ class Affine(object):
 
         return res
 
+    def getGlD(self, gl=None, d=None):
+        """
+        Returns gl and d of this transformation as arrays, or args gl and d
+        if they are not None. Translation None or 0 means 0 in each coordinate.
+        """
+        if gl is None:
+            gl = self.gl
+        gl = numpy.asarray(gl)
+        if d is None:
+            d = self.d
+        if (d is None) or (numpy.isscalar(d) and (d == 0)):
+            d = numpy.zeros(gl.shape[0])
+        return gl, numpy.asarray(d)
+
+    def transformBatch(self, x, gl=None, d=None, xy_axes=None, inverse=False,
+                       out=None, dtype='float32', chunk=2**20):
+        """
+        Applies transformation defined by gl and d, or its inverse, to a large
+        number of points x (e.g. all voxels of a grid).
+
+        Points are converted to dtype and transformed chunk points at a time,
+        so apart from the output only arrays of the chunk size are allocated.
+        The output can be preallocated (arg out), e.g. as numpy.memmap or
+        to reuse it for several calls.
+
+        Arguments:
+          - x: (ndarray) coordinates of points, n_point x n_dim or
+          n_dim x n_point depending on xy_axes
+          - gl, d: transformation, self.gl and self.d if None (see getGlD)
+          - xy_axes: order of axes in matrices representing points,
+          self.xy_axes if None
+          - inverse: flag indicating whether the inverse transformation
+          is applied
+          - out: (ndarray) output array of the same shape as x, allocated
+          with dtype if None
+          - dtype: dtype used for the calculation
+          - chunk: number of points transformed at once
+
+        Returns: transformed points (out)
+        """
+        if xy_axes is None:
+            xy_axes = self.xy_axes
+        gl, d = self.getGlD(gl=gl, d=d)
+        if inverse:
+            gl = linalg.inv(gl)
+            d = -numpy.dot(gl, d)
+        gl = gl.astype(dtype)
+        d = d.astype(dtype)
+
+        x = numpy.asarray(x)
+        if xy_axes == 'point_dim':
+            n_point = x.shape[0]
+            shape = (n_point, gl.shape[0])
+        elif xy_axes == 'dim_point':
+            n_point = x.shape[1]
+            shape = (gl.shape[0], n_point)
+        else:
+            raise ValueError("Argument xy_axes: " + str(xy_axes) +
+                             " not understood.")
+        if out is None:
+            out = numpy.empty(shape, dtype=dtype)
+        elif out.shape != shape:
+            raise ValueError("Argument out has shape " + str(out.shape) +
+                             " instead of " + str(shape) + ".")
+
+        # transform chunk by chunk
+        for start in range(0, n_point, chunk):
+            stop = min(start + chunk, n_point)
+            if xy_axes == 'point_dim':
+                res = numpy.dot(x[start:stop].astype(dtype, copy=False), gl.T)
+                res += d
+                out[start:stop] = res
+            else:
+                res = numpy.dot(gl, x[:, start:stop].astype(dtype, copy=False))
+                res += numpy.expand_dims(d, 1)
+                out[:, start:stop] = res
+
+        return out
+
+    def backProject(self, x, depth, gl=None, d=None, xy_axes=None,
+                    frame='transformed', dtype='float64', chunk=2**20):
+        """
+        Finds initial points from transformed points given without their
+        last coordinate (e.g. 2D image pixels of a 3D to 2D correlation)
+        and a depth for each point.
+
+        If arg frame is 'transformed', depth is the last coordinate of the
+        transformed points (e.g. z in the rotated frame when resampling a
+        volume) and the points are obtained by the inverse transformation.
+
+        If arg frame is 'initial', depth is the last coordinate of the
+        initial points (e.g. the z slice of a POI in the 3D stack). The other
+        initial coordinates are found by solving
+
+          gl[:-1, :-1] x_init + gl[:-1, -1] depth + d[:-1] = x
+
+        Arguments:
+          - x: (ndarray) transformed coordinates without the last one,
+          n_point x (n_dim-1) or (n_dim-1) x n_point depending on xy_axes
+          - depth: (single number or 1d array of length n_point) depth
+          - gl, d: transformation, self.gl and self.d if None (see getGlD)
+          - xy_axes: order of axes in matrices representing points,
+          self.xy_axes if None
+          - frame: 'transformed' or 'initial', see above
+          - dtype: dtype used for the calculation
+          - chunk: number of points transformed at once (see transformBatch)
+
+        Returns: initial points, n_point x n_dim or n_dim x n_point
+        """
+        if xy_axes is None:
+            xy_axes = self.xy_axes
+        gl, d = self.getGlD(gl=gl, d=d)
+        x = numpy.asarray(x, dtype=dtype)
+        if xy_axes == 'point_dim':
+            x = x.transpose()
+        elif xy_axes != 'dim_point':
+            raise ValueError("Argument xy_axes: " + str(xy_axes) +
+                             " not understood.")
+        depth = numpy.broadcast_to(
+            numpy.asarray(depth, dtype=dtype), x.shape[1:])
+
+        if frame == 'transformed':
+            res = self.transformBatch(
+                x=numpy.vstack([x, depth[numpy.newaxis, :]]), gl=gl, d=d,
+                xy_axes='dim_point', inverse=True, dtype=dtype, chunk=chunk)
+        elif frame == 'initial':
+            rhs = (x - numpy.expand_dims(d[:-1], 1)
+                   - numpy.outer(gl[:-1, -1], depth))
+            res = numpy.vstack(
+                [linalg.solve(gl[:-1, :-1], rhs), depth[numpy.newaxis, :]])
+        else:
+            raise ValueError("Argument frame: " + str(frame) +
+                             " not understood.")
+
+        if xy_axes == 'point_dim':
+            res = res.transpose()
+        return res
+
+    def resample(self, image, shape=None, offset=None, gl=None, d=None,
+                 reverse_axes=False, order=1, cval=0, slab=16, out=None,
+                 dtype='float32'):
+        """
+        Transforms image by this transformation, that is, each output element
+        is interpolated from image at the initial point that is mapped onto
+        the output element.
+
+        Coordinate grids are generated lazily, one slab of slab elements along
+        the first output axis at a time. Because the transformation is affine,
+        initial coordinates along each output axis form an arithmetic
+        progression, so the grid of a slab is calculated from the position of
+        its first element and the (constant) increments along each output
+        axis, without np.indices of the whole output. Peak memory is therefore
+        a few slabs (n_dim float arrays of the slab size) on top of the image
+        and the output.
+
+        Arguments:
+          - image: (ndarray) image to transform
+          - shape: output shape, image.shape if None
+          - offset: coordinates of the first output element, 0 if None
+          - gl, d: transformation, self.gl and self.d if None (see getGlD)
+          - reverse_axes: if False, point coordinate i corresponds to array
+          axis i. If True, it corresponds to array axis n_dim - 1 - i (e.g.
+          points given as x, y, z and images indexed [z, y, x])
+          - order: spline interpolation order (0-5)
+          - cval: value of elements mapped outside image
+          - slab: number of elements along the first output axis
+          interpolated at once
+          - out: (ndarray) preallocated output, allocated with dtype if None
+          - dtype: dtype of the coordinates and of the allocated output
+
+        Returns: transformed image (out)
+        """
+        # inverse transformation in array index order
+        gl, d = self.getGlD(gl=gl, d=d)
+        gl_inv = linalg.inv(gl)
+        d_inv = -numpy.dot(gl_inv, d)
+        if reverse_axes:
+            gl_inv = gl_inv[::-1, ::-1]
+            d_inv = d_inv[::-1]
+        ndim = image.ndim
+        if shape is None:
+            shape = image.shape
+        if offset is None:
+            offset = numpy.zeros(ndim)
+        elif reverse_axes:
+            offset = numpy.asarray(offset)[::-1]
+        if out is None:
+            out = numpy.empty(shape, dtype=dtype)
+
+        # prefilter once for all slabs
+        if order > 1:
+            image = scipy.ndimage.spline_filter(image, order=order)
+
+        # initial point of the first output element and increments along
+        # each output axis
+        start = numpy.dot(gl_inv, offset) + d_inv
+        steps = gl_inv.transpose()
+
+        for first in range(0, shape[0], slab):
+            slab_shape = (min(slab, shape[0] - first),) + tuple(shape[1:])
+            coords = numpy.empty((ndim,) + slab_shape, dtype=dtype)
+            for axis in range(ndim):
+                coords[axis] = start[axis] + first * steps[0, axis]
+                for out_axis in range(ndim):
+                    progression = numpy.arange(
+                        slab_shape[out_axis], dtype=dtype) * steps[out_axis, axis]
+                    expand = [1] * ndim
+                    expand[out_axis] = slab_shape[out_axis]
+                    coords[axis] += progression.reshape(expand)
+            out[first:first+slab_shape[0]] = scipy.ndimage.map_coordinates(
+                image, coords, order=order, cval=cval, prefilter=False)
+
+        return out
+
     ##############################################################
     #
     # Decomposing and composing Gl
@@ -836,6 +1286,18 @@ class Affine(object):
 
         return ret
 
+    def recomposeGl(self, order=None):
+        """
+        Sets self.gl to the general linear transformation composed from the 
+        current transformation parameters (see composeGl()). Unlike setting
+        gl directly, the parameters are not marked as stale.
+
+        Argument:
+          - order: decomposition order, if None self.order is used
+        """
+        self.gl = self.composeGl(order=order)
+        self._stale = False
+
     def composeQR(self, order=None, q=None, p=None, s=None, m=None):
         """
         Makes general linear transformation from elements of 'qpsm' of 
@@ -874,6 +1336,9 @@ class Affine(object):
         else:
             self.gl = gl
 
+            # gl was made from the parameters, so these are not stale
+            self._stale = False
+
     def composeSV(self, order=None, u=None, p=None, s=None, v=None):
         """
         Makes general linear transformation from elements of 'usv' 
@@ -909,6 +1374,9 @@ class Affine(object):
         else:
             self.gl = gl
 
+            # gl was made from the parameters, so these are not stale
+            self._stale = False
+
     ##############################################################
     #
     # Operations of transformations
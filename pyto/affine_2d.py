@@ -223,14 +223,11 @@ class Affine2D(Affine):
 
     def getPhi(self):
         """
-        Rotation angle of matrix self.q in radians.
+        Rotation angle of matrix self.q in radians. Decomposes gl first if 
+        self.q doesn't exist or if gl was set after it. The result is cached.
         """
-        #try:
-        #    qq = self.q
-        #except AttributeError:
-        #    self.decompose(order='qpsm')
-        res = numpy.arctan2(self.q[1,0], self.q[0,0])
-        return res
+        return self._getCached(
+            'phi', lambda: self.getAngle(q=self._getParam('q')))
 
     def setPhi(self, phi):
         """
@@ -240,7 +237,7 @@ class Affine2D(Affine):
         self.q = self.makeQ(phi)
         try:
             gg = self.gl
-            self.gl = self.composeGl()
+            self.recomposeGl()
         except AttributeError:
             pass
 
@@ -262,7 +259,7 @@ class Affine2D(Affine):
         self.q = self.makeQ(phi_rad)
         try:
             gg = self.gl
-            self.gl = self.composeGl()
+            self.recomposeGl()
         except AttributeError:
             pass
     phiDeg = property(fget=getPhiDeg, fset=setPhiDeg, 
@@ -279,7 +276,7 @@ class Affine2D(Affine):
         Sets U matrix (as in usv decomposition) and adjusts gl.
         """
         self.u = self.makeQ(angle)
-        self.gl = self.composeGl()
+        self.recomposeGl()
 
     uAngle = property(fget=getUAngle, fset=setUAngle, 
                    doc='Rotation angle corresponding to matrix U in radians')
@@ -297,7 +294,7 @@ class Affine2D(Affine):
         """
         angle_rad = angle * numpy.pi / 180
         self.u = self.makeQ(angle_rad)
-        self.gl = self.composeGl()
+        self.recomposeGl()
 
     uAngleDeg = property(fget=getUAngleDeg, fset=setUAngleDeg, 
                    doc='Rotation angle corresponding to matrix U in degrees')
@@ -313,7 +310,7 @@ class Affine2D(Affine):
         Sets V matrix (as in usv decomposition) and adjusts gl.
         """
         self.v = self.makeQ(angle)
-        self.gl = self.composeGl()
+        self.recomposeGl()
 
     vAngle = property(fget=getVAngle, fset=setVAngle, 
                    doc='Rotation angle corresponding to matrix V in radians')
@@ -331,7 +328,7 @@ class Affine2D(Affine):
         """
         angle_rad = angle * numpy.pi / 180
         self.v = self.makeQ(angle_rad)
-        self.gl = self.composeGl()
+        self.recomposeGl()
 
     vAngleDeg = property(fget=getVAngleDeg, fset=setVAngleDeg, 
                    doc='Rotation angle corresponding to matrix V in degrees')
@@ -347,12 +344,15 @@ class Affine2D(Affine):
 
         Rotation of an 2D object by this angle around x-axis in 3D is eqivalent
         to scaling this object by self.scale (up to a common scale factor).  
+        The result is cached.
         """
-        ratio = self.scale[1] / self.scale[0]
-        if ratio > 1:
-            ratio = 1. / ratio
-        res = numpy.arccos(ratio)
-        return res
+        def compute():
+            scale = self.scale
+            ratio = scale[1] / scale[0]
+            if ratio > 1:
+                ratio = 1. / ratio
+            return numpy.arccos(ratio)
+        return self._getCached('scaleAngle', compute)
 
     scaleAngle = property(
         fget=getScaleAngle, 
@@ -375,14 +375,10 @@ class Affine2D(Affine):
 
     def getShear(self):
         """
-        Shear
+        Shear. Decomposes gl first if self.m doesn't exist or if gl was set 
+        after it. The result is cached.
         """
-        try:
-            mm = self.m
-        except AttributeError:
-            self.decompose()
-        res = self.m[0, 1]
-        return res
+        return self._getCached('shear', lambda: self._getParam('m')[0, 1])
 
     shear = property(fget=getShear, doc='Shear')
 
@@ -742,6 +738,29 @@ class Affine2D(Affine):
             # just return whatever super.decompose() did
             return decomp
 
+    @classmethod
+    def decomposeBatch(cls, gl, order='qpsm'):
+        """
+        Decomposes stacked Gl matrices like decompose(), using stacked 
+        (batched) numpy.linalg functions (see Affine.decomposeBatch()).
+
+        In case of the singular value decomposition (order='usv'), the angles
+        corresponding to rotation matrices U are set to be between -pi/2 and 
+        pi/2 like in adjustUV().
+        """
+
+        decomp = super(Affine2D, cls).decomposeBatch(gl=gl, order=order)
+        if order == 'usv':
+
+            # rotate u and v by pi where needed
+            u, p, s, v = decomp
+            u_angle = numpy.arctan2(u[:, 1, 0], u[:, 0, 0])
+            adjust = (u_angle > numpy.pi / 2) | (u_angle < -numpy.pi / 2)
+            u[adjust] *= -1
+            v[adjust] *= -1
+
+        return decomp
+
     def adjustUV(self):
         """
         In case of the singular value decomposition (order='usv'), the angle
@@ -761,5 +780,5 @@ class Affine2D(Affine):
             self.vAngle += numpy.pi
 
             # compose (should not decompose)
-            self.gl = self.composeGl(order='usv')
+            self.recomposeGl(order='usv')
 
@@ -329,6 +329,73 @@ class Rigid3D(Affine):
             else:
                 best = rigid_cm_2
            
+        # get translation
+        cls._set_translation_32(best, x=x, x_cm=x_cm, y_cm=y_cm)
+
+        # ToDo: see about modifying and returning all
+
+        return best
+
+    @classmethod
+    def find_32_local(
+            cls, x, y, init, scale=None, use_jac=True, maxiter=1000, 
+            disp=True):
+        """
+        Finds optimal 3D transformation like find_32(), but using a single
+        local optimization started from the parameters of a known 
+        transformation (arg init), such as the solution for a slightly 
+        different set of points. 
+
+        This is much faster than find_32() because no multiple (random) 
+        initial conditions are tried, but it finds the optimal solution 
+        only if init is close enough to it. Compare optimizeResult.fun of 
+        the result with that of a full find_32() if in doubt.
+
+        Arguments:
+          - x: initial points coordinates (3 x n_points martix)
+          - y: final points coordinates (2 x n_points matrix)
+          - init: transformation (instance of this class) whose ck 
+          and s_scalar attributes are used as initial parameters, or
+          (list or ndarray) initial Caley-Klein parameters followed by the
+          scale (if arg scale is None)
+          - scale: if None the optimization also solves for scale, otherwise
+          scale fixed at the specified factor
+          - use_jac, maxiter, disp: passed to find_32_constr_ck()
+
+        Returns transformation like find_32()
+        """
+
+        # initial parameters
+        if isinstance(init, Rigid3D):
+            ck = getattr(init, 'ck', None)
+            if ck is None:
+                ck = cls.euler_to_ck(
+                    cls.extract_euler(init.q, mode='x', ret='one'), mode='x')
+            if scale is None:
+                init = np.hstack((ck, [init.s_scalar]))
+            else:
+                init = np.asarray(ck)
+
+        # convert to cm coords
+        x_cm = x.mean(axis=-1).reshape((3,1))
+        y_cm = y.mean(axis=-1).reshape((2,1))
+
+        # optimize
+        best = cls.find_32_constr_ck(
+            x=x - x_cm, y=y - y_cm, scale=scale, init=init, cm=False,
+            use_jac=use_jac, maxiter=maxiter, disp=disp)
+        cls._set_translation_32(best, x=x, x_cm=x_cm, y_cm=y_cm)
+
+        return best
+
+    @classmethod
+    def _set_translation_32(cls, best, x, x_cm, y_cm):
+        """
+        Sets translation (attribute d) and transformed initial points 
+        (attribute y, in the original, not center of mass frame) of 
+        transformation best found in center of mass coordinates.
+        """
+
         # get translation
         translation_2 = (
             y_cm - best.s_scalar * np.dot(best.q[0:2,:], x_cm))
@@ -341,10 +408,232 @@ class Rigid3D(Affine):
         best.d = translation.reshape(3)
         best.y = y_3
 
-        # ToDo: see about modifying and returning all
+    @classmethod
+    def find_32_robust(
+            cls, x, y, mode='ransac', threshold=5., trim=0.2, scale=None,
+            confidence=0.99, max_hypotheses=10000, batch=256, max_refine=10,
+            seed=None, use_jac=True, maxiter=1000):
+        """
+        Finds optimal 3D transformation like find_32(), but robust to
+        outliers (such as a mis-clicked marker) in the initial (x) and 
+        final (y) points.
+
+        Transformation hypotheses are calculated from many random minimal 
+        samples of 4 points. For each sample, the 2D affine camera (2x3 
+        matrix and translation) is solved exactly and projected onto the
+        closest scaled rotation (rows of equal length orthogonal to each 
+        other). Samples whose points lie on a plane give two hypotheses 
+        based on the 2D affine (gl2) solution (see _hypotheses_32()). All 
+        points are scored for all hypotheses of a batch
+        at once (vectorized). The number of hypotheses adapts to the
+        inlier ratio of the best hypothesis so far (standard RANSAC
+        estimate for arg confidence), limited by max_hypotheses.
+
+        The transformation is then refined on the inliers of the best 
+        hypothesis by the constrained optimization (find_32_local() started
+        from the hypothesis and find_32() started from the 2D affine 
+        (gl2) solutions, the better one is retained), and the inliers are 
+        recalculated for the refined transformation until they don't change 
+        (at most max_refine times).
+
+        Modes:
+          - 'ransac': hypotheses are scored by the sum of squared 
+          differences truncated at threshold (MSAC), inliers are points 
+          that differ less than threshold 
+          - 'trimmed': hypotheses are scored by the sum of squared 
+          differences of the best fitting (1 - trim) fraction of points 
+          (least trimmed squares), these points are inliers
+
+        Arguments:
+          - x: initial points coordinates (3 x n_points martix)
+          - y: final points coordinates (2 x n_points matrix)
+          - mode: 'ransac' or 'trimmed'
+          - threshold: inlier distance (in y units) for 'ransac' mode
+          - trim: fraction of points rejected in 'trimmed' mode
+          - scale: if None the optimization also solves for scale, otherwise
+          scale fixed at the specified factor
+          - confidence: probability that at least one sample contains 
+          only inliers, determines the number of hypotheses 
+          - max_hypotheses: max number of hypotheses
+          - batch: number of hypotheses scored at once
+          - max_refine: max number of refinements
+          - seed: random seed (passed to numpy.random.default_rng())
+          - use_jac, maxiter: passed to find_32_constr_ck()
+
+        Returns transformation like find_32(), with additional attributes:
+          - inliers: (boolean ndarray, n_points) points used for the final
+          refinement
+          - n_hypotheses: number of hypotheses scored
+
+        If there are not enough points for an outlier to be detected (less
+        than 6), find_32() is used for all points.
+        """
+
+        # check arguments
+        if mode not in ('ransac', 'trimmed'):
+            raise ValueError(
+                "Argument mode " + str(mode) + " was not understood")
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n_points = x.shape[1]
+        sinit = 'gl2' if scale is None else 1.
+        if n_points < 6:
+            best = cls.find_32(
+                x=x, y=y, scale=scale, einit='gl2', sinit=sinit,
+                use_jac=use_jac, maxiter=maxiter)
+            best.inliers = np.ones(n_points, dtype=bool)
+            best.n_hypotheses = 0
+            return best
+        n_keep = max(n_points - int(np.ceil(trim * n_points)), 5)
+        sq_threshold = threshold ** 2
+
+        def inliers_of(sq_diff):
+            if mode == 'ransac':
+                return sq_diff < sq_threshold
+            inliers = np.zeros(n_points, dtype=bool)
+            inliers[np.argsort(sq_diff)[:n_keep]] = True
+            return inliers
+
+        # score hypotheses from minimal samples
+        rng = np.random.default_rng(seed)
+        best_cost = np.inf
+        best_hyp = None
+        n_hypotheses = 0
+        needed = max_hypotheses
+        while n_hypotheses < min(needed, max_hypotheses):
+            samples = rng.random((batch, n_points)).argsort(axis=1)[:, :4]
+            gl, d = cls._hypotheses_32(x=x, y=y, samples=samples, scale=scale)
+            n_hypotheses += len(gl)
+            sq_diff = np.square(
+                np.einsum('hij,jn->hin', gl, x) + d[:, :, np.newaxis]
+                - y).sum(axis=1)
+            if mode == 'ransac':
+                cost = np.minimum(sq_diff, sq_threshold).sum(axis=1)
+            else:
+                cost = np.partition(
+                    sq_diff, n_keep - 1, axis=1)[:, :n_keep].sum(axis=1)
+            ind = np.argmin(cost)
+            if cost[ind] < best_cost:
+                best_cost = cost[ind]
+                best_hyp = (gl[ind], d[ind], sq_diff[ind])
+
+                # adapt number of hypotheses to the inlier ratio
+                ratio = inliers_of(sq_diff[ind]).sum() / float(n_points)
+                if ratio >= 1:
+                    needed = 0
+                elif ratio > 0:
+                    needed = (np.log(1 - confidence) 
+                              / np.log(1 - ratio ** 4))
+
+        # refine on inliers
+        gl_hyp, d_hyp, sq_diff = best_hyp
+        s_hyp = np.sqrt(np.square(gl_hyp).sum() / 2.)
+        r_hyp = np.vstack(
+            (gl_hyp / s_hyp, np.cross(gl_hyp[0], gl_hyp[1]) / s_hyp**2))
+        r_hyp = np.clip(r_hyp, -1, 1)
+        init = cls.euler_to_ck(
+            cls.extract_euler(r_hyp, mode='x', ret='one'), mode='x')
+        if scale is None:
+            init = np.hstack((init, [s_hyp]))
+        inliers = inliers_of(sq_diff)
+        if inliers.sum() < 3:
+            inliers = np.ones(n_points, dtype=bool)
+        for refine in range(max_refine):
+            best = cls.find_32_local(
+                x=x[:, inliers], y=y[:, inliers], init=init, scale=scale,
+                use_jac=use_jac, maxiter=maxiter)
+            if refine == 0:
+                gl2 = cls.find_32(
+                    x=x[:, inliers], y=y[:, inliers], scale=scale, 
+                    einit='gl2', sinit=sinit, use_jac=use_jac, maxiter=maxiter)
+                if gl2.optimizeResult.fun < best.optimizeResult.fun:
+                    best = gl2
+            init = best
+            sq_diff = np.square(best.transform(x=x)[:2, :] - y).sum(axis=0)
+            new_inliers = inliers_of(sq_diff)
+            best.inliers = inliers
+            if (new_inliers == inliers).all() or (new_inliers.sum() < 3):
+                break
+            inliers = new_inliers
+        best.n_hypotheses = n_hypotheses
 
         return best
 
+    @classmethod
+    def _hypotheses_32(cls, x, y, samples, scale=None):
+        """
+        Minimal solver for find_32_robust(). For each sample of 4 points, 
+        the 2D affine camera (y = a x + t, a is 2x3) is solved exactly and
+        a is projected onto the closest scaled rotation s r[:2,:] (singular
+        values of a replaced by their mean, or by scale if specified). 
+        Translation is set so that sample centers match.
+
+        Samples whose points x lie (almost) on one plane don't determine
+        a. For these, the 2D affine transformation of the x and y 
+        components is solved instead and converted to both 3D rotations 
+        like in approx_gl2_to_ck3() (exact if the plane is a z-plane), so 
+        they yield two hypotheses each.
+
+        Arguments:
+          - x: initial points coordinates (3 x n_points martix)
+          - y: final points coordinates (2 x n_points matrix)
+          - samples: (n_samples x 4) indices of points
+          - scale: fixed scale, None to use the scale of a
+
+        Returns (gl, d): gl (n_hypotheses x 2 x 3) the first two rows of 
+        s r and d (n_hypotheses x 2) translations.
+        """
+
+        # sample coordinates (n_samples x 4 x 3 and 2), in cm frame
+        x_s = x.transpose()[samples]
+        y_s = y.transpose()[samples]
+        x_cm = x_s.mean(axis=1)
+        y_cm = y_s.mean(axis=1)
+        x_s = x_s - x_cm[:, np.newaxis, :]
+        y_s = y_s - y_cm[:, np.newaxis, :]
+        sv_x = np.linalg.svd(x_s, compute_uv=False)
+        planar = sv_x[:, 2] < 1e-3 * sv_x[:, 0]
+
+        # exact affine camera and closest scaled rotation 
+        a = np.matmul(np.linalg.pinv(x_s[~planar]), y_s[~planar])
+        u, sv, v = np.linalg.svd(
+            a.transpose(0, 2, 1), full_matrices=False)
+        if scale is None:
+            s = sv.mean(axis=-1)
+        else:
+            s = np.full(len(sv), float(scale))
+        gl = [s[:, np.newaxis, np.newaxis] * np.matmul(u, v)]
+        d = [y_cm[~planar]]
+        x_cm_all = [x_cm[~planar]]
+
+        # planar: gl2 and the two rotations (+theta and -theta) 
+        if planar.any():
+            gl2 = np.matmul(
+                np.linalg.pinv(x_s[planar][:, :, :2]), y_s[planar])
+            u, sv, v = np.linalg.svd(gl2.transpose(0, 2, 1))
+            if scale is not None:
+                sv = np.minimum(sv, float(scale))
+                sv[:, 0] = scale
+            h = np.sqrt(np.maximum(sv[:, 0]**2 - sv[:, 1]**2, 0))
+            v_3 = np.zeros((len(v), 3, 3))
+            v_3[:, :2, :2] = v
+            v_3[:, 2, 2] = 1
+            for sign in [1, -1]:
+                m = np.zeros((len(sv), 2, 3))
+                m[:, 0, 0] = sv[:, 0]
+                m[:, 1, 1] = sv[:, 1]
+                m[:, 1, 2] = sign * h
+                gl.append(np.matmul(u, np.matmul(m, v_3)))
+                d.append(y_cm[planar])
+                x_cm_all.append(x_cm[planar])
+
+        # translation
+        gl = np.concatenate(gl)
+        d = np.concatenate(d) - np.einsum(
+            'hij,hj->hi', gl, np.concatenate(x_cm_all))
+
+        return gl, d
+
     @classmethod
     def find_32_constr_ck_multi(
             cls, x, y, scale=None, cm=False, use_jac=True,
@@ -489,7 +778,7 @@ class Rigid3D(Affine):
     @classmethod
     def find_32_constr_ck(
             cls, x, y, scale=None, init=None, cm=False, use_jac=True, 
-            maxiter=1000):
+            maxiter=1000, disp=True):
         """
         Finds rigid transformation in 3D that transforms points x (initial) 
         into points y (final) when only the first two coordinates are given 
@@ -526,6 +815,8 @@ class Rigid3D(Affine):
           function (recommended)
           - maxiter: maximum number of iterations for the optimization
           procedure (same as arg maxiter of sp.optimize.minimize())
+          - disp: flag indicating if the optimization report is printed
+          (set to False for many fits, such as resampling)
 
         Returns transformation (instance of this group) with attributes:
           - ql: general linear matrix (in this case gl = s q)
@@ -647,7 +938,7 @@ class Rigid3D(Affine):
         # solve
         res = sp.optimize.minimize(
             sq_diff_ck, init, jac=jac, constraints=constr_ck_norm,
-            options={'disp': True, 'maxiter' : maxiter})
+            options={'disp': disp, 'maxiter' : maxiter})
 
         # optimized parameters
         e_params = res.x[:4]
@@ -1168,6 +1459,29 @@ class Rigid3D(Affine):
  
         return y
 
+    def getGlD(self, gl=None, d=None):
+        """
+        Returns gl and d of this transformation as arrays, or args gl and d
+        if they are not None. If gl is None, gl is composed from self.q and
+        self.s_scalar when they are set.
+        """
+        if ((gl is None) and (getattr(self, 'q', None) is not None)
+            and (getattr(self, 's_scalar', None) is not None)):
+            gl = self.s_scalar * np.asarray(self.q)
+        return Affine.getGlD(self, gl=gl, d=d)
+
+    def get_euler(self, mode='x'):
+        """
+        Returns Euler angles (in rad) of rotation self.q, as extract_euler()
+        with ret='one'. The result is cached until q is set (see Affine).
+
+        Argument:
+          - mode: Euler angles convention
+        """
+        return self._getCached(
+            'euler_' + mode, 
+            lambda: self.extract_euler(r=self.q, mode=mode, ret='one'))
+
     def recalculate_translation(self, rotation_center):
         """
         Recalculates translation when the current transformation is
@@ -14,6 +14,7 @@ import unittest
 import numpy
 import numpy.testing as np_test 
 import scipy
+import scipy.ndimage
 
 from pyto.affine import Affine
 from pyto.affine_2d import Affine2D
@@ -73,6 +74,64 @@ class TestAffine(np_test.TestCase):
         desired = numpy.inner(self.x1, af.gl) + af.d
         np_test.assert_almost_equal(self.y1m, desired)
         
+    def testFindBatch(self):
+        """
+        Tests findBatch() and decomposeBatch()
+        """
+
+        # stacked sets, compare with find() for each
+        x = numpy.array([self.x1, self.x2, self.x1, self.x2])
+        y = numpy.array([self.y1, self.y2, self.y1m, self.y2m])
+        for order in ['qpsm', 'psmq', 'usv']:
+            res = Affine.findBatch(x=x, y=y, order=order)
+            for index in range(len(x)):
+                desired = Affine.find(x=x[index], y=y[index], order=order)
+                np_test.assert_almost_equal(res['gl'][index], desired.gl)
+                np_test.assert_almost_equal(res['d'][index], desired.d)
+                np_test.assert_almost_equal(
+                    res['error'][index], desired.error)
+                np_test.assert_almost_equal(
+                    res['rmsError'][index], desired.rmsError)
+                if order == 'usv':
+
+                    # u and v up to the sign ambiguity of svd
+                    np_test.assert_almost_equal(res['s'][index], desired.s)
+                    np_test.assert_almost_equal(res['p'][index], desired.p)
+                    usv = numpy.dot(
+                        numpy.dot(res['u'][index], res['p'][index]), 
+                        numpy.dot(res['s'][index], res['v'][index]))
+                    np_test.assert_almost_equal(usv, desired.gl)
+
+                else:
+                    for name in ['q', 'p', 's', 'm']:
+                        np_test.assert_almost_equal(
+                            res[name][index], getattr(desired, name))
+
+        # dim_point, fixed reference
+        res = Affine.findBatch(
+            x=x.transpose(0, 2, 1), y=y.transpose(0, 2, 1), 
+            xy_axes='dim_point', x_ref=[0, 0], y_ref=[0, 0])
+        desired = Affine.find(
+            x=self.x2.transpose(), y=self.y2.transpose(), xy_axes='dim_point',
+            x_ref=numpy.array([0, 0]), y_ref=numpy.array([0, 0]))
+        np_test.assert_almost_equal(res['gl'][1], desired.gl)
+        np_test.assert_almost_equal(res['error'][1], desired.error)
+
+        # 3D, proper rotations and parity
+        gl = numpy.array([[[1., 2, 0], [0, 1, 3], [1, 0, 1]],
+                          [[-1, 0, 0], [0, 2, 1], [0, 1, 1]]])
+        for order in ['qpsm', 'psmq', 'usv']:
+            first, p, s, last = Affine.decomposeBatch(gl=gl, order=order)
+            np_test.assert_almost_equal(numpy.linalg.det(first), [1, 1])
+            np_test.assert_equal(p.diagonal(axis1=1, axis2=2).prod(axis=1), 
+                                 numpy.sign(numpy.linalg.det(gl)))
+            ps = numpy.matmul(p, s)
+            if order == 'psmq':
+                composed = numpy.matmul(numpy.matmul(ps, last), first)
+            else:
+                composed = numpy.matmul(numpy.matmul(first, ps), last)
+            np_test.assert_almost_equal(composed, gl)
+
     def testFindTranslation(self):
         """
         Tests findTranslation()
@@ -322,6 +381,73 @@ class TestAffine(np_test.TestCase):
         desired = numpy.inner(self.x1, af.gl) + af.d
         np_test.assert_almost_equal(af.transform(self.x1), desired)
 
+    def testTransformBatch(self):
+        """
+        Tests transformBatch() method
+        """
+        af = Affine.find(x=self.x1, y=self.y1m)
+        x = numpy.random.random((1000, 2)) * 100
+
+        # chunks, float32
+        y = af.transformBatch(x, chunk=37)
+        np_test.assert_equal(y.dtype, numpy.dtype('float32'))
+        np_test.assert_almost_equal(y, af.transform(x), decimal=3)
+
+        # preallocated output, inverse
+        out = numpy.zeros((1000, 2))
+        res = af.transformBatch(
+            af.transform(x), inverse=True, out=out, dtype='float64', chunk=100)
+        np_test.assert_equal(res is out, True)
+        np_test.assert_almost_equal(out, x)
+
+        # dim_point
+        np_test.assert_almost_equal(
+            af.transformBatch(x.transpose(), xy_axes='dim_point'),
+            af.transform(x).transpose(), decimal=3)
+
+    def testBackProject(self):
+        """
+        Tests backProject() method
+        """
+        af = Affine.find(x=self.x1, y=self.y1m)
+        y = af.transform(self.x2)
+
+        # depth in the transformed frame
+        np_test.assert_almost_equal(
+            af.backProject(y[:, :1], depth=y[:, 1]), self.x2)
+
+        # depth in the initial frame
+        np_test.assert_almost_equal(
+            af.backProject(y[:, :1], depth=self.x2[:, 1], frame='initial'),
+            self.x2)
+
+    def testResample(self):
+        """
+        Tests resample() method
+        """
+
+        # pure translation by whole pixels
+        image = numpy.arange(48.).reshape(6, 8)
+        af = Affine(gl=numpy.identity(2), d=[1, 2])
+        res = af.resample(image, slab=4)
+        np_test.assert_almost_equal(res[1:, 2:], image[:-1, :-2])
+        np_test.assert_almost_equal(res[0], 0)
+
+        # general transformation, same as scipy.ndimage.affine_transform
+        af = Affine.find(x=self.x1, y=self.y1m)
+        gl_inv = numpy.linalg.inv(af.gl)
+        desired = scipy.ndimage.affine_transform(
+            image, gl_inv, offset=-numpy.dot(gl_inv, af.d), output_shape=(9, 7),
+            order=3)
+        np_test.assert_almost_equal(
+            af.resample(image, shape=(9, 7), order=3, slab=2, dtype='float64'),
+            desired)
+
+        # output starting at offset
+        full = af.resample(image, shape=(9, 7))
+        np_test.assert_almost_equal(
+            af.resample(image, shape=(4, 7), offset=[5, 0]), full[5:])
+
     def testRemoveMasked(self):
         """
         Tests removeMasked()
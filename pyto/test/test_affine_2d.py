@@ -9,6 +9,8 @@ Tests module affine_2d
 __version__ = "$Revision: 1152 $"
 
 from copy import copy, deepcopy
+import os
+import time
 import unittest
 
 import numpy
@@ -306,6 +308,87 @@ class TestAffine2D(np_test.TestCase):
         np_test.assert_almost_equal(af3.scaleAngle, numpy.arccos(0.25))
         np_test.assert_almost_equal(af3.d, self.af3_d)
 
+    def testFindBatch(self):
+        """
+        Tests findBatch() with usv decomposition
+        """
+
+        x = numpy.array([self.x1, self.x2, self.x3, self.x1])
+        y = numpy.array([self.y1, self.y2, self.y3, self.y1m])
+        res = Affine2D.findBatch(x=x, y=y, order='usv')
+        for index in range(len(x)):
+            desired = Affine2D.find(x=x[index], y=y[index])
+            desired.decompose(order='usv')
+            for name in ['gl', 'u', 'p', 's', 'v']:
+                np_test.assert_almost_equal(
+                    res[name][index], getattr(desired, name))
+        np_test.assert_almost_equal(
+            Affine2D.getAngle(res['v'][2]) * 180 / numpy.pi, 
+            self.af3_vAngleDeg)
+
+    def testDerivedCache(self):
+        """
+        Tests caching of derived quantities and the invalidation of the
+        cache when gl, d, error or parameters are set
+        """
+
+        af = Affine2D.find(x=self.x1, y=self.y1)
+        np_test.assert_almost_equal(af.phi, self.af1_phi)
+        np_test.assert_almost_equal(af.scale, self.af1_scale)
+        np_test.assert_equal(af.parity, 1)
+        np_test.assert_almost_equal(af.shear, 0)
+        np_test.assert_almost_equal(af.rmsError, 0)
+
+        # cached arrays can not be modified from outside
+        scale = af.scale
+        scale[0] = 10
+        np_test.assert_almost_equal(af.scale, self.af1_scale)
+
+        # setting gl makes the parameters stale
+        af.gl = self.af1m_gl
+        np_test.assert_almost_equal(af.phi, self.af1m_phi)
+        np_test.assert_equal(af.parity, -1)
+        np_test.assert_almost_equal(af.q, self.af1m_q)
+
+        # setters recompose gl, parameters are kept
+        af.phi = self.af1_phi
+        np_test.assert_almost_equal(af.phi, self.af1_phi)
+        np_test.assert_almost_equal(af.gl, [[2, 1], [1, -2]])
+        af.scale = [1, 2]
+        np_test.assert_almost_equal(af.scale, [1, 2])
+        np_test.assert_almost_equal(af.scaleAngle, numpy.pi / 3)
+        np_test.assert_almost_equal(
+            af.gl, numpy.dot(af.makeQ(self.af1_phi), numpy.diag([1, -2])))
+
+        # error
+        af.error = numpy.array([[3., 0], [0, 4]])
+        np_test.assert_almost_equal(af.rmsError, numpy.sqrt(12.5))
+
+    @unittest.skipUnless(
+        os.environ.get('TDCT_BENCHMARK'), "set TDCT_BENCHMARK=1 to run")
+    def testDerivedCacheBenchmark(self):
+        """
+        Times repeated access of derived quantities with and without 
+        decomposing gl each time (prints with pytest -s)
+        """
+
+        af = Affine2D.find(x=self.x2, y=self.y2)
+        names = ['phi', 'scale', 'parity', 'shear', 'scaleAngle', 'rmsError']
+        n_repeat = 2000
+        start = time.perf_counter()
+        for index in range(n_repeat):
+            af.gl = af.gl
+            values = [getattr(af, name) for name in names]
+        uncached = time.perf_counter() - start
+        start = time.perf_counter()
+        for index in range(n_repeat):
+            values = [getattr(af, name) for name in names]
+        cached = time.perf_counter() - start
+        print("\nDerived quantities, {0} accesses: {1:.1f} ms decomposing, "
+              "{2:.1f} ms cached".format(
+                  n_repeat * len(names), 1000 * uncached, 1000 * cached))
+        np_test.assert_almost_equal(values[0], self.af2_phi)
+
     def testFindRS(self):
         """
         Tests find (transform 'rs'), decompose individual parameters and
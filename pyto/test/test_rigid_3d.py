@@ -922,6 +922,77 @@ class TestRigid3D(np_test.TestCase):
         np_test.assert_almost_equal(res.optimizeResult.fun, 0, decimal=3)
         np_test.assert_almost_equal(res.y[:2,:], y[:2,:], decimal=3)
 
+    def test_find_32_local(self):
+        """
+        Tests find_32_local()
+        """
+
+        # exact points
+        x = np.array([[0., 1, 0, 0, 2],
+                      [0, 0, 2, 0, 1],
+                      [0, 0, 0, 3, 1]]) * 10
+        angles = np.array([50, 40, -30]) * np.pi / 180
+        r = Rigid3D.make_r_euler(angles, mode='x')
+        y = (2. * np.dot(r, x) + np.array([[3.], [4], [0]]))[:2]
+        full = Rigid3D.find_32(
+            x=x, y=y, randome=True, einit='gl2', randoms=True, sinit='gl2')
+
+        # start from the full solution for slightly moved points
+        y_moved = y.copy()
+        y_moved[:, 0] += 0.2
+        res = Rigid3D.find_32_local(x=x, y=y_moved, init=full)
+        desired = Rigid3D.find_32(
+            x=x, y=y_moved, randome=True, einit='gl2', randoms=True,
+            sinit='gl2')
+        np_test.assert_almost_equal(res.gl, desired.gl, decimal=3)
+        np_test.assert_almost_equal(res.d, desired.d, decimal=2)
+        np_test.assert_almost_equal(res.y[:2], desired.y[:2], decimal=2)
+
+        # init as parameters, fixed scale
+        res = Rigid3D.find_32_local(x=x, y=y, init=full.ck, scale=2.)
+        np_test.assert_almost_equal(res.s_scalar, 2.)
+        np_test.assert_almost_equal(res.gl, full.gl, decimal=3)
+
+    def test_find_32_robust(self):
+        """
+        Tests find_32_robust()
+        """
+
+        # points with noise and two outliers
+        rng = np.random.RandomState(3)
+        x = rng.rand(3, 15) * np.array([[400], [400], [60]])
+        angles = np.array([20, 60, -40]) * np.pi / 180
+        r = Rigid3D.make_r_euler(angles, mode='x')
+        y = (1.5 * np.dot(r, x) + np.array([[30.], [-20], [0]]))[:2]
+        y = y + rng.randn(2, 15) * 0.3
+        y[:, 4] += [20, 10]
+        y[:, 11] += [-8, 25]
+        desired = np.ones(15, dtype=bool)
+        desired[[4, 11]] = False
+
+        # ransac
+        res = Rigid3D.find_32_robust(x=x, y=y, seed=0)
+        np_test.assert_equal(res.inliers, desired)
+        np_test.assert_almost_equal(res.q, r, decimal=2)
+        np_test.assert_almost_equal(res.s_scalar, 1.5, decimal=2)
+        np_test.assert_equal(res.rmsError < 1, True)
+        np_test.assert_equal(res.n_hypotheses < 1000, True)
+
+        # trimmed, outliers rejected with the worst inliers
+        res = Rigid3D.find_32_robust(x=x, y=y, mode='trimmed', trim=0.2)
+        np_test.assert_equal(res.inliers.sum(), 12)
+        np_test.assert_equal(res.inliers[[4, 11]], [False, False])
+        np_test.assert_almost_equal(res.q, r, decimal=2)
+
+        # points on a z-plane
+        x[2] = 30
+        y = (1.5 * np.dot(r, x) + np.array([[30.], [-20], [0]]))[:2]
+        y[:, 4] += [20, 10]
+        res = Rigid3D.find_32_robust(x=x, y=y, scale=1.5, seed=0)
+        np_test.assert_equal(np.flatnonzero(~res.inliers), [4])
+        np_test.assert_almost_equal(
+            res.transform(x=x)[:2, res.inliers], y[:, res.inliers], decimal=3)
+
     def test_approx_gl2_to_ck3(self):
         """
         Test approx_gl2_to_ck3()
@@ -1190,6 +1261,51 @@ class TestRigid3D(np_test.TestCase):
         y = rigid3d.transform(x=x_cs.transpose(), q=r, s=s, xy_axes='point_dim')
         np_test.assert_almost_equal(y, y_desired)
         
+    def test_transformBatch(self):
+        """
+        Tests transformBatch() and backProject()
+        """
+
+        # all voxels of a small grid
+        x = np.indices((10, 20, 30)).reshape(3, -1)
+        angles = np.array([-123, 32, 168]) * np.pi / 180
+        rigid3d = Rigid3D()
+        rigid3d.q = Rigid3D.make_r_euler(angles, mode='x')
+        rigid3d.s_scalar = 2.5
+        rigid3d.d = [1., 2, 3]
+
+        # float32 chunks
+        y = rigid3d.transformBatch(x=x, chunk=1000)
+        np_test.assert_almost_equal(y, rigid3d.transform(x=x), decimal=3)
+
+        # inverse
+        x_inv = rigid3d.transformBatch(
+            x=rigid3d.transform(x=x), inverse=True, dtype='float64')
+        np_test.assert_almost_equal(x_inv, x)
+
+        # 2D points + depth, depth in the rotated and the initial frame
+        y = rigid3d.transform(x=x)
+        np_test.assert_almost_equal(
+            rigid3d.backProject(x=y[:2], depth=y[2]), x)
+        np_test.assert_almost_equal(
+            rigid3d.backProject(x=y[:2], depth=x[2], frame='initial'), x)
+
+    def test_resample(self):
+        """
+        Tests resample() with points given as x, y, z of [z, y, x] volumes
+        """
+        volume = np.zeros((10, 20, 30))
+        volume[4, 6, 8] = 1
+        rigid3d = Rigid3D()
+        rigid3d.q = Rigid3D.make_r_euler(np.array([90, 0, 0]) * np.pi / 180)
+        rigid3d.s_scalar = 1.
+        rigid3d.d = [25., 2, 3]
+
+        # voxel x, y, z = 8, 6, 4 moves to -6 + 25, 8 + 2, 4 + 3
+        res = rigid3d.resample(volume, reverse_axes=True, order=1, slab=3)
+        np_test.assert_almost_equal(res[7, 10, 19], 1)
+        np_test.assert_almost_equal(res.sum(), 1)
+
     def test_recalculate_translation(self):
         """
         Tests recalculate_translation()
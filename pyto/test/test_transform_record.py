@@ -0,0 +1,94 @@
+"""
+
+Tests module transform_record
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import numpy.testing as np_test
+
+from pyto.affine import Affine
+from pyto.affine_2d import Affine2D
+from pyto.rigid_3d import Rigid3D
+from pyto import transform_record
+
+
+class TestTransformRecord(np_test.TestCase):
+    """
+    """
+
+    def setUp(self):
+        """
+        """
+
+        # rigid 3d -> 2d
+        self.x = numpy.array([[0., 1, 0, 0, 2, 1],
+                              [0, 0, 2, 0, 1, 3],
+                              [0, 0, 0, 3, 2, 1]])
+        r = Rigid3D.make_r_euler([0.3, 0.5, 1.1])
+        y = 2 * numpy.dot(r, self.x)[:2] + [[5], [3]]
+        self.rigid = Rigid3D.find_32(x=self.x, y=y)
+
+        # affine 2d and 3d
+        self.af2 = Affine2D.find(
+            x=self.x[:2].transpose(), y=y.transpose() + self.x[2:].transpose())
+        self.af2.decompose(order='qpsm')
+        self.af3 = Affine.find(
+            x=self.x.transpose(), y=numpy.dot(r, self.x).transpose())
+
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testRoundTrip(self):
+        """
+        Tests make_records(), make_transforms(), JSON and file round trips
+        """
+
+        transforms = [self.rigid, self.af2, self.af3]
+        records = transform_record.make_records(transforms)
+        np_test.assert_equal(
+            records['kind'], ['Rigid3D', 'Affine2D', 'Affine'])
+        np_test.assert_equal(records['ndim'], [3, 2, 3])
+        np_test.assert_equal(numpy.isnan(records['gl'][1, 2]).all(), True)
+
+        # transformations
+        new = transform_record.make_transforms(records)
+        for transf, new_transf in zip(transforms, new):
+            self.assertTrue(transf.__class__ is new_transf.__class__)
+            np_test.assert_equal(new_transf.rmsError, transf.rmsError)
+            np_test.assert_equal(new_transf.xy_axes, transf.xy_axes)
+        np_test.assert_equal(
+            new[0].transform(x=self.x), self.rigid.transform(x=self.x))
+        np_test.assert_equal(new[0].ck, self.rigid.ck)
+        np_test.assert_equal(new[1].phi, self.af2.phi)
+        np_test.assert_equal(new[1].scale, self.af2.scale)
+        np_test.assert_equal(
+            new[2].transform(x=self.x.transpose()),
+            self.af3.transform(x=self.x.transpose()))
+
+        # exact round trips
+        self.assertEqual(
+            transform_record.make_records(new).tobytes(), records.tobytes())
+        json_records = transform_record.from_json(
+            transform_record.to_json(records))
+        self.assertEqual(json_records.tobytes(), records.tobytes())
+        for name in ['records.npy', 'records.json']:
+            file_name = os.path.join(self.dir, name)
+            transform_record.write(file_name, records)
+            self.assertEqual(
+                transform_record.read(file_name).tobytes(), records.tobytes())
+
+        # unknown class
+        self.assertRaises(
+            ValueError, transform_record.make_records, [object()])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestTransformRecord)
+    unittest.TextTestRunner(verbosity=2).run(suite)
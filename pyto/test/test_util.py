@@ -0,0 +1,115 @@
+"""
+
+Tests module util
+"""
+
+import os
+import time
+import unittest
+
+import numpy
+import numpy.testing as np_test
+
+from pyto.util import arrayFormat
+
+
+def rowFormat(arrays, format, indices, prependIndex=False):
+    """
+    Formats each row separately (reference for arrayFormat)
+    """
+    out = []
+    for ind in indices:
+        if prependIndex:
+            row = [ind]
+        else:
+            row = []
+        for ar in arrays:
+            row.append(ar[ind])
+        out.append(format % tuple(row))
+    return out
+
+
+class TestUtil(np_test.TestCase):
+    """
+    """
+
+    def setUp(self):
+
+        self.arrays = [
+            numpy.array([1.5, -2.25, 3.125, 1e8]),
+            numpy.array([1, 2, 3, 4]),
+            numpy.array([0.1, 0.2, 0.3, 0.4], dtype='float32'),
+            ['a', 'b', 'c', 'd'],
+            {0: 'x', 2: 'y', 3: 'z', -1: 'w'}]
+
+    def testArrayFormat(self):
+        """
+        Tests arrayFormat()
+        """
+
+        # different types, formats and indices
+        for format in ['%7.2f %d %s %s %s', '%s %5d %8.3f %s %r']:
+            for indices in [[0, 2, 3], numpy.array([3, 0]), range(-1, 0)]:
+                np_test.assert_equal(
+                    arrayFormat(self.arrays, format, indices),
+                    rowFormat(self.arrays, format, indices))
+
+        # index
+        np_test.assert_equal(
+            arrayFormat(self.arrays[:2], '%d: %5.1f %d', [2, 0],
+                        prependIndex=True),
+            ['2:   3.1 3', '0:   1.5 1'])
+
+        # newlines in values and format
+        np_test.assert_equal(
+            arrayFormat([['a\nb', 'c']], '<%s>', [0, 1]), ['<a\nb>', '<c>'])
+        np_test.assert_equal(
+            arrayFormat(self.arrays[1:2], '%d\n', [0, 1]), ['1\n', '2\n'])
+        np_test.assert_equal(arrayFormat(self.arrays, '%d', []), [])
+        np_test.assert_equal(
+            arrayFormat([{'a': 1, 'b': 2}], '%d', ['b', 'a']), ['2', '1'])
+
+        # single string
+        for format in ['%7.2f %d %s %s %s', '%s %5d %8.3f %s %r']:
+            for indices in [[0, 2, 3], numpy.array([3, 0]), []]:
+                self.assertEqual(
+                    arrayFormat(self.arrays, format, indices, join='\n'),
+                    ''.join(row + '\n' for row in rowFormat(
+                        self.arrays, format, indices)))
+        self.assertEqual(
+            arrayFormat(self.arrays[:2], '%d:%5.1f %d', [2, 0], 
+                        prependIndex=True, join='\r\n'),
+            '2:  3.1 3\r\n0:  1.5 1\r\n')
+        self.assertEqual(arrayFormat([], '-', [0, 1], join=''), '--')
+
+    @unittest.skipUnless(
+        os.environ.get('TDCT_BENCHMARK'), "set TDCT_BENCHMARK=1 to run")
+    def testArrayFormatBenchmark(self):
+        """
+        Times arrayFormat() (list and single string) and the row by row 
+        formatting for tables of 10 float columns (prints with pytest -s)
+        """
+
+        format = '\t%7.2f\t%7.2f\t%7.2f' * 3 + '\t%7.2f'
+        for n_rows in [10**4, 10**5]:
+            arrays = list(numpy.random.RandomState(0).rand(10, n_rows) * 1000)
+            indices = list(range(n_rows))
+            start = time.perf_counter()
+            out = arrayFormat(arrays, format, indices)
+            bulk = time.perf_counter() - start
+            start = time.perf_counter()
+            out_string = arrayFormat(arrays, format, indices, join='\n')
+            string = time.perf_counter() - start
+            start = time.perf_counter()
+            desired = rowFormat(arrays, format, indices)
+            rows = time.perf_counter() - start
+            print(("\narrayFormat, {0} rows: {1:.3f} s, single string "
+                   "{2:.3f} s, row by row {3:.3f} s").format(
+                       n_rows, bulk, string, rows))
+            np_test.assert_equal(out, desired)
+            self.assertEqual(out_string, '\n'.join(desired) + '\n')
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestUtil)
+    unittest.TextTestRunner(verbosity=2).run(suite)
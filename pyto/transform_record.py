@@ -0,0 +1,212 @@
+"""
+Compact records of affine transformations (Affine, Affine2D and Rigid3D).
+
+A record holds only the quantities needed to re-apply and compare a
+transformation (gl, d, and for Rigid3D q, s_scalar and ck), in a numpy
+structured array of fixed size (dtype below). Arrays of records can be
+written and read as binary (.npy) or JSON files. Both round-trip exactly,
+without pickling the transformation objects (or their optimization results).
+
+Example:
+
+  records = transform_record.make_records([transf_1, transf_2])
+  transform_record.write('transforms.npy', records)
+  transf_1, transf_2 = transform_record.make_transforms(
+      transform_record.read('transforms.npy'))
+"""
+
+import json
+
+import numpy
+
+from .affine import Affine
+from .affine_2d import Affine2D
+from .rigid_3d import Rigid3D
+
+# transformation classes that can be stored in records
+classes = {'Affine': Affine, 'Affine2D': Affine2D, 'Rigid3D': Rigid3D}
+
+# record structure, unused elements (undefined quantities, or outside ndim
+# for 2D transformations) are nan
+dtype = numpy.dtype([
+    ('kind', 'U8'), ('ndim', 'u1'), ('order', 'U4'), ('xy_axes', 'U9'),
+    ('gl', 'f8', (3, 3)), ('d', 'f8', (3,)), ('q', 'f8', (3, 3)),
+    ('s_scalar', 'f8'), ('ck', 'f8', (4,)), ('rms_error', 'f8')])
+
+# fields that are written to JSON as (nested) lists or numbers
+float_fields = ['gl', 'd', 'q', 's_scalar', 'ck', 'rms_error']
+
+
+def make_records(transforms):
+    """
+    Makes records from transformations.
+
+    Arguments:
+      - transforms: list of transformations (instances of Affine, Affine2D
+      or Rigid3D)
+
+    Returns (ndarray of dtype) records
+    """
+
+    records = numpy.zeros(len(transforms), dtype=dtype)
+    for name in float_fields:
+        records[name] = numpy.nan
+    for record, transf in zip(records, transforms):
+
+        kind = transf.__class__.__name__
+        if kind not in classes:
+            raise ValueError(
+                "Transformation class " + kind + " can not be recorded.")
+        gl, d = transf.getGlD()
+        ndim = gl.shape[0]
+        record['kind'] = kind
+        record['ndim'] = ndim
+        record['order'] = transf.order
+        record['xy_axes'] = transf.xy_axes
+        record['gl'][:ndim, :ndim] = gl
+        record['d'][:ndim] = numpy.reshape(d, ndim)
+
+        # rigid 3d parameters (other transformations are decomposed from gl)
+        if kind == 'Rigid3D':
+            if getattr(transf, 'q', None) is not None:
+                record['q'] = transf.q
+            if getattr(transf, 's_scalar', None) is not None:
+                record['s_scalar'] = transf.s_scalar
+            if getattr(transf, 'ck', None) is not None:
+                record['ck'] = transf.ck
+
+        rms_error = transf.rmsError
+        if rms_error is not None:
+            record['rms_error'] = rms_error
+
+    return records
+
+def make_transforms(records):
+    """
+    Makes transformations from records (inverse of make_records()).
+
+    Error (attribute error) of the original transformations is not recorded,
+    but their rmsError is.
+
+    Argument:
+      - records: (ndarray of dtype) records
+
+    Returns list of transformations
+    """
+
+    transforms = []
+    for record in numpy.atleast_1d(records):
+
+        kind = str(record['kind'])
+        try:
+            cls = classes[kind]
+        except KeyError:
+            raise ValueError("Transformation class " + kind + " not known.")
+        ndim = int(record['ndim'])
+        gl = record['gl'][:ndim, :ndim].copy()
+        d = record['d'][:ndim].copy()
+        order = str(record['order'])
+
+        if cls is Rigid3D:
+            transf = Rigid3D(order=order)
+            transf.gl = gl
+            transf.d = d
+            if not numpy.isnan(record['q'][0, 0]):
+                transf.q = record['q'].copy()
+            if not numpy.isnan(record['s_scalar']):
+                transf.s_scalar = float(record['s_scalar'])
+                transf.s = transf.s_scalar * numpy.identity(3)
+            if not numpy.isnan(record['ck'][0]):
+                transf.ck = record['ck'].copy()
+        else:
+            transf = cls(gl=gl, d=d, order=order)
+        transf.xy_axes = str(record['xy_axes'])
+
+        if not numpy.isnan(record['rms_error']):
+            transf._rmsError = float(record['rms_error'])
+        transforms.append(transf)
+
+    return transforms
+
+def to_objects(records):
+    """
+    Returns records as a list of dictionaries (JSON objects, see to_json()).
+    Undefined quantities are None.
+    """
+
+    objects = []
+    for record in numpy.atleast_1d(records):
+        ndim = int(record['ndim'])
+        obj = {
+            'kind': str(record['kind']), 'ndim': ndim,
+            'order': str(record['order']),
+            'xy_axes': str(record['xy_axes'])}
+        for name in float_fields:
+            value = record[name]
+            if name in ['gl', 'q']:
+                value = value[:ndim, :ndim]
+            elif name == 'd':
+                value = value[:ndim]
+            if numpy.isnan(value).all():
+                obj[name] = None
+            else:
+                obj[name] = value.tolist()
+        objects.append(obj)
+
+    return objects
+
+def to_json(records):
+    """
+    Returns JSON string of records. Each record is written as an object,
+    undefined quantities as null. Floats are written with full precision,
+    so from_json() restores the records exactly.
+    """
+    return json.dumps(to_objects(records))
+
+def from_json(string):
+    """
+    Returns records from JSON string (inverse of to_json()).
+    """
+
+    objects = json.loads(string)
+    records = numpy.zeros(len(objects), dtype=dtype)
+    for name in float_fields:
+        records[name] = numpy.nan
+    for record, obj in zip(records, objects):
+        ndim = obj['ndim']
+        for name in ['kind', 'ndim', 'order', 'xy_axes']:
+            record[name] = obj[name]
+        for name in float_fields:
+            if obj[name] is None:
+                continue
+            if name in ['gl', 'q']:
+                record[name][:ndim, :ndim] = obj[name]
+            elif name == 'd':
+                record[name][:ndim] = obj[name]
+            else:
+                record[name] = obj[name]
+
+    return records
+
+def write(file_name, records):
+    """
+    Writes records to a JSON file if file_name ends with '.json', or to a
+    binary numpy (.npy) file otherwise.
+    """
+
+    if file_name.endswith('.json'):
+        with open(file_name, 'w') as file_:
+            file_.write(to_json(records))
+    else:
+        numpy.save(file_name, numpy.atleast_1d(records), allow_pickle=False)
+
+def read(file_name):
+    """
+    Reads records written by write().
+    """
+
+    if file_name.endswith('.json'):
+        with open(file_name) as file_:
+            return from_json(file_.read())
+    else:
+        return numpy.load(file_name, allow_pickle=False)
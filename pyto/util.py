@@ -7,8 +7,12 @@ Useful io functions.
 
 __version__ = "$Revision: 327 $"
 
+import itertools
 
-def arrayFormat(arrays, format, indices, prependIndex=False):
+import numpy
+
+
+def arrayFormat(arrays, format, indices, prependIndex=False, join=None):
     """
     Makes a list of formated strings, where each string contains formated
     values of all vars for one of ids, that is:
@@ -17,26 +21,61 @@ def arrayFormat(arrays, format, indices, prependIndex=False):
      'vars[0][ids[1]] ...',
      ... ]
 
+    The values of each array are extracted at once (fancy indexing for 1d
+    numpy arrays) and the rows are formatted from these columns. The result 
+    is the same as formatting values extracted one by one.
+
+    If arg join is given (e.g. os.linesep for a table), a single string is 
+    returned instead, where each formated row is followed by join. All rows 
+    are then formated in one pass, that is (format + join) repeated for all 
+    indices is applied to all values at once.
+
      Arguments:
        - arrays: list of arrays
        - format: format string
        - idices: list of indices
        - prependIndex: if True, the index is prepended to each line. Note that
-       in this case format has to contain an entry for index. 
+       in this case format has to contain an entry for index.
+       - join: None to return a list, or string that follows each row of 
+       the returned string 
      """
 
-    out = []
-    for ind in indices:
+    # extract columns (indices can be keys if arrays are dictionaries)
+    indices = list(indices)
+    try:
+        index_array = numpy.asarray(indices, dtype=numpy.intp)
+    except (TypeError, ValueError):
+        index_array = None
+    columns = []
+    if prependIndex:
+        columns.append(indices)
+    for ar in arrays:
+        columns.append(_column(ar, indices, index_array))
 
-        # make a tuple of values for this id
-        if prependIndex: 
-            row = [ind]
-        else: 
-            row = []
-        for ar in arrays: 
-            row.append( ar[ind] )
+    # format all rows at once
+    if join is not None:
+        values = tuple(itertools.chain.from_iterable(zip(*columns)))
+        return ((format + join) * len(indices)) % values
 
-        # format the current list
-        out.append( format % tuple(row) )
+    # format rows
+    if len(columns) == 0:
+        return [format % () for ind in indices]
+    out = [format % row for row in zip(*columns)]
 
     return out
+
+def _column(ar, indices, index_array):
+    """
+    Returns list of values of ar at indices. The values have the same type as
+    ar[index], except for 1d numpy arrays of types that are formatted the same
+    after conversion to python numbers (64 bit floats, integers, booleans).
+    """
+
+    if ((index_array is not None) and isinstance(ar, numpy.ndarray) 
+        and (ar.ndim == 1)):
+        values = ar[index_array]
+        if ((ar.dtype.kind in 'iub')
+            or ((ar.dtype.kind == 'f') and (ar.dtype.itemsize == 8))):
+            return values.tolist()
+        return list(values)
+    return [ar[ind] for ind in indices]
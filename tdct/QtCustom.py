@@ -26,8 +26,13 @@ Custom Qt classes. Some widgets in QT Designer are promoted to these classes:
 # ======================================================================================================================
 
 import sys
+import os
+import threading
+import collections
 from PyQt5 import QtCore, QtGui, QtWidgets
 import numpy as np
+import tifffile as tf
+import qimage2ndarray
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
@@ -38,6 +43,8 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 
 import math
 from . import beadPos
+from . import volumeRotation
+from . import correlation
 from . import clrmsg
 from . import TDCT_debug
 
@@ -93,37 +100,30 @@ class QTableViewCustom(QtWidgets.QTableView):
                                                 ###############################################
                                                 #######          Update items           #######
                                                 #################### START ####################
-    def updateItems(self):
-        items = []
-        for item in list(self._scene.items()):
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                items.append(item)
+    def updateItems(self,changed=None):
+        ## Connected to the model's itemChanged signal: only the marker of the edited row has to be moved
+        if changed is not None:
+            if self._scene.syncing is False and changed.row() < len(self._scene.markers):
+                self._scene.modelToMarker(changed.row())
+            return
+        items = self._scene.markers
         if debug is True: print(clrmsg.DEBUG + "Update items check - Nr. of items/rows:", len(items), self._model.rowCount())
         if len(items) == self._model.rowCount():
-            row = 0
-            for item in items:
+            for row in range(len(items)):
                 if debug is True:
                     print(clrmsg.DEBUG + 'Row:', row, '|', \
                         self._model.data(self._model.index(row, 0)),\
                         self._model.data(self._model.index(row, 1)),\
                         self._model.data(self._model.index(row, 2)))
-                item.setPos(
-                    float(self._model.data(self._model.index(row, 0))),
-                    float(self._model.data(self._model.index(row, 1))))
-                self._scene.zValuesDict[item] = [
-                    self._model.data(self._model.index(row, 2)),
-                    self._model.itemFromIndex(self._model.index(row, 2)).foreground().color().getRgb()]
-                row += 1
+                self._scene.modelToMarker(row)
         self.mainParent.colorModels()
 
     def showSelectedItem(self):
         indices = self.selectedIndexes()
-        ## Color all circles red and nly get ellipses, not text, to iterate through in green coloring process.
-        activeitems = []
-        for item in list(self._scene.items()):
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                item.setPen(self._scene.pen)
-                activeitems.append(item)
+        ## Color all circles red, markers are registered in row order.
+        activeitems = self._scene.markers
+        for item in activeitems:
+            item.setPen(self._scene.pen)
         ## Color selected items green
         if indices:
             ## Filter selected rows
@@ -134,20 +134,12 @@ class QTableViewCustom(QtWidgets.QTableView):
 
     def deleteItem(self):
         indices = self.selectedIndexes()
-        ## Only get ellipses, not text.
-        activeitems = []
-        for item in list(self._scene.items()):
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                activeitems.append(item)
         ## Deleting selected
         if indices:
             ## Filter selected rows
             rows = set(index.row() for index in indices)
-            ## Delete selected rows in scene.
-            for row in rows:
-                self._scene.removeItem(activeitems[row])
-                self._scene.enumeratePoints()
-            self._scene.itemsToModel()
+            ## Delete selected rows in scene and model.
+            self._scene.deleteMarkers([self._scene.markers[row] for row in rows if row < len(self._scene.markers)])
 
     ## Context menu
     def contextMenuEvent(self, event):
@@ -206,10 +198,7 @@ class QTableViewCustom(QtWidgets.QTableView):
         indices = self.selectedIndexes()
         ## Determine z for selected rows
         if indices:
-            activeitems = []
-            for item in list(self._scene.items()):
-                if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                    activeitems.append(item)
+            activeitems = self._scene.markers
             ## Filter selected rows
             rows = set(index.row() for index in indices)
             ## Delete selected rows in scene.
@@ -296,6 +285,123 @@ class QStandardItemModelCustom(QtGui.QStandardItemModel):
         return QtGui.QStandardItemModel.dropMimeData(self,data,action,row,0,parent)
 
 
+##############################
+## MarkerStore
+
+
+class MarkerStore():
+    """
+    Markers of a scene in table row order, shared by the scene, the table view and the results panel.
+
+    Row <-> item lookups are O(1). Marker positions are indexed in a uniform grid, so hit-testing and region
+    queries only visit the grid cells covering the queried area instead of all scene items.
+    """
+    def __init__(self, cellSize=64):
+        self.cellSize = cellSize
+        self.items = []
+        self.rows = {}
+        ## grid cell -> set of markers, marker -> grid cell
+        self.cells = {}
+        self.cellOf = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __reversed__(self):
+        return reversed(list(self.items))
+
+    def __getitem__(self, row):
+        return self.items[row]
+
+    def __contains__(self, item):
+        return item in self.rows
+
+    def row(self, item):
+        return self.rows[item]
+
+    def cell(self, x, y):
+        return (int(math.floor(x / self.cellSize)), int(math.floor(y / self.cellSize)))
+
+    def append(self, item):
+        """Register marker as last row. Returns its row."""
+        self.rows[item] = len(self.items)
+        self.items.append(item)
+        self.cellOf[item] = self.cell(item.x(), item.y())
+        self.cells.setdefault(self.cellOf[item], set()).add(item)
+        item.store = self
+        return self.rows[item]
+
+    def remove(self, item, reindex=True):
+        """Unregister marker. Returns the row it had. Use reindex=False when removing several markers
+        (highest row first) followed by a single reindex() call."""
+        row = self.rows.pop(item)
+        del self.items[row]
+        cell = self.cellOf.pop(item)
+        self.cells[cell].discard(item)
+        if not self.cells[cell]:
+            del self.cells[cell]
+        item.store = None
+        if reindex is True:
+            self.reindex(row)
+        return row
+
+    def reindex(self, start=0):
+        for row in range(start, len(self.items)):
+            self.rows[self.items[row]] = row
+
+    def move(self, item):
+        """Update the spatial index after the marker has been moved"""
+        cell = self.cell(item.x(), item.y())
+        if cell != self.cellOf[item]:
+            self.cells[self.cellOf[item]].discard(item)
+            if not self.cells[self.cellOf[item]]:
+                del self.cells[self.cellOf[item]]
+            self.cellOf[item] = cell
+            self.cells.setdefault(cell, set()).add(item)
+
+    def candidates(self, x0, y0, x1, y1):
+        i0, j0 = self.cell(x0, y0)
+        i1, j1 = self.cell(x1, y1)
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for item in self.cells.get((i, j), ()):
+                    yield item
+
+    def itemsAt(self, x, y, radius):
+        """Markers with their center within radius of (x, y), closest first"""
+        hits = []
+        for item in self.candidates(x - radius, y - radius, x + radius, y + radius):
+            dist = math.hypot(item.x() - x, item.y() - y)
+            if dist <= radius:
+                hits.append((dist, self.rows[item], item))
+        return [hit[2] for hit in sorted(hits, key=lambda hit: hit[:2])]
+
+    def itemsInRect(self, rect):
+        """Markers with their center in the QRectF rect, in row order"""
+        hits = [
+            item for item in self.candidates(rect.left(), rect.top(), rect.right(), rect.bottom())
+            if rect.contains(item.pos())]
+        return sorted(hits, key=self.rows.get)
+
+
+class QGraphicsMarkerItem(QtWidgets.QGraphicsEllipseItem):
+    """Marker circle, keeps the spatial index of its MarkerStore up to date when moved (dragging, setPos)"""
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.store = None
+        self.setFlag(QtWidgets.QGraphicsItem.ItemSendsGeometryChanges, True)
+
+    def itemChange(self, change, value):
+        if change == QtWidgets.QGraphicsItem.ItemPositionHasChanged and self.store is not None:
+            self.store.move(self)
+        ## QGraphicsItem.itemChange only returns value. Called about a dozen times per new marker, so the call to the
+        ## base class is skipped
+        return value
+
+
 ##############################
 ## QGraphicsSceneCustom
 
@@ -312,12 +418,26 @@ class QGraphicsSceneCustom(QtWidgets.QGraphicsScene):
         ## Initialize variables
         self.lastScreenPos = QtCore.QPoint(0, 0)
         self.lastScenePos = 0
+        self.lastSelectionArea = QtGui.QPainterPath()
         self.selectionmode = False
         self.pointidx = 1
         self.rotangle = 0
         ## Circle size
         self.markerSize = 10
         self.zValuesDict = {}
+        ## Marker registry: ellipse items in model row order with spatial index, and their number/crosshair child items.
+        ## Scene and model are kept in sync incrementally (see markerToModel and modelToMarker)
+        self.markers = MarkerStore()
+        self.markerDecor = {}
+        ## Crosshair pen and number font (for the current markerSize) shared by all markers
+        self.crosshairPen = QtGui.QPen(QtGui.QColor(255, 255, 255, 128))  # r,g,b,alpha, white transparent
+        self._markerFont = (None, None)
+        ## Arrows of the last correlation (see addArrow)
+        self.arrows = []
+        ## True while the scene writes to the model, so the model's itemChanged signal is not fed back
+        self.syncing = False
+        ## True while the image is loaded in the background (see ImageLoader)
+        self.loading = False
 
     def wheelEvent(self, event):
         if event.delta() > 0:
@@ -344,37 +464,44 @@ class QGraphicsSceneCustom(QtWidgets.QGraphicsScene):
             return
         elif event.button() == QtCore.Qt.RightButton:
             if self.mainWidget.checkBox_MIP.isChecked():
-                self.addCircle(event.scenePos().x(), event.scenePos().y())
+                circle = self.addCircle(event.scenePos().x(), event.scenePos().y())
             else:
-                self.addCircle(event.scenePos().x(), event.scenePos().y(),z=self.mainWidget.spinBox_slice.value())
+                circle = self.addCircle(event.scenePos().x(), event.scenePos().y(),z=self.mainWidget.spinBox_slice.value())
+            self.markerToModel(circle)
+            self.mainWidget.colorModels()
         elif event.button() == QtCore.Qt.MiddleButton:
-            item = self.itemAt(event.scenePos(),QtGui.QTransform())
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                self.removeItem(item)
-                self.enumeratePoints()
-        self.itemsToModel()
+            items = self.markers.itemsAt(event.scenePos().x(), event.scenePos().y(), self.markerSize)
+            if items:
+                self.deleteMarkers(items[:1])
 
     def mouseReleaseEvent(self, event):
         ## Reinitialize mouseReleaseEvent handling from QtWidgets.QGraphicsScene for item drag and drop feature
         super(QGraphicsSceneCustom, self).mouseReleaseEvent(event)
+        ## Rubber band selection: markers are looked up in the marker store. The selection area is kept by Qt after
+        ## releasing, so only a new area is handled.
+        if self.selectionmode is True and self.selectionArea() != self.lastSelectionArea:
+            self.lastSelectionArea = self.selectionArea()
+            if not self.lastSelectionArea.isEmpty():
+                self.selectMarkers(self.lastSelectionArea.boundingRect())
         ## Only update position when single item is drag and dropped
         if self.selectedItems() and self.selectionmode is False:
             if debug is True: print(clrmsg.DEBUG + 'New pos:', self.selectedItems()[0].x(), self.selectedItems()[0].y())
             ## Only change color to orange when marker is moved in the 3D image (in order to remind reacquiring z coordinate)
+            moved = [item for item in self.selectedItems() if item in self.markers]
             if '{0:b}'.format(self.imagetype)[-1] == '0':
-                for item in self.selectedItems():
-                    if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                        self.zValuesDict[item] = [self.zValuesDict[item][0],(255, 190, 0)]  # orange
+                for item in moved:
+                    self.zValuesDict[item] = [self.zValuesDict[item][0],(255, 190, 0)]  # orange
             self.clearSelection()
-            self.itemsToModel()
+            ## Only the rows of the moved markers have to be updated
+            for item in moved:
+                self.markerToModel(item)
         self.parent().setDragMode(QtWidgets.QGraphicsView.NoDrag)
         self.selectionmode = False
 
     def keyPressEvent(self, event):
         ## Delete selected points (hold ctrl and draw rubber selection rectangle over the points you want to select)
         if event.key() == QtCore.Qt.Key_Delete:
-            for item in self.selectedItems(): self.removeItem(item)
-            self.itemsToModel()
+            self.deleteMarkers(self.selectedItems())
         ## Zoom in/out with +/- keys
         elif event.key() == QtCore.Qt.Key_Plus:
             self.parent().scale(1.15, 1.15)
@@ -383,10 +510,12 @@ class QGraphicsSceneCustom(QtWidgets.QGraphicsScene):
 
     def addCircle(self,x,y,z=None):
         ## First add at 0,0 then move to get position from item.scenePos() or .x() and y.()
-        circle = self.addEllipse(-self.markerSize, -self.markerSize, self.markerSize * 2, self.markerSize * 2, self.pen)
+        circle = QGraphicsMarkerItem(-self.markerSize, -self.markerSize, self.markerSize * 2, self.markerSize * 2)
+        circle.setPen(self.pen)
         circle.setPos(x,y)
-        circle.setFlag(QtWidgets.QGraphicsItem.ItemIsMovable, True)
-        circle.setFlag(QtWidgets.QGraphicsItem.ItemIsSelectable, True)
+        self.addItem(circle)
+        circle.setFlags(
+            circle.flags() | QtWidgets.QGraphicsItem.ItemIsMovable | QtWidgets.QGraphicsItem.ItemIsSelectable)
         ## store placeholder z value in dictionary (QGraphicsitems cannot store additional (meta)data)
         ## and flag for color (rgba)
         if self._z and z is None:
@@ -395,9 +524,10 @@ class QGraphicsSceneCustom(QtWidgets.QGraphicsScene):
             self.zValuesDict[circle] = [float(z),(0, 0, 0)]  # orange
         else:
             self.zValuesDict[circle] = [0.0,(0, 0, 0)]  # black
-        ## Reorder to have them in ascending order in the tableview
-        QtWidgets.QGraphicsItem.stackBefore(circle, list(self.items())[-2])
-        self.enumeratePoints()
+        ## Register marker as last row
+        self.markers.append(circle)
+        self.decorateMarker(circle)
+        return circle
 
         ## Arrow test code
         # import time
@@ -414,6 +544,25 @@ class QGraphicsSceneCustom(QtWidgets.QGraphicsScene):
         # 	self.parent().parent().refreshUI()
         # 	loopcounter += 1
 
+    def addCircles(self,coordinates):
+        """
+        Add many markers at once, e.g. imported points. Their model rows are not written, see markersToModel.
+
+        coordinates:	array-like, one row (x, y) or (x, y, z) per marker
+        Returns the new markers.
+        """
+        coordinates = np.asarray(coordinates, dtype=float)
+        coordinates = coordinates.reshape(-1, coordinates.shape[-1] if coordinates.size else 3)
+        ## The scene's BSP index is rebuilt once afterwards instead of being updated for every marker
+        self.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        try:
+            if coordinates.shape[1] > 2:
+                return [self.addCircle(x, y, z) for x, y, z in coordinates[:, :3].tolist()]
+            else:
+                return [self.addCircle(x, y) for x, y in coordinates.tolist()]
+        finally:
+            self.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
+
     def addArrow(self,start,end,arrowangle=45,color=QtCore.Qt.red):
         dx, dy = list(map(lambda a,b: a - b, end, start))
         length = math.hypot(dx,dy)
@@ -434,72 +583,565 @@ class QGraphicsSceneCustom(QtWidgets.QGraphicsScene):
             0.5 * length, 0.5 * length,
             180 + arrowangle + math.degrees(angle))
         path.lineTo(*end)
-        self.addPath(path,QtGui.QPen(color))
+        self.arrows.append(self.addPath(path,QtGui.QPen(color)))
 
     def deleteArrows(self):
-        for item in list(self.items()):
-            if isinstance(item, QtWidgets.QGraphicsPathItem):
-                self.removeItem(item)
+        for item in self.arrows:
+            self.removeItem(item)
+        self.arrows = []
+
+    def decorateMarker(self,item):
+        """Add number and crosshair as child items of a newly registered marker"""
+        ## Adding number
+        nr = QtWidgets.QGraphicsSimpleTextItem(item)
+        # nr.setPen(self.pen) # outline
+        nr.setBrush(QtCore.Qt.cyan)  # fill
+        ## Adding crosshair
+        hline = QtWidgets.QGraphicsLineItem(item)
+        hline.setPen(self.crosshairPen)
+        vline = QtWidgets.QGraphicsLineItem(item)
+        vline.setPen(self.crosshairPen)
+        self.markerDecor[item] = (nr, hline, vline)
+        self.layoutMarker(item)
+
+    def layoutMarker(self,item):
+        """Update size, number and rotation of a marker and its child items"""
+        nr, hline, vline = self.markerDecor[item]
+        ## Update marker size
+        item.setRect(-self.markerSize, -self.markerSize, self.markerSize * 2, self.markerSize * 2)
+        nr.setFont(self.markerFont())
+        nr.setText(str(self.markers.row(item) + 1))
+        ## Counter rotate number so it stays level
+        nr.setRotation(-self.rotangle)
+        ## Convert degree to rad plus a 30 offset to place the number in the lower right corner of the marker
+        radangle = math.radians(390 - self.rotangle)
+        ## Number's position has to be angle dependant -> sin cos
+        nr.setPos(math.cos(radangle) * self.markerSize,math.sin(radangle) * self.markerSize)
+        ## Counter rotate crosshair so it stays level
+        hline.setLine(-self.markerSize - 2,0,self.markerSize + 2,0)
+        hline.setRotation(-self.rotangle)
+        vline.setLine(0,-self.markerSize - 2,0,self.markerSize + 2)
+        vline.setRotation(-self.rotangle)
+
+    def markerFont(self):
+        """Font of the marker numbers for the current markerSize"""
+        if self._markerFont[0] != self.markerSize:
+            font = QtGui.QFont("Helvetica")
+            font.setPointSizeF(1.5 * self.markerSize)
+            self._markerFont = (self.markerSize, font)
+        return self._markerFont[1]
 
     def enumeratePoints(self):
-        ## Remove numbering
-        for item in list(self.items()):
-            if isinstance(item, QtWidgets.QGraphicsSimpleTextItem) or isinstance(item, QtWidgets.QGraphicsLineItem):
-                self.removeItem(item)
-        pointidx = 1
-        for item in list(self.items()):
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                ## Update marker size
-                item.setRect(-self.markerSize, -self.markerSize, self.markerSize * 2, self.markerSize * 2)
-                ## Adding number
-                nr = self.addSimpleText(str(pointidx),QtGui.QFont("Helvetica", pointSize=1.5 * self.markerSize))
-                nr.setParentItem(item)
-                ## Counter rotate number so it stays level
-                nr.setRotation(-self.rotangle)
-                ## Convert degree to rad plus a 30 offset to place the number in the lower right corner of the marker
-                radangle = math.radians(390 - self.rotangle)
-                ## Number's position has to be angle dependant -> sin cos
-                nr.setPos(math.cos(radangle) * self.markerSize,math.sin(radangle) * self.markerSize)
-                # nr.setPen(self.pen) # outline
-                nr.setBrush(QtCore.Qt.cyan)  # fill
-                ## Adding crosshair
-                hline = self.addLine(-self.markerSize - 2,0,self.markerSize + 2,0)
-                hline.setPen(QtGui.QPen(QtGui.QColor(255, 255, 255, 128)))  # r,g,b,alpha, white transparent
-                hline.setParentItem(item)
-                ## Counter rotate crosshair (horizontal line) so it stays level
-                hline.setRotation(-self.rotangle)
-                vline = self.addLine(0,-self.markerSize - 2,0,self.markerSize + 2)
-                vline.setPen(QtGui.QPen(QtGui.QColor(255, 255, 255, 128)))  # r,g,b,alpha, white transparent
-                vline.setParentItem(item)
-                ## Counter rotate crosshair (vertical line) so it stays level
-                vline.setRotation(-self.rotangle)
-                ## Counter
-                pointidx += 1
+        ## Relayout all markers, e.g. after changing marker size or rotation. Child items are reused, not recreated.
+        for item in self.markers:
+            self.layoutMarker(item)
+
+    def renumberMarkers(self,start=0):
+        ## Only markers from row start onwards change their number
+        self.markers.reindex(start)
+        for row in range(start,len(self.markers)):
+            self.markerDecor[self.markers[row]][0].setText(str(row + 1))
+
+    def removeCircle(self,item,renumber=True):
+        """Remove marker from scene and registry. Returns the model row the marker was associated with."""
+        row = self.markers.remove(item,reindex=False)
+        del self.markerDecor[item]
+        self.zValuesDict.pop(item, None)
+        ## Child items (number, crosshair) are removed together with their parent
+        self.removeItem(item)
+        if renumber is True:
+            self.renumberMarkers(row)
+        return row
+
+    def clearMarkers(self):
+        ## Remove all markers from scene and registry, the model is left untouched
+        for item in reversed(self.markers):
+            self.removeCircle(item,renumber=False)
+
+    def selectMarkers(self,rect):
+        ## Add markers touching the rectangle (scene coordinates) to the selection
+        for item in self.markers.itemsInRect(rect.adjusted(-self.markerSize,-self.markerSize,self.markerSize,self.markerSize)):
+            item.setSelected(True)
+
+    def deleteMarkers(self,items):
+        """Remove markers and their model rows"""
+        rows = sorted([self.markers.row(item) for item in items if item in self.markers], reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            self.removeCircle(self.markers[row],renumber=False)
+            self._model.removeRow(row)
+        self.renumberMarkers(rows[-1])
+        self.mainWidget.colorModels()
+
+    def modelRow(self,item):
+        x_item = QtGui.QStandardItem(str(item.x()))
+        y_item = QtGui.QStandardItem(str(item.y()))
+        z_item = QtGui.QStandardItem(str(self.zValuesDict[item][0]))
+        # x_item.setBackground(QtGui.QColor(220,25,105))
+        # y_item.setBackground(QtGui.QColor(50,220,175))
+        # z_item.setBackground(QtGui.QColor(220,25,105))
+
+        z_item.setForeground(QtGui.QColor(*self.zValuesDict[item][1]))
+
+        x_item.setFlags(x_item.flags() & ~QtCore.Qt.ItemIsDropEnabled)
+        y_item.setFlags(y_item.flags() & ~QtCore.Qt.ItemIsDropEnabled)
+        z_item.setFlags(z_item.flags() & ~QtCore.Qt.ItemIsDropEnabled)
+        return [x_item, y_item, z_item]
+
+    def markerToModel(self,item):
+        """Write a single marker to its model row, appending the row if it does not exist yet"""
+        row = self.markers.row(item)
+        self.syncing = True
+        try:
+            if row < self._model.rowCount():
+                self._model.item(row, 0).setText(str(item.x()))
+                self._model.item(row, 1).setText(str(item.y()))
+                self._model.item(row, 2).setText(str(self.zValuesDict[item][0]))
+                self._model.item(row, 2).setForeground(QtGui.QColor(*self.zValuesDict[item][1]))
+            else:
+                self._model.appendRow(self.modelRow(item))
+                self.setModelHeader()
+        finally:
+            self.syncing = False
+
+    def markersToModel(self,items):
+        """Append the model rows of new markers (e.g. from addCircles), the header is set once"""
+        self.syncing = True
+        try:
+            for item in items:
+                self._model.appendRow(self.modelRow(item))
+            self.setModelHeader()
+        finally:
+            self.syncing = False
+        self.mainWidget.colorModels()
+
+    def modelToMarker(self,row):
+        """Move a single marker to the coordinates of its model row"""
+        item = self.markers[row]
+        item.setPos(
+            float(self._model.data(self._model.index(row, 0))),
+            float(self._model.data(self._model.index(row, 1))))
+        self.zValuesDict[item] = [
+            self._model.data(self._model.index(row, 2)),
+            self._model.itemFromIndex(self._model.index(row, 2)).foreground().color().getRgb()]
+
+    def setModelHeader(self):
+        self._model.setHeaderData(0, QtCore.Qt.Horizontal,'x')
+        self._model.setHeaderData(1, QtCore.Qt.Horizontal,'y')
+        self._model.setHeaderData(2, QtCore.Qt.Horizontal,'z')
 
     def itemsToModel(self):
+        ## Full rebuild of the model, only needed for bulk changes (e.g. importing points)
         self._model.removeRows(0,self._model.rowCount())
-        for item in list(self.items()):
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                x_item = QtGui.QStandardItem(str(item.x()))
-                y_item = QtGui.QStandardItem(str(item.y()))
-                z_item = QtGui.QStandardItem(str(self.zValuesDict[item][0]))
-                # x_item.setBackground(QtGui.QColor(220,25,105))
-                # y_item.setBackground(QtGui.QColor(50,220,175))
-                # z_item.setBackground(QtGui.QColor(220,25,105))
-
-                z_item.setForeground(QtGui.QColor(*self.zValuesDict[item][1]))
-
-                x_item.setFlags(x_item.flags() & ~QtCore.Qt.ItemIsDropEnabled)
-                y_item.setFlags(y_item.flags() & ~QtCore.Qt.ItemIsDropEnabled)
-                z_item.setFlags(z_item.flags() & ~QtCore.Qt.ItemIsDropEnabled)
-                items = [x_item, y_item, z_item]
-                self._model.appendRow(items)
-                self._model.setHeaderData(0, QtCore.Qt.Horizontal,'x')
-                self._model.setHeaderData(1, QtCore.Qt.Horizontal,'y')
-                self._model.setHeaderData(2, QtCore.Qt.Horizontal,'z')
+        for item in self.markers:
+            self._model.appendRow(self.modelRow(item))
+        self.setModelHeader()
         self.mainWidget.colorModels()
 
 
+##############################
+## Background image loading
+
+
+class ImageLoaderSignals(QtCore.QObject):
+    """Signals of ImageLoader (QRunnable is no QObject and cannot emit signals itself)."""
+    progress = QtCore.pyqtSignal(int, str)
+    preview = QtCore.pyqtSignal(object, int, int)
+    finished = QtCore.pyqtSignal(object)
+    cancelled = QtCore.pyqtSignal()
+
+
+class ImageLoader(QtCore.QRunnable):
+    def __init__(self, path, imread, pxSize, previewSize=1024, previewPages=8):
+        """
+        Loads an image file for the correlation window in a worker thread. Start with QThreadPool.start(loader).
+
+        path:			string, path to the tiff file
+        imread:			function(path, img=array) returning (img, imagetype, imgstack) like MainWidget.imread
+        pxSize:			function(path) returning the pixel size like MainWidget.pxSize
+        previewSize:	int, longest edge of the preview image in px
+        previewPages:	int, number of evenly spaced pages used for the preview MIP of image stacks
+
+        Signals (see self.signals):
+            progress:	(percent, message)
+            preview:	(8 bit preview image, downsampling factor, provisional imagetype), emitted as soon as the
+                        sampled pages are read, before the remaining pages are loaded
+            finished:	(img, imagetype, imgstack, pixelSize) or None if the file could not be read
+            cancelled:	emitted instead of finished after cancel() was called
+        """
+        super().__init__()
+        self.signals = ImageLoaderSignals()
+        self.path = path
+        self.imread = imread
+        self.pxSize = pxSize
+        self.previewSize = previewSize
+        self.previewPages = previewPages
+        self._cancelled = False
+        self._lastProgress = -1
+
+    def cancel(self):
+        """Stop loading. Checked between pages, so the worker returns after the page currently read."""
+        self._cancelled = True
+
+    def isCancelled(self):
+        return self._cancelled
+
+    def reportProgress(self, value, msg):
+        ## Only emit when the percentage changes to not flood the event loop of the GUI thread
+        if int(value) != self._lastProgress:
+            self._lastProgress = int(value)
+            self.signals.progress.emit(int(value), msg)
+
+    def run(self):
+        try:
+            result = self.load()
+        except Exception as e:
+            print(clrmsg.ERROR + "Loading image failed:", self.path, e)
+            result = None
+        if self._cancelled:
+            self.signals.cancelled.emit()
+        else:
+            self.signals.finished.emit(result)
+
+    def load(self):
+        filename = os.path.basename(self.path)
+        self.reportProgress(0, "Reading metadata... " + filename)
+        pixelSize = self.pxSize(self.path)
+        with tf.TiffFile(self.path) as tif:
+            series = tif.series[0]
+            pages = series.pages
+            pageShape = pages[0].shape
+            if len(pages) * int(np.prod(pageShape)) != int(np.prod(series.shape)):
+                ## Series data is not stored as one page per plane (e.g. contiguous ImageJ hyperstacks)
+                self.reportProgress(15, "Reading image... " + filename)
+                img = series.asarray()
+                self.signals.preview.emit(*self.makePreview(img, img.shape))
+            else:
+                stack = np.empty((len(pages),) + pageShape, dtype=series.dtype)
+                ## Read a few evenly spaced pages first for the preview
+                sample = np.unique(np.linspace(0, len(pages) - 1, min(len(pages), self.previewPages)).astype(int))
+                for i in sample:
+                    if self._cancelled:
+                        return None
+                    stack[i] = pages[i].asarray()
+                self.reportProgress(15, "Reading image... " + filename)
+                self.signals.preview.emit(*self.makePreview(stack[sample], series.shape))
+                sampled = set(sample)
+                for i in range(len(pages)):
+                    if self._cancelled:
+                        return None
+                    if i not in sampled:
+                        stack[i] = pages[i].asarray()
+                    self.reportProgress(15 + 70 * (i + 1) / len(pages), "Reading image... " + filename)
+                img = stack.reshape(series.shape)
+        if self._cancelled:
+            return None
+        self.reportProgress(85, "Processing image... " + filename)
+        img, imagetype, imgstack = self.imread(self.path, img=img)
+        if img is None:
+            return None
+        self.reportProgress(100, "Done loading " + filename)
+        return img, imagetype, imgstack, pixelSize
+
+    def makePreview(self, planes, shape):
+        """
+        Returns a downsampled 8 bit maximum intensity projection of the planes, the downsampling factor and the
+        provisional imagetype (see MainWidget.imread) derived from the shape of the full image.
+
+        planes:	numpy array, all or a subset of the image planes along the first axis of shape, or the full image
+                for 2D images
+        shape:	tuple, shape of the full image
+        """
+        if len(shape) == 2 or len(shape) == 3 and any([True for dim in shape if dim <= 4]):
+            ## 2D image (gray scale or multichannel), sampled as single page
+            imagetype = 21
+            preview = planes.reshape(planes.shape[-len(shape):])
+        else:
+            imagetype = 26 if len(shape) == 4 else 22
+            preview = np.amax(planes, axis=0)
+        ## Color channels first (c,y,x) or last (y,x,c)
+        if preview.ndim == 3 and preview.shape[0] <= 4:
+            step = int(np.ceil(max(preview.shape[1:]) / float(self.previewSize)))
+            preview = preview[:,::step,::step]
+        else:
+            step = int(np.ceil(max(preview.shape[:2]) / float(self.previewSize)))
+            preview = preview[::step,::step]
+        preview = preview.astype(np.float32)
+        preview -= preview.min()
+        if preview.max() > 0:
+            preview *= 255.0 / preview.max()
+        return preview.astype(np.uint8), max(step, 1), imagetype
+
+
+class OverlayExporterSignals(QtCore.QObject):
+    """Signals of OverlayExporter"""
+    finished = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+
+
+class OverlayExporter(QtCore.QRunnable):
+    def __init__(self, path, channels, transf, image, projection='max', depth=None):
+        """
+        Exports light microscope channels projected into the pixel grid of the correlated image as multichannel tiff
+        (see volumeRotation.exportOverlay) in a worker thread. Start with QThreadPool.start(exporter).
+
+        Signals (see self.signals):
+            finished:	path of the saved tiff
+            failed:		error message
+        """
+        super().__init__()
+        self.signals = OverlayExporterSignals()
+        self.path = path
+        self.channels = channels
+        self.transf = transf
+        self.image = image
+        self.projection = projection
+        self.depth = depth
+
+    def run(self):
+        try:
+            volumeRotation.exportOverlay(
+                self.path, self.channels, self.transf, image=self.image, projection=self.projection, depth=self.depth)
+        except Exception as e:
+            print(clrmsg.ERROR + "Exporting correlated overlay failed:", self.path, e)
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(self.path)
+
+
+class UncertaintyEstimatorSignals(QtCore.QObject):
+    """Signals of UncertaintyEstimator"""
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+
+class UncertaintyEstimator(QtCore.QRunnable):
+    def __init__(self, markers_3d, markers_2d, spots_3d, transf, method='bootstrap'):
+        """
+        Estimates the uncertainty of the correlated POIs (see correlation.poi_uncertainty) in a worker thread, so the
+        resampling fits (run in worker processes) do not block the GUI. Start with QThreadPool.start(estimator).
+
+        Signals (see self.signals):
+            finished:	n_spots x 2 x 2 covariance matrices of the correlated POIs
+            failed:		error message
+        """
+        super().__init__()
+        self.signals = UncertaintyEstimatorSignals()
+        self.markers_3d = markers_3d
+        self.markers_2d = markers_2d
+        self.spots_3d = spots_3d
+        self.transf = transf
+        self.method = method
+
+    def run(self):
+        try:
+            cov = correlation.poi_uncertainty(
+                self.markers_3d, self.markers_2d, self.spots_3d, self.transf, method=self.method)
+        except Exception as e:
+            print(clrmsg.ERROR + "Estimating POI uncertainty failed:", e)
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(cov)
+
+
+##############################
+## Vector overlay
+
+
+class QGraphicsOverlayItem(QtWidgets.QGraphicsItem):
+    def __init__(self, parent=None):
+        """
+        Overlay (e.g. correlated marker and POI positions) drawn as vector graphics on top of the image.
+
+        Shapes of the same style are collected in one QPainterPath (see addLayer), so any number of shapes is drawn
+        with a few paint calls and without blending image pixels. Use rasterize() to burn the overlay into an image
+        for export.
+        """
+        super().__init__(parent)
+        self.setAcceptedMouseButtons(QtCore.Qt.NoButton)
+        self.layers = []
+        self._boundingRect = QtCore.QRectF()
+
+    def addLayer(self, path, pen=None, brush=None, opacity=1.0):
+        """
+        Adds a QPainterPath (in image px) drawn with pen (outline) and brush (fill) at the given opacity (0-1).
+        Overlapping shapes of one path are blended only once, like shapes drawn into one image.
+        """
+        if pen is None:
+            pen = QtGui.QPen(QtCore.Qt.NoPen)
+        if brush is None:
+            brush = QtGui.QBrush(QtCore.Qt.NoBrush)
+        ## Fill overlapping shapes (default odd-even rule leaves intersections empty)
+        path.setFillRule(QtCore.Qt.WindingFill)
+        margin = 0 if pen.style() == QtCore.Qt.NoPen else 0.5 * pen.widthF()
+        self.prepareGeometryChange()
+        self.layers.append((path, pen, brush, opacity))
+        self._boundingRect = self._boundingRect.united(path.boundingRect().adjusted(-margin, -margin, margin, margin))
+
+    def boundingRect(self):
+        return self._boundingRect
+
+    def paint(self, painter, option, widget=None):
+        self.paintLayers(painter)
+
+    def paintLayers(self, painter):
+        opacity = painter.opacity()
+        for path, pen, brush, layerOpacity in self.layers:
+            painter.setOpacity(opacity * layerOpacity)
+            painter.setPen(pen)
+            painter.setBrush(brush)
+            painter.drawPath(path)
+        painter.setOpacity(opacity)
+
+    def rasterize(self, img):
+        """Returns copy of img (numpy array, gray scale or RGB) as RGB numpy array with the overlay drawn into it."""
+        image = qimage2ndarray.array2qimage(img)
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        self.paintLayers(painter)
+        painter.end()
+        return qimage2ndarray.rgb_view(image).copy()
+
+
+##############################
+## Multi-resolution image pyramid
+
+
+class QGraphicsPyramidItem(QtWidgets.QGraphicsObject):
+    def __init__(self, width, height, compose, tileSize=512, maxTiles=256, parent=None):
+        """
+        Image item for QGraphicsSceneCustom rendering only the visible tiles of a multi-resolution image pyramid.
+
+        width, height:	int, size of the full resolution image in px (= item size in scene coordinates)
+        compose:		function(y0, y1, x0, x1, step) returning the image region [y0:y1:step, x0:x1:step] as uint8
+                        numpy array (y,x) or (y,x,3), e.g. MainWidget.composeImage()
+        tileSize:		int, edge length of a tile in px of its pyramid level
+        maxTiles:		int, number of tiles kept in the cache
+
+        Level n of the pyramid is downsampled by 2**n. When painting, the coarsest level still having at least
+        the resolution of the view is used. Tiles of all levels but the full resolution one are rendered in the
+        background (see PyramidBuilder), full resolution tiles are rendered when they are exposed. After
+        setCompose() (e.g. brightness/contrast or layer color changed) all tiles are rendered again.
+        """
+        super().__init__(parent)
+        self.setFlag(QtWidgets.QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.width = width
+        self.height = height
+        self.tileSize = tileSize
+        self.maxTiles = maxTiles
+        ## Coarsest level fits into one tile
+        self.levels = max(1, int(np.ceil(np.log2(max(width, height) / float(tileSize)))) + 1)
+        self._tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._builder = None
+        self.setCompose(compose)
+
+    def boundingRect(self):
+        return QtCore.QRectF(0, 0, self.width, self.height)
+
+    def setCompose(self, compose):
+        """Replace the image compose function, drop all cached tiles and rebuild the pyramid in the background."""
+        with self._lock:
+            self.compose = compose
+            self._generation += 1
+            self._tiles.clear()
+        if self._builder is not None:
+            self._builder.cancel()
+        if self.levels > 1:
+            self._builder = PyramidBuilder(self, self._generation)
+            self._builder.signals.tileReady.connect(self.update)
+            QtCore.QThreadPool.globalInstance().start(self._builder)
+        self.update()
+
+    def tileRange(self, level, rect):
+        """Returns range of tile rows and columns of level intersecting rect (QRectF in full resolution px)."""
+        span = self.tileSize * 2 ** level
+        rect = rect.intersected(self.boundingRect())
+        rows = range(int(rect.top() // span), int(np.ceil(rect.bottom() / span)))
+        cols = range(int(rect.left() // span), int(np.ceil(rect.right() / span)))
+        return rows, cols
+
+    def tileRect(self, level, row, col):
+        span = self.tileSize * 2 ** level
+        x0, y0 = col * span, row * span
+        return QtCore.QRectF(x0, y0, min(x0 + span, self.width) - x0, min(y0 + span, self.height) - y0)
+
+    def tile(self, level, row, col, generation=None):
+        """
+        Returns tile as QImage, rendered with the compose function if not cached. If generation is given and the
+        compose function was replaced meanwhile, the tile is not cached and None is returned.
+        """
+        key = (level, row, col)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return None
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+            compose = self.compose
+            currentGeneration = self._generation
+        step = 2 ** level
+        rect = self.tileRect(level, row, col)
+        img = compose(int(rect.top()), int(rect.bottom()), int(rect.left()), int(rect.right()), step)
+        image = qimage2ndarray.array2qimage(img)
+        with self._lock:
+            if currentGeneration == self._generation:
+                self._tiles[key] = image
+                while len(self._tiles) > self.maxTiles:
+                    self._tiles.popitem(last=False)
+            elif generation is not None:
+                return None
+        return image
+
+    def paint(self, painter, option, widget=None):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        ## Coarsest level with at least one image px per screen px
+        level = 0
+        while level < self.levels - 1 and lod * 2 ** (level + 1) <= 1:
+            level += 1
+        rows, cols = self.tileRange(level, option.exposedRect)
+        for row in rows:
+            for col in cols:
+                painter.drawImage(self.tileRect(level, row, col), self.tile(level, row, col))
+
+
+class PyramidBuilderSignals(QtCore.QObject):
+    tileReady = QtCore.pyqtSignal()
+
+
+class PyramidBuilder(QtCore.QRunnable):
+    def __init__(self, item, generation):
+        """
+        Renders the tiles of all downsampled levels of a QGraphicsPyramidItem in a worker thread, coarsest level first.
+        Stops when cancelled or when the compose function of the item was replaced (generation changed).
+        """
+        super().__init__()
+        self.signals = PyramidBuilderSignals()
+        self.item = item
+        self.generation = generation
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        for level in range(self.item.levels - 1, 0, -1):
+            rows, cols = self.item.tileRange(level, self.item.boundingRect())
+            for row in rows:
+                for col in cols:
+                    if self._cancelled:
+                        return
+                    try:
+                        if self.item.tile(level, row, col, generation=self.generation) is None:
+                            return
+                    except Exception as e:
+                        print(clrmsg.ERROR + "Rendering image tile failed:", e)
+                        return
+            self.signals.tileReady.emit()
+
+
 ##############################
 ## Scatter Plot
 
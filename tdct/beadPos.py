@@ -33,6 +33,7 @@ from scipy.optimize import curve_fit, leastsq
 import matplotlib.pyplot as plt
 import tifffile as tf
 from . import parabolic
+from . import zarrStore
 
 try:
     from . import clrmsg
@@ -44,19 +45,28 @@ repeat = 0
 debug = TDCT_debug.debug
 
 
+def openVolume(img):
+    """Image volume from a tiff file path (read completely), a Zarr store path or a zarr array (read lazily, i.e. only
+    the chunks around the bead are loaded) or a numpy.ndarray"""
+    if isinstance(img, str):
+        if zarrStore.isZarr(img):
+            return zarrStore.read(img)
+        return tf.imread(img)
+    elif isinstance(img, np.ndarray) or (zarrStore.zarr is not None and isinstance(img, zarrStore.zarr.Array)):
+        return img
+    if clrmsg and debug is True: print(clrmsg.ERROR)
+    raise TypeError('I can only handle an image path as string or an image volume as numpy.ndarray/zarr array')
+
+
 def getzPoly(x,y,img,n=None,optimize=False):
     """x and y are coordinates
-    img is the path to the z-stack tiff file or a numpy.ndarray from tifffile.py imread function
+    img is the path to the z-stack tiff file or Zarr store, a numpy.ndarray from tifffile.py imread function or a zarr array
     n is the number of points around the max value that are used in the polyfit
     leave n to use the maximum amount of points
     If optimize is set to True, the algorithm will try to optimize the x,y,z position
     !! if optimize is True, 3 values are returned: x,y,z"""
 
-    if not isinstance(img, str) and not isinstance(img, np.ndarray):
-        if clrmsg and debug is True: print(clrmsg.ERROR)
-        raise TypeError('I can only handle an image path as string or an image volume as numpy.ndarray imported from tifffile.py')
-    elif isinstance(img, str):
-        img = tf.imread(img)
+    img = openVolume(img)
 
     data_z = img[:,y,x]
 
@@ -92,16 +102,12 @@ def getzPoly(x,y,img,n=None,optimize=False):
 
 def getzGauss(x,y,img,parent=None,optimize=False,threshold=None,threshVal=0.6,cutout=15):
     """x and y are coordinates
-    img is the path to the z-stack tiff file or a numpy.ndarray from tifffile.py imread function
+    img is the path to the z-stack tiff file or Zarr store, a numpy.ndarray from tifffile.py imread function or a zarr array
     optimize == True kicks off the 2D Gaussian fit and this function will return x,y,z
     threshold == True filters the image where it cuts off at max - min * threshVal (threshVal between 0.1 and 1)
     cutout specifies the FOV for the 2D Gaussian fit"""
 
-    if not isinstance(img, str) and not isinstance(img, np.ndarray):
-        if clrmsg and debug is True: print(clrmsg.ERROR)
-        raise TypeError('I can only handle an image path as string or an image volume as numpy.ndarray imported from tifffile.py')
-    elif isinstance(img, str):
-        img = tf.imread(img)
+    img = openVolume(img)
     x = np.round(x).astype(int)
     y = np.round(y).astype(int)
     if 0 <= x < img.shape[-1] and 0 <= y < img.shape[-2]:
@@ -150,10 +156,7 @@ def getzGauss(x,y,img,parent=None,optimize=False,threshold=None,threshVal=0.6,cu
 
 def optimize_z(x,y,z,image,n=None):
     """Optimize z for poly fit"""
-    if type(image) == str:
-        img = tf.imread(image)
-    elif type(image) == np.ndarray:
-        img = image
+    img = openVolume(image)
 
     data_z = img[:,y,x]
 
@@ -199,10 +202,7 @@ def optimize_xy(x,y,z,image,nx=None,ny=None):
     n is the number of points around the max value that are used in the polyfit
     leave n to use the maximum amount of points"""
     get_nx, get_ny = False, False
-    if type(image) == str:
-        img = tf.imread(image)
-    elif type(image) == np.ndarray:
-        img = image
+    img = openVolume(image)
     ## amount of data points around coordinate
     samplewidth = 10
     data_x = img[z,y,x-samplewidth:x+samplewidth]
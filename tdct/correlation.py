@@ -120,11 +120,17 @@ The procedure is organized as follows:
 # ======================================================================================================================
 
 import os
+import csv
+import json
+import multiprocessing
 import numpy as np
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 import pyto
 import pyto.common as common
 import pyto.util
+import pyto.transform_record as transform_record
 from pyto.rigid_3d import Rigid3D
 
 ########## Functions #############################################################
@@ -133,18 +139,24 @@ from pyto.rigid_3d import Rigid3D
 
 def write_results(
         transf, res_file_name, spots_3d, spots_2d,
-        markers_3d, transformed_3d, markers_2d,rotation_center,modified_translation,imageProps=None):
-    """
+        markers_3d, transformed_3d, markers_2d,rotation_center,modified_translation,imageProps=None,spots_cov=None,
+        sidecar=None):
     """
+    Writes the correlation report (commented text with tab separated tables). The report is assembled in memory and
+    written at once.
 
-    # open results file
-    res_file = open(res_file_name, 'w', newline='')
+    sidecar:	None, 'json' or 'csv' to also write the transformation parameters and tables in machine-readable form.
+                'json' writes one file (report name with the extension .json), 'csv' one file per table (report name
+                with _transformation.csv, _markers.csv, _spots.csv, _uncertainty.csv and _distances.csv).
+    """
+    if sidecar not in (None, 'json', 'csv'):
+        raise ValueError("Sidecar " + str(sidecar) + " was not understood")
 
     # header top
     header = common.make_top_header()
 
-    # extract eulers in degrees
-    eulers = transf.extract_euler(r=transf.q, mode='x', ret='one')
+    # extract eulers in degrees (cached by transf)
+    eulers = transf.get_euler(mode='x')
     eulers = eulers * 180 / np.pi
 
     # correlation parameters
@@ -163,6 +175,13 @@ def write_results(
         "#   - rms error (in 2d pixels) = %6.2f" % transf.rmsError
         ])
 
+    # markers rejected by the robust correlation
+    inliers = getattr(transf, 'inliers', None)
+    if inliers is not None:
+        header.extend([
+            "#   - robust correlation: %d of %d markers used, outliers: %s"
+            % (inliers.sum(), len(inliers), np.flatnonzero(~inliers).tolist())])
+
     # check success
     if transf.optimizeResult['success']:
         header.extend([
@@ -175,78 +194,308 @@ def write_results(
             "#   Repeat run with changed initial values and / or " +
             "increased ninit"])
 
-    # write header
-    for line in header:
-        res_file.write(line + os.linesep)
+    # tables: (name, title lines, column names, columns, format)
+    tables = [(
+        'markers',
+        ["#",
+         "#",
+         "# Transformation of initial (3D) markers",
+         "#",
+         "#	Initial (3D) markers		Transformed initial" +
+         "		Final (2D) markers	Transformed-Final"],
+        ['x_3d', 'y_3d', 'z_3d', 'x_transformed', 'y_transformed', 'z_transformed', 'x_2d', 'y_2d', 'dx', 'dy'],
+        [markers_3d[0,:], markers_3d[1,:], markers_3d[2,:],
+         transformed_3d[0,:], transformed_3d[1,:], transformed_3d[2,:],
+         markers_2d[0,:], markers_2d[1,:], transformed_3d[0,:]-markers_2d[0,:], transformed_3d[1,:]-markers_2d[1,:]],
+        '	%7.2f	%7.2f	%7.2f		%7.2f	%7.2f	%7.2f		%7.2f	%7.2f		%7.2f	%7.2f')]
 
-    # prepare marker lines
-    table = ([
-        "#",
-        "#",
-        "# Transformation of initial (3D) markers",
-        "#",
-        "#	Initial (3D) markers		Transformed initial" +
-        "		Final (2D) markers	Transformed-Final"])
-    out_vars = [
-                markers_3d[0,:], markers_3d[1,:], markers_3d[2,:],
-                transformed_3d[0,:], transformed_3d[1,:], transformed_3d[2,:],
-                markers_2d[0,:], markers_2d[1,:], transformed_3d[0,:]-markers_2d[0,:], transformed_3d[1,:]-markers_2d[1,:]
-                ]
-    out_format = '	%7.2f	%7.2f	%7.2f		%7.2f	%7.2f	%7.2f		%7.2f	%7.2f		%7.2f	%7.2f'
-    ids = list(range(markers_3d.shape[1]))
-    res_tab_markers = pyto.util.arrayFormat(
-        arrays=out_vars, format=out_format, indices=ids, prependIndex=False)
-    table.extend(res_tab_markers)
-
-    # prepare data lines
     if spots_3d.shape[0] != 0:
-        table.extend([
-            "#",
-            "#",
-            "# Correlation of 3D spots (POIs) to 2D",
-            "#",
-            "#	Spots (3D)			Correlated spots"])
-        out_vars = [
-                    spots_3d[0,:], spots_3d[1,:], spots_3d[2,:],
-                    spots_2d[0,:], spots_2d[1,:], spots_2d[2,:]
-                    ]
-        out_format = '	%6.0f	%6.0f	%6.0f		%7.2f	%7.2f	%7.2f'
-        ids = list(range(spots_3d.shape[1]))
-        res_tab_spots = pyto.util.arrayFormat(
-            arrays=out_vars, format=out_format, indices=ids, prependIndex=False)
-        table.extend(res_tab_spots)
+        tables.append((
+            'spots',
+            ["#",
+             "#",
+             "# Correlation of 3D spots (POIs) to 2D",
+             "#",
+             "#	Spots (3D)			Correlated spots"],
+            ['x_3d', 'y_3d', 'z_3d', 'x_2d', 'y_2d', 'z_2d'],
+            [spots_3d[0,:], spots_3d[1,:], spots_3d[2,:], spots_2d[0,:], spots_2d[1,:], spots_2d[2,:]],
+            '	%6.0f	%6.0f	%6.0f		%7.2f	%7.2f	%7.2f'))
+
+    if spots_3d.shape[0] != 0 and spots_cov is not None:
+        # 95% confidence ellipses of the correlated spots (see poi_uncertainty)
+        ellipses = confidence_ellipses(spots_cov)
+        pixelSize = imageProps[1] if imageProps else None
+        names = ['semi_major_px', 'semi_minor_px', 'angle_deg']
+        out_vars = [ellipses[:,0], ellipses[:,1], ellipses[:,2]]
+        out_format = '	%7.2f	%7.2f		%7.1f'
+        if pixelSize:
+            names.extend(['semi_major_um', 'semi_minor_um'])
+            out_vars.extend([ellipses[:,0]*pixelSize, ellipses[:,1]*pixelSize])
+            out_format += '		%7.3f	%7.3f'
+        tables.append((
+            'uncertainty',
+            ["#",
+             "#",
+             "# Uncertainty of correlated spots (95% confidence ellipses from resampling the markers)",
+             "#",
+             "#	Semi-axes in px		Angle" + ("		Semi-axes in um (pixel size: {0} um)".format(pixelSize)
+                                             if pixelSize else "")],
+            names, out_vars, out_format))
 
     if spots_3d.shape[0] != 0 and imageProps:
         # POI distance from the FIB image's center in px and um, to mark calculated POI positions on the FIB
-        table.extend([
-            "#",
-            "#",
-            "# POI distance from the center of the SEM/FIB image in px and um",
-            "#",
-            "# Note: The center of the dual beam microscope view is regarded as 0,0 and distances from there",
-            "#       are measured in um. This center is at x/y = {0}/{1} in the correlated SEM/FIB tiff image".format(
-                imageProps[0][1]*0.5, imageProps[0][0]*0.5),
-            "#",
-            "#	Distance in px		Distance in um (pixel size: {0} um)".format(imageProps[1])])
-        out_vars = [
-                    spots_2d[0,:]-imageProps[0][1]*0.5, imageProps[0][0]*0.5-spots_2d[1,:],
-                    (spots_2d[0,:]-imageProps[0][1]*0.5)*imageProps[1], (imageProps[0][0]*0.5-spots_2d[1,:])*imageProps[1]
-                    ]
-        out_format = '	%7.2f	%7.2f		%7.2f	%7.2f'
-        ids = list(range(spots_2d.shape[1]))
-        res_tab_spots = pyto.util.arrayFormat(
-            arrays=out_vars, format=out_format, indices=ids, prependIndex=False)
-        table.extend(res_tab_spots)
-
-    # write data table
-    for line in table:
-        res_file.write(line + os.linesep)
+        tables.append((
+            'distances',
+            ["#",
+             "#",
+             "# POI distance from the center of the SEM/FIB image in px and um",
+             "#",
+             "# Note: The center of the dual beam microscope view is regarded as 0,0 and distances from there",
+             "#       are measured in um. This center is at x/y = {0}/{1} in the correlated SEM/FIB tiff image".format(
+                 imageProps[0][1]*0.5, imageProps[0][0]*0.5),
+             "#",
+             "#	Distance in px		Distance in um (pixel size: {0} um)".format(imageProps[1])],
+            ['dx_px', 'dy_px', 'dx_um', 'dy_um'],
+            [spots_2d[0,:]-imageProps[0][1]*0.5, imageProps[0][0]*0.5-spots_2d[1,:],
+             (spots_2d[0,:]-imageProps[0][1]*0.5)*imageProps[1], (imageProps[0][0]*0.5-spots_2d[1,:])*imageProps[1]],
+            '	%7.2f	%7.2f		%7.2f	%7.2f'))
+
+    # assemble and write the report at once
+    report = [os.linesep.join(header) + os.linesep]
+    for name, title, names, columns, out_format in tables:
+        report.append(os.linesep.join(title) + os.linesep)
+        report.append(pyto.util.arrayFormat(
+            arrays=columns, format=out_format, indices=list(range(len(columns[0]))), join=os.linesep))
+    with open(res_file_name, 'w', newline='') as res_file:
+        res_file.write(''.join(report))
+
+    if sidecar is None:
+        return
+    parameters = {
+        'euler_phi_psi_theta_deg': [eulers[0], eulers[2], eulers[1]],
+        'scale': transf.s_scalar,
+        'translation': np.asarray(transf.d, dtype=float).tolist(),
+        'rotation_center': np.asarray(rotation_center, dtype=float).tolist(),
+        'translation_rotation_center': np.asarray(modified_translation, dtype=float).ravel().tolist(),
+        'rms_error': transf.rmsError,
+        'optimization_success': bool(transf.optimizeResult['success']),
+        'optimization_status': int(transf.optimizeResult['status']),
+        'outliers': None if inliers is None else np.flatnonzero(~inliers).tolist()}
+    root = os.path.splitext(res_file_name)[0]
+    if sidecar == 'json':
+        parameters['record'] = transform_record.to_objects(transform_record.make_records([transf]))[0]
+        ## nan (e.g. uncertainty from less than 4 markers) is not valid JSON, written as null
+        content = {'transformation': parameters, 'tables': {
+            name: {'columns': names, 'rows': [
+                [None if value != value else value for value in row]
+                for row in np.column_stack(columns).astype(float).tolist()]}
+            for name, title, names, columns, out_format in tables}}
+        with open(root + '.json', 'w') as sidecar_file:
+            json.dump(content, sidecar_file, indent=1)
+    elif sidecar == 'csv':
+        with open(root + '_transformation.csv', 'w', newline='') as sidecar_file:
+            writer = csv.writer(sidecar_file)
+            writer.writerow(['name', 'value'])
+            for name, value in parameters.items():
+                writer.writerow([name, json.dumps(value)])
+        for name, title, names, columns, out_format in tables:
+            with open(root + '_' + name + '.csv', 'w', newline='') as sidecar_file:
+                writer = csv.writer(sidecar_file)
+                writer.writerow(names)
+                writer.writerows(np.column_stack(columns).astype(float).tolist())
+
+
+def leave_one_out(markers_3d, markers_2d, transf):
+    """
+    Held-out residuals of the correlation markers, e.g. to find a misplaced marker.
+
+    Each marker is left out in turn, the correlation is found from the remaining markers and the left-out marker is
+    transformed with it. Instead of the multi-start optimization of main(), every sub-fit is a single local
+    optimization warm-started from the solution for all markers (transf, see Rigid3D.find_32_local). The few
+    sub-fits run in this thread, a pool does not pay off (optimizations hold the GIL, processes take longer to start).
+
+    Arguments:
+      - markers_3d: 3D marker coordinates (n_markers x 3, as for main())
+      - markers_2d: 2D marker coordinates (n_markers x 2 or more, as for main())
+      - transf: correlation from all markers (correlation_results[0])
+
+    Returns 2 x n_markers array of held-out residuals (transformed 3D marker - 2D marker, in 2d pixels). All
+    residuals are nan for less than 4 markers (at least 3 are needed for each sub-fit).
+    """
+    mark_3d = np.asarray(markers_3d, dtype=float)[:, :3].transpose()
+    mark_2d = np.asarray(markers_2d, dtype=float)[:, :2].transpose()
+    n_markers = mark_3d.shape[1]
+    residuals = np.full((2, n_markers), np.nan)
+    if n_markers < 4:
+        return residuals
+
+    for index in range(n_markers):
+        keep = np.arange(n_markers) != index
+        sub = Rigid3D.find_32_local(x=mark_3d[:, keep], y=mark_2d[:, keep], init=transf, disp=False)
+        residuals[:, index] = sub.transform(x=mark_3d[:, [index]])[:2, 0] - mark_2d[:, index]
+    return residuals
+
+
+def _refit_spots(x, y, spots, init, samples):
+    """Correlated spots (n_samples x 2 x n_spots) of the warm-started fits of the marker samples (rows of indices)"""
+    spots_2d = np.empty((len(samples), 2, spots.shape[1]))
+    for index, sample in enumerate(samples):
+        sub = Rigid3D.find_32_local(x=x[:, sample], y=y[:, sample], init=init, disp=False)
+        spots_2d[index] = sub.transform(x=spots)[:2]
+    return spots_2d
+
+
+def poi_uncertainty(
+        markers_3d, markers_2d, spots_3d, transf, method='bootstrap', n_samples=200, workers=None, seed=None):
+    """
+    Uncertainty of the correlated spots (POIs) due to the marker positions, estimated by resampling the markers.
+
+    For each sample of markers the correlation is found by a single local optimization warm-started from the
+    solution for all markers (transf, see Rigid3D.find_32_local) and the spots are transformed with it. The fits run
+    in a process pool (optimizations hold the GIL), the samples are drawn beforehand so the result does not depend on
+    the number of workers. The worker processes are always spawned, forking the (multithreaded) GUI process could
+    copy locks held by its worker threads. Frozen executables have to call multiprocessing.freeze_support() first.
+
+    Arguments:
+      - markers_3d, markers_2d: marker coordinates (n_markers x 3 and n_markers x 2 or more, as for main())
+      - spots_3d: 3D spot coordinates (n_spots x 3)
+      - transf: correlation from all markers (correlation_results[0])
+      - method: 'bootstrap' (n_samples samples of n_markers markers drawn with replacement) or 'jackknife' (each
+      marker left out once)
+      - workers: number of processes, None for the number of CPUs, 1 to fit in this process
+      - seed: random seed of the bootstrap samples (passed to numpy.random.default_rng())
+
+    Returns n_spots x 2 x 2 covariance matrices of the correlated spots (in 2d pixels^2, see confidence_ellipses()).
+    All are nan for less than 4 markers.
+    """
+    mark_3d = np.asarray(markers_3d, dtype=float)[:, :3].transpose()
+    mark_2d = np.asarray(markers_2d, dtype=float)[:, :2].transpose()
+    spots = np.asarray(spots_3d, dtype=float).reshape(-1, 3).transpose()
+    n_markers = mark_3d.shape[1]
+    cov = np.full((spots.shape[1], 2, 2), np.nan)
+    if n_markers < 4 or spots.shape[1] == 0:
+        return cov
+
+    if method == 'bootstrap':
+        samples = np.random.default_rng(seed).integers(0, n_markers, (n_samples, n_markers))
+        ## At least 3 different markers are needed for a fit
+        samples = samples[[len(np.unique(sample)) >= 3 for sample in samples]]
+    elif method == 'jackknife':
+        samples = np.array([np.delete(np.arange(n_markers), index) for index in range(n_markers)])
+    else:
+        raise ValueError("Method " + str(method) + " was not understood")
+
+    ## Initial parameters as array, pickled for each process instead of the transformation
+    ck = getattr(transf, 'ck', None)
+    if ck is None:
+        ck = Rigid3D.euler_to_ck(Rigid3D.extract_euler(transf.q, mode='x', ret='one'), mode='x')
+    init = np.hstack((ck, [transf.s_scalar]))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        spots_2d = _refit_spots(mark_3d, mark_2d, spots, init, samples)
+    else:
+        chunks = np.array_split(samples, min(len(samples), 4*workers))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            spots_2d = np.concatenate(list(executor.map(
+                _refit_spots, *zip(*[(mark_3d, mark_2d, spots, init, chunk) for chunk in chunks]))))
+
+    deviation = spots_2d - spots_2d.mean(axis=0)
+    cov = np.einsum('kis,kjs->sij', deviation, deviation)
+    if method == 'bootstrap':
+        cov /= len(samples) - 1
+    else:
+        cov *= (len(samples) - 1) / float(len(samples))
+    return cov
+
+
+def confidence_ellipses(cov, confidence=0.95):
+    """
+    Confidence ellipses of normal distributed 2D positions with the covariance matrices cov (n x 2 x 2).
+
+    Returns n x 3 array of the semi-major and semi-minor axes (units of the positions) and the angle of the major axis
+    to the x axis (0 to 180 degrees), nan for nan covariances.
+    """
+    cov = np.asarray(cov, dtype=float).reshape(-1, 2, 2)
+    ellipses = np.full((len(cov), 3), np.nan)
+    valid = np.isfinite(cov).all(axis=(1, 2))
+    if valid.any():
+        ## Quantile of the chi-squared distribution with 2 degrees of freedom
+        factor = np.sqrt(-2*np.log(1 - confidence))
+        eigenvalues, eigenvectors = np.linalg.eigh(cov[valid])
+        ellipses[valid, 0] = factor*np.sqrt(np.maximum(eigenvalues[:, 1], 0))
+        ellipses[valid, 1] = factor*np.sqrt(np.maximum(eigenvalues[:, 0], 0))
+        ellipses[valid, 2] = np.degrees(np.arctan2(eigenvectors[:, 1, 1], eigenvectors[:, 0, 1])) % 180
+    return ellipses
+
+
+class WarmStart(object):
+    """
+    Correlation state kept between calls of main(), e.g. while markers are edited in the correlation window.
+
+    The optimal Caley-Klein parameters and scale of the last correlation are kept, so that after a small marker edit
+    the correlation is found by a single local optimization started from them (Rigid3D.find_32_local) instead of the
+    multi-start optimization. The multi-start optimization is only run for the first correlation, when the number of
+    markers changed, or when the local solution is worse than the last one (sum of squared marker deviations larger
+    by more than the relative tolerance rtol, or failed optimization). In the latter case the better solution is used.
+
+    Usage:
+        >>> warm_start = correlation.WarmStart()
+        >>> correlation.main(markers_3d, markers_2d, spots_3d, rotation_center, '', warm_start=warm_start)
+    """
+
+    def __init__(self, rtol=0.1):
+        self.rtol = rtol
+        ## Number of correlations found by a single local optimization and by the multi-start optimization
+        self.n_local = 0
+        self.n_multi = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the last correlation, the next one is found by the multi-start optimization"""
+        self.transf = None
+        self.shape = None
+
+    def find(self, x, y, multi_start):
+        """
+        Correlation of the markers x (3 x n_markers) and y (2 x n_markers) warm-started from the last one.
+
+        multi_start:	callable returning the multi-start solution (Rigid3D) for x and y
+        """
+        last = self.transf
+        if last is None or self.shape != x.shape:
+            transf = multi_start()
+            self.n_multi += 1
+        else:
+            transf = Rigid3D.find_32_local(x=x, y=y, init=last)
+            worse = transf.optimizeResult.fun > last.optimizeResult.fun*(1 + self.rtol) + 1e-9
+            if worse or not transf.optimizeResult.success:
+                multi = multi_start()
+                self.n_multi += 1
+                if not transf.optimizeResult.success or multi.optimizeResult.fun < transf.optimizeResult.fun:
+                    transf = multi
+            else:
+                self.n_local += 1
+        self.transf = transf
+        self.shape = x.shape
+        return transf
 
 
 ########## Main ##################################################################
 ##################################################################################
 
-def main(markers_3d,markers_2d,spots_3d,rotation_center,results_file,imageProps=None):
+def main(
+        markers_3d,markers_2d,spots_3d,rotation_center,results_file,imageProps=None,robust=None,threshold=5.,
+        warm_start=None,uncertainty=None,sidecar=None):
+    """
+    robust:		None for the least squares correlation of all markers, 'ransac' or 'trimmed' for the outlier
+                rejecting correlation (see Rigid3D.find_32_robust). Rejected markers are False in transf.inliers.
+    threshold:	max marker deviation (in 2d pixels) of inliers for robust='ransac'
+    warm_start:	WarmStart instance to start the correlation from the previous one (least squares correlation only)
+    uncertainty:	None, 'bootstrap' or 'jackknife' to estimate the covariances of the correlated spots (see
+                    poi_uncertainty), returned as last element and written to the results file
+    sidecar:	None, 'json' or 'csv' to write the results also in machine-readable form (see write_results)
+    """
 
     random_rotations = True
     rotation_init = 'gl2'
@@ -270,10 +519,16 @@ def main(markers_3d,markers_2d,spots_3d,rotation_center,results_file,imageProps=
         einit = rotation_init
 
     # establish correlation
-    transf = Rigid3D.find_32(
-        x=mark_3d, y=mark_2d, scale=scale,
+    multi_start = partial(
+        Rigid3D.find_32, x=mark_3d, y=mark_2d, scale=scale,
         randome=random_rotations, einit=einit, einit_dist=restrict_rotations,
         randoms=random_scale, sinit=scale_init, ninit=ninit)
+    if robust:
+        transf = Rigid3D.find_32_robust(x=mark_3d, y=mark_2d, mode=robust, threshold=threshold, scale=scale)
+    elif warm_start is not None:
+        transf = warm_start.find(x=mark_3d, y=mark_2d, multi_start=multi_start)
+    else:
+        transf = multi_start()
 
     if imageProps:
         # establish correlation for cubic rotation (offset added to coordinates)
@@ -286,10 +541,16 @@ def main(markers_3d,markers_2d,spots_3d,rotation_center,results_file,imageProps=
         mark_3d_cube[1] += offsetY
         mark_3d_cube[2] += offsetZ
 
-        transf_cube = Rigid3D.find_32(
-            x=mark_3d_cube, y=mark_2d, scale=scale,
-            randome=random_rotations, einit=einit, einit_dist=restrict_rotations,
-            randoms=random_scale, sinit=scale_init, ninit=ninit)
+        if robust:
+            ## Same rotation and scale, only the translation differs: refit the inliers locally
+            transf_cube = Rigid3D.find_32_local(x=mark_3d_cube[:, transf.inliers], y=mark_2d[:, transf.inliers], init=transf)
+        elif warm_start is not None:
+            transf_cube = Rigid3D.find_32_local(x=mark_3d_cube, y=mark_2d, init=transf)
+        else:
+            transf_cube = Rigid3D.find_32(
+                x=mark_3d_cube, y=mark_2d, scale=scale,
+                randome=random_rotations, einit=einit, einit_dist=restrict_rotations,
+                randoms=random_scale, sinit=scale_init, ninit=ninit)
     else:
         transf_cube = transf
 
@@ -302,6 +563,15 @@ def main(markers_3d,markers_2d,spots_3d,rotation_center,results_file,imageProps=
     else:
         spots_2d = None
 
+    # uncertainty of correlated spots
+    if uncertainty and spots_3d.shape[1] != 0:
+        used = getattr(transf, 'inliers', np.ones(mark_3d.shape[1], dtype=bool))
+        spots_cov = poi_uncertainty(
+            mark_3d[:, used].transpose(), mark_2d[:, used].transpose(), spots_3d.transpose(), transf,
+            method=uncertainty)
+    else:
+        spots_cov = None
+
     # transform markers
     transf_3d = transf.transform(x=mark_3d)
 
@@ -316,9 +586,10 @@ def main(markers_3d,markers_2d,spots_3d,rotation_center,results_file,imageProps=
             transf=transf, res_file_name=results_file,
             spots_3d=spots_3d, spots_2d=spots_2d,
             markers_3d=mark_3d, transformed_3d=transf_3d, markers_2d=mark_2d,
-            rotation_center=rotation_center, modified_translation=modified_translation,imageProps=imageProps)
+            rotation_center=rotation_center, modified_translation=modified_translation,imageProps=imageProps,
+            spots_cov=spots_cov, sidecar=sidecar)
     cm_3D_markers = mark_3d.mean(axis=-1).tolist()
 
     # delta calc,real
     delta2D = transf_3d[:2,:] - mark_2d
-    return [transf, transf_3d, spots_2d, delta2D, cm_3D_markers, modified_translation]
+    return [transf, transf_3d, spots_2d, delta2D, cm_3D_markers, modified_translation, spots_cov]
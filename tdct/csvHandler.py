@@ -7,8 +7,12 @@ Usage:
     import csvHandler
 e.g. import:
     >>> model = csvHandler.csv2model('test.csv',delimiter="\t",sniff=False,parent=None)
+e.g. import of marker coordinates (n x 3 numpy array):
+    >>> markers = csvHandler.csv2array('test.csv',delimiter="\t",sniff=False,parent=None)
 e.g. export:
     >>> csvHandler.model2csv(model,'test.csv',delimiter="\t")
+e.g. export of marker coordinates:
+    >>> csvHandler.array2csv(markers,'test.csv',delimiter="\t")
 
 # @Title			: csvHandler
 # @Project			: 3DCTv2
@@ -30,6 +34,9 @@ e.g. export:
 # ======================================================================================================================
 
 import csv
+import itertools
+import warnings
+import numpy as np
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 
@@ -67,12 +74,34 @@ def csv2list(csv_file_in,delimiter="\t",sniff=False,parent=None):
     return itemlist
 
 
-def delimiterSniffer(csv_file_in,delimiter,parent):
+## read marker coordinates (x, y and optional z) into a n x 3 numpy array. z is 0 for rows without z
+def csv2array(csv_file_in,delimiter="\t",sniff=False,parent=None):
+    if sniff is True:
+        try:
+            delimiter = delimiterSniffer(csv_file_in, delimiter, parent)
+        except csv.Error:
+            ## No delimiter detected (e.g. single column or empty file), use the given one
+            pass
+    try:
+        with warnings.catch_warnings():
+            ## Empty files only warn
+            warnings.simplefilter("ignore", UserWarning)
+            markers = np.loadtxt(csv_file_in, delimiter=delimiter, ndmin=2)
+    except ValueError:
+        ## Rows of different length (e.g. some without z), non numeric fields still raise a ValueError
+        markers = [[float(field) for field in row[:3]] for row in csv2list(csv_file_in, delimiter=delimiter) if row]
+        markers = np.array([row + [0.0] * (3 - len(row)) for row in markers]).reshape(-1, 3)
+    if markers.shape[1] < 3:
+        markers = np.hstack([markers, np.zeros((markers.shape[0], 3 - markers.shape[1]))])
+    return markers[:, :3]
+
+
+def delimiterSniffer(csv_file_in,delimiter,parent,sampleLines=50):
     ## csv.Sniffer attempts to resolve the correct delimiter
     sniffer = csv.Sniffer()
-    ## Sniff for delimiter
+    ## Sniff for delimiter on the first lines only, reading large files entirely just for sniffing is slow
     with open(csv_file_in) as csv_file:
-        dialect = sniffer.sniff(csv_file.read())
+        dialect = sniffer.sniff("".join(itertools.islice(csv_file, sampleLines)))
     ## Decide what to do
     if dialect.delimiter == delimiter:
         return delimiter
@@ -97,6 +126,14 @@ def delimiterSniffer(csv_file_in,delimiter,parent):
             return delimiter
 
 
+## write marker coordinates (n x 3 array, e.g. from MainWidget.model2np) to csv/tsv file. Floats are written like the
+## model's cells (shortest representation), so the file is the same as written by model2csv
+def array2csv(markers,csv_file_out,delimiter="\t"):
+    markers = np.asarray(markers, dtype=float)
+    markers = markers.reshape(-1, markers.shape[-1] if markers.size else 3)
+    np.savetxt(csv_file_out, markers, fmt='%s', delimiter=delimiter)
+
+
 ## write model data to csv/tsv file
 def model2csv(model,csv_file_out,delimiter="\t"):
     with open(csv_file_out, "w") as fileOutput:
@@ -15,6 +15,14 @@ The spline method also returns a graph representing the interpolation in z of on
 middle for comparison between the original data and the linear as well as the spline interpolation.
 
 kwargs:
+	progress (callable):
+				Called with the progress in percent (int 0-100). Calls are throttled (see Progress), so it can
+				directly update a GUI via a signal/queue without slowing down the numerics.
+
+	cancel (CancelToken):
+				Checked between chunks (slices, channels) of work. When cancelled, the function raises
+				Cancelled. Files written up to then are kept.
+
 	saveorigstack (boolean):
 				If an image sequence is used, in the form of "Tile_001-001-001_1-000.tif"
 				(FEI MAPS/LA tif sequence naming scheme), this program will save a single
@@ -29,6 +37,14 @@ kwargs:
 				representing the interpolation in z of one x,y pixel in the middle of input stack
 				for comparison between the original data and the linear as well as the spline interpolation.
 
+	compression (str):
+				None (default), 'zlib' or 'zstd' (needs imagecodecs) for lossless compressed output files.
+				imagej, ome and bigtiff select the output flavour, see writeStack.
+
+	outputFormat (str):
+				'tif' (default) or 'zarr' for chunked, multiscale Zarr stores of the resliced stacks
+				(needs zarr, see zarrStore).
+
 # @Title			: stackProcessing
 # @Project			: 3DCTv2
 # @Description		: Process image stack files (.tif)
@@ -71,7 +87,6 @@ kwargs:
 
 import sys
 import os
-import re
 import fnmatch
 import time
 import numpy as np
@@ -89,19 +104,102 @@ if getattr(sys, 'frozen', False):
 else:
 	execdir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(execdir)
+import threading
 try:
 	import tifffile as tf
-	from PyQt5 import QtWidgets
 	from . import clrmsg
 	from . import TDCT_debug
+	from . import tiffMetadata
+	from . import zarrStore
 except:
 	sys.exit("Please install tifffile, e.g.: pip install tifffile")
+## Optional: zstd compression and floating point predictor for writeStack
+try:
+	import imagecodecs
+except ImportError:
+	imagecodecs = None
 
 debug = TDCT_debug.debug
 
 
-def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear', flip=False, saveorigstack=True, showgraph=False, customSaveDir=None):
-	"""Main function handling the file type and parsing of filenames/directories"""
+class Cancelled(Exception):
+	"""Raised by the processing functions when their CancelToken was cancelled"""
+	pass
+
+
+class CancelToken():
+	"""Cancel flag that can be set from any thread (e.g. a GUI) while the processing runs in a worker"""
+	def __init__(self):
+		self._event = threading.Event()
+
+	def cancel(self):
+		self._event.set()
+
+	def isCancelled(self):
+		return self._event.is_set()
+
+
+class Progress():
+	"""Progress reporting and cancellation for the processing functions.
+
+	callback:	callable(percent) or None. Only called when the integer percentage changed and at most every
+				interval seconds (100 is always reported), so it can be called per slice in hot loops.
+	cancel:		CancelToken or None, checked on every call.
+
+	Calling the object reports a percentage, sub() returns a Progress mapping 0-100 onto a part of the range,
+	e.g. for processing several channels one after the other.
+	"""
+	def __init__(self, callback=None, cancel=None, interval=0.1, start=0, end=100, parent=None):
+		self.callback = callback
+		self.cancel = cancel
+		self.interval = interval
+		self.start = start
+		self.end = end
+		self.parent = parent
+		self.last = -1
+		self.lastTime = 0
+
+	@staticmethod
+	def wrap(progress=None, cancel=None):
+		"""Returns a Progress instance for the progress/cancel arguments of the public processing functions"""
+		if isinstance(progress, Progress):
+			return progress
+		return Progress(progress, cancel)
+
+	def sub(self, start, end):
+		return Progress(start=self.start+(self.end-self.start)*start/100., end=self.start+(self.end-self.start)*end/100., parent=self)
+
+	def check(self):
+		root = self
+		while root.parent is not None:
+			root = root.parent
+		if root.cancel is not None and root.cancel.isCancelled():
+			raise Cancelled()
+
+	def __call__(self, percent):
+		if self.parent is not None:
+			self.parent(self.start+(self.end-self.start)*percent/100.)
+			return
+		self.check()
+		percent = int(percent)
+		if self.callback is None or percent == self.last:
+			return
+		now = time.time()
+		if percent >= 100 or now - self.lastTime >= self.interval:
+			self.last = percent
+			self.lastTime = now
+			self.callback(percent)
+
+
+def main(
+		img_path, ss_in, ss_out, progress=None, interpolationmethod='linear', flip=False, saveorigstack=True, showgraph=False,
+		customSaveDir=None, cancel=None, compression=None, imagej=False, ome=False, bigtiff=None, outputFormat='tif'):
+	"""Main function handling the file type and parsing of filenames/directories
+
+	compression, imagej, ome and bigtiff set the output format, see writeStack. With outputFormat 'zarr' the
+	stacks are written as chunked, multiscale Zarr stores instead (see zarrStore.write).
+	"""
+	progress = Progress.wrap(progress, cancel)
 
 	## Raise "error" when program has nothing to do due to all arguments set to none/false
 	if interpolationmethod == 'none' and saveorigstack is False and showgraph is False:
@@ -110,9 +208,7 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 	## For single image stack files
 	if os.path.isfile(img_path) is True:
 		if debug is True: print(clrmsg.DEBUG, "Loading image: ", img_path)
-		if qtprocessbar:
-			qtprocessbar.setValue(20)
-			QtWidgets.QApplication.processEvents()
+		progress(20)
 		img = tf.imread(img_path)
 		if len(img.shape) < 3:
 			print(clrmsg.ERROR, "ERROR: This seems to be a 2D image with the shape {0}. Please select a stack image file.".format(img.shape))
@@ -122,9 +218,7 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 			img = np.flip(img, axis=-1)
 		if debug is True: print(clrmsg.DEBUG, "		...done.")
 		## Get pixel size
-		if qtprocessbar:
-			qtprocessbar.setValue(40)
-			QtWidgets.QApplication.processEvents()
+		progress(40)
 		try:
 			pixelsize = pxSize(img_path)
 			if pixelsize is not None:
@@ -137,37 +231,30 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 			px_info = False
 		## Start Processing
 		if debug is True: print(clrmsg.DEBUG, px_info)
-		if qtprocessbar:
-			qtprocessbar.setValue(60)
-			QtWidgets.QApplication.processEvents()
+		progress(60)
 		file_out_int = os.path.splitext(os.path.split(img_path)[1])[0]+"_flip_resliced.tif" if flip else os.path.splitext(os.path.split(img_path)[1])[0]+"_resliced.tif"
 		if customSaveDir:
 			file_out_int = os.path.join(customSaveDir, file_out_int)
 		else:
 			file_out_int = os.path.join(img_path, file_out_int)
 		if debug is True: print(clrmsg.DEBUG, "Interpolating...")
-		img_int = interpol(img, ss_in, ss_out, interpolationmethod, showgraph)
-		if qtprocessbar:
-			qtprocessbar.setValue(80)
-			QtWidgets.QApplication.processEvents()
+		## Linear interpolation is written slice by slice while it is calculated
+		img_int = interpol(img, ss_in, ss_out, interpolationmethod, showgraph, progress=progress.sub(60,80), lazy=True)
 		if type(img_int) == str:
 			if debug is True: print(clrmsg.DEBUG, img_int)
 			return
 		if img_int is not None:
 			if debug is True: print(clrmsg.DEBUG, "Saving interpolated stack as: ", file_out_int)
-			if px_info is True:
-				tf.imsave(file_out_int, img_int, metadata={'PixelSize': str(pixelsize),'FocusStepSize': str(ss_out/1000)})
-			else:
-				tf.imsave(file_out_int, img_int)
+			writeOutput(
+				file_out_int, img_int, outputFormat, shape=interpolShape(img.shape, ss_in, ss_out), dtype=img.dtype,
+				pixelSize=pixelsize if px_info is True else None, focusStepSize=ss_out/1000 if px_info is True else None,
+				compression=compression, imagej=imagej, ome=ome, bigtiff=bigtiff,
+				progress=progress.sub(80,100) if isinstance(img_int, np.ndarray) else progress.sub(60,100))
 			if debug is True: print(clrmsg.DEBUG, "		...done.")
-		if qtprocessbar:
-			qtprocessbar.setValue(100)
-			QtWidgets.QApplication.processEvents()
+		progress(100)
 	## For image sequence (only FEI MAPS/LA image sequences at the moment)
 	elif os.path.isdir(img_path):
-		if qtprocessbar:
-			qtprocessbar.setValue(5)
-			QtWidgets.QApplication.processEvents()
+		progress(5)
 		## bugfix for linux: os.listdir returns unsorted file list
 		files = sorted(os.listdir(img_path))
 		if debug is True: print(clrmsg.DEBUG, "Checking directory: ", img_path)
@@ -187,9 +274,7 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 		## Channel numbers in filename i zero-based, so add 1 for total number
 		channels = int(max(channels))+1
 		## Get pixel size
-		if qtprocessbar:
-			qtprocessbar.setValue(10)
-			QtWidgets.QApplication.processEvents()
+		progress(10)
 		try:
 			for filename in files:
 				if fnmatch.fnmatch(filename, 'Tile_*.tif'):
@@ -205,14 +290,12 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 			print(clrmsg.ERROR, 'Error while adding pixel size information:', e, '... skipping')
 			px_info = False
 		## Start Processing
-		if qtprocessbar:
-			qtprocessbar.setValue(20)
-			QtWidgets.QApplication.processEvents()
+		progress(20)
 		if debug is True: print(clrmsg.DEBUG, px_info)
 		for i in range(channels):
-			if qtprocessbar:
-				qtprocessbar.setValue(qtprocessbar.value()+int(20/channels))
-				QtWidgets.QApplication.processEvents()
+			## Each channel gets an equal share of the remaining 80%
+			channelProgress = progress.sub(20+80*i/channels, 20+80*(i+1)/channels)
+			channelProgress(0)
 			if debug is True: print(clrmsg.DEBUG, "Processing channel {0} of {1}".format(i+1, channels))
 			filelist = []
 			## Gather filenames from same channel
@@ -224,9 +307,7 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 			if flip:
 				if debug is True: print(clrmsg.DEBUG, "Flipping...")
 				img = np.flip(img, axis=-1)
-			if qtprocessbar:
-				qtprocessbar.setValue(qtprocessbar.value()+int(20/channels))
-				QtWidgets.QApplication.processEvents()
+			channelProgress(25)
 			## Generate file output name
 			file_out_int = os.path.basename(os.path.normpath(img_path))+"_"+str(i)+"_flip_resliced.tif" if flip else os.path.basename(os.path.normpath(img_path))+"_"+str(i)+"_resliced.tif"
 			if customSaveDir:
@@ -241,79 +322,134 @@ def main(img_path, ss_in, ss_out, qtprocessbar=None, interpolationmethod='linear
 				else:
 					file_out_orig = os.path.join(img_path, file_out_orig)
 				if debug is True: print(clrmsg.DEBUG, "Saving original image stack as single stack file: {0} |shape: {1}".format(file_out_orig,img.shape))
-				if px_info is True:
-					tf.imsave(file_out_orig, img, metadata={'PixelSize': str(pixelsize),'FocusStepSize': str(pixelsizeZ)})
-				else:
-					tf.imsave(file_out_orig, img)
+				writeOutput(
+					file_out_orig, img, outputFormat, pixelSize=pixelsize if px_info is True else None,
+					focusStepSize=pixelsizeZ if px_info is True else None,
+					compression=compression, imagej=imagej, ome=ome, bigtiff=bigtiff, progress=channelProgress.sub(25,50))
 				if debug is True: print(clrmsg.DEBUG, "		...done.")
-				if qtprocessbar:
-					qtprocessbar.setValue(qtprocessbar.value()+int(20/channels))
-					QtWidgets.QApplication.processEvents()
+				channelProgress(50)
 			## In case only the original image sequence is saved as a single stack file the interpolation is skipped
 			if interpolationmethod == 'none' and showgraph is False:
 				pass
 			else:
 				if debug is True: print(clrmsg.DEBUG, "Interpolating...")
-				img_int = interpol(img, ss_in, ss_out, interpolationmethod, showgraph)
+				img_int = interpol(img, ss_in, ss_out, interpolationmethod, showgraph, progress=channelProgress.sub(50,90), lazy=True)
 				## Error handling from 'interpol' function
 				if type(img_int) == str:
 					print(clrmsg.ERROR, img_int)
 					return
 				elif img_int is not None:
 					if debug is True: print(clrmsg.DEBUG, "Saving interpolated stack as: ", file_out_int)
-					if px_info is True:
-						tf.imsave(file_out_int, img_int, metadata={'PixelSize': str(pixelsize),'FocusStepSize': str(ss_out/1000)})
-					else:
-						tf.imsave(file_out_int, img_int)
+					writeOutput(
+						file_out_int, img_int, outputFormat, shape=interpolShape(img.shape, ss_in, ss_out), dtype=img.dtype,
+						pixelSize=pixelsize if px_info is True else None, focusStepSize=ss_out/1000 if px_info is True else None,
+						compression=compression, imagej=imagej, ome=ome, bigtiff=bigtiff,
+						progress=channelProgress.sub(90,100) if isinstance(img_int, np.ndarray) else channelProgress.sub(50,100))
 					if debug is True: print(clrmsg.DEBUG, "		...done.")
-				if qtprocessbar:
-					qtprocessbar.setValue(qtprocessbar.value()+int(20/channels))
-					QtWidgets.QApplication.processEvents()
-		if qtprocessbar:
-			qtprocessbar.setValue(100)
-			QtWidgets.QApplication.processEvents()
+				channelProgress(100)
+		progress(100)
 	else:
 		print(clrmsg.ERROR, 'ERROR: Path is neither a valid file nor a valid directory!')
 
 
+def writeOutput(path, data, outputFormat='tif', imagej=False, ome=False, bigtiff=None, **kwargs):
+	"""Write stack with writeStack (outputFormat 'tif') or as Zarr store (outputFormat 'zarr', the file extension of
+	path is replaced by .zarr, see zarrStore.write). kwargs: shape, dtype, pixelSize, focusStepSize, compression, progress"""
+	if outputFormat == 'zarr':
+		zarrStore.write(os.path.splitext(path)[0]+'.zarr', data, **kwargs)
+	else:
+		writeStack(path, data, imagej=imagej, ome=ome, bigtiff=bigtiff, **kwargs)
+
+
+def readMetadata(img_path):
+	"""Pixel size meta data to carry over to processed files, empty if the file has none or cannot be parsed"""
+	try:
+		return tiffMetadata.read(img_path)
+	except Exception as e:
+		print(clrmsg.ERROR, 'Error while reading pixel size information:', e, '... skipping')
+		return tiffMetadata.TiffMetadata(img_path)
+
+
+def writeStack(
+		path, data, shape=None, dtype=None, pixelSize=None, focusStepSize=None, compression=None,
+		imagej=False, ome=False, bigtiff=None, progress=None, cancel=None):
+	"""Write an image stack page by page, e.g. while it is calculated.
+
+	data:			numpy array or iterable yielding the 2D pages (y,x) in order. Iterables need shape and dtype.
+					Missing pages at the end of an iterable are filled with zeros.
+	pixelSize:		xy pixel size in microns, stored as PixelSize (resolution for ImageJ, PhysicalSizeX/Y for OME)
+	focusStepSize:	z step size in microns, stored as FocusStepSize (spacing for ImageJ, PhysicalSizeZ for OME)
+	compression:	None, 'zlib' or 'zstd' (lossless, zstd needs imagecodecs), with horizontal predictor
+	imagej:			ImageJ hyperstack
+	ome:			OME-TIFF
+	bigtiff:		None to switch to BigTIFF for files larger than 4 GB (not for ImageJ files)
+	"""
+	progress = Progress.wrap(progress, cancel)
+	if isinstance(data, np.ndarray):
+		shape, dtype = data.shape, data.dtype
+	dtype = np.dtype(dtype)
+	## Stacks are written page by page, 2D and multichannel (y,x,c) images are a single page
+	if len(shape) > 2 and shape[-1] > 4:
+		nrPages = int(np.prod(shape[:-2]))
+		pages = data.reshape((nrPages,)+tuple(shape[-2:])) if isinstance(data, np.ndarray) else data
+	else:
+		nrPages = 1
+		pages = [np.asarray(data)]
+	if compression == 'zstd' and imagecodecs is None:
+		print(clrmsg.WARNING, "zstd compression needs imagecodecs (pip install imagecodecs), using zlib instead.")
+		compression = 'zlib'
+	## Without imagecodecs tifffile only has the integer predictor
+	predictor = True if compression and (dtype.kind in 'iu' or imagecodecs is not None) else None
+	if bigtiff is None:
+		bigtiff = not imagej and int(np.prod(shape))*dtype.itemsize > 2**32 - 2**25
+
+	kwargs = {}
+	metadata = {}
+	if imagej:
+		metadata['unit'] = 'micron'
+		if focusStepSize: metadata['spacing'] = focusStepSize
+		if pixelSize: kwargs['resolution'] = (1./pixelSize, 1./pixelSize)
+	elif ome:
+		if len(shape) == 3 and nrPages > 1: metadata['axes'] = 'ZYX'
+		if pixelSize: metadata['PhysicalSizeX'] = metadata['PhysicalSizeY'] = pixelSize
+		if focusStepSize: metadata['PhysicalSizeZ'] = focusStepSize
+	else:
+		if pixelSize: metadata['PixelSize'] = str(pixelSize)
+		if focusStepSize: metadata['FocusStepSize'] = str(focusStepSize)
+
+	def iterPages():
+		i = 0
+		for page in pages:
+			if i == nrPages:
+				break
+			yield np.ascontiguousarray(page, dtype=dtype)
+			i += 1
+			progress(i*100/nrPages)
+		for i in range(i, nrPages):
+			yield np.zeros(shape[-2:], dtype=dtype)
+
+	if debug is True: print(clrmsg.DEBUG, "Writing {0} | shape: {1} | compression: {2}".format(path, shape, compression))
+	with tf.TiffWriter(path, bigtiff=bigtiff, imagej=imagej, ome=ome and not imagej) as tif:
+		tif.write(
+			iterPages(), shape=shape, dtype=dtype, compression=compression, predictor=predictor,
+			metadata=metadata, **kwargs)
+	progress(100)
+
+
 def pxSize(img_path,z=False):
 	"""Extract pixel size from meta/exif data. Tailored for image headers from FEI dual beam electron microscopes
-	and CorrSight light microscope"""
-	with tf.TiffFile(img_path) as tif:
-		for page in tif:
-			for tag in list(page.tags.values()):
-				if isinstance(tag.value, str):
-					for keyword in ['PhysicalSizeX','PixelWidth','PixelSize'] if not z else ['PhysicalSizeZ','FocusStepSize']:
-						tagposs = [m.start() for m in re.finditer(keyword, tag.value)]
-						for tagpos in tagposs:
-							if keyword == 'PhysicalSizeX' or keyword == 'PhysicalSizeZ':
-								for piece in tag.value[tagpos:tagpos+30].split('"'):
-									try:
-										pixelsize = float(piece)
-										return pixelsize
-									except:
-										pass
-							elif keyword == 'PixelWidth':
-								for piece in tag.value[tagpos:tagpos+30].split('='):
-									try:
-										try:
-											pixelsize = float(piece.strip().split('\r\n')[0])
-										except:
-											pixelsize = float(piece.strip().split(r'\r\n')[0])
-										return pixelsize
-									except:
-										pass
-							elif keyword == 'PixelSize' or 'FocusStepSize':
-								for piece in tag.value[tagpos:tagpos+30].split('"'):
-									try:
-										pixelsize = float(piece)
-										return pixelsize
-									except:
-										pass
-
-
-def interpol(img, ss_in, ss_out, interpolationmethod, showgraph):
-	"""Main function for interpolating image stacks via polyfit"""
+	and CorrSight light microscope (see tiffMetadata)"""
+	meta = tiffMetadata.read(img_path)
+	return meta.focusStepSize if z else meta.pixelSize
+
+
+def interpol(img, ss_in, ss_out, interpolationmethod, showgraph, progress=None, cancel=None, lazy=False):
+	"""Main function for interpolating image stacks via polyfit
+
+	If lazy is True, the linear interpolation returns a generator of the interpolated slices instead of the
+	interpolated stack (shape see interpolShape), e.g. to write them with writeStack while they are calculated.
+	"""
+	progress = Progress.wrap(progress, cancel)
 	## Depending on tiff format the file can have different shapes; e.g. z,y,x or c,z,y,x
 	if len(img.shape) == 4 and img.shape[0] == 1:
 		img = np.squeeze(img, axis=0)
@@ -323,12 +459,10 @@ def interpol(img, ss_in, ss_out, interpolationmethod, showgraph):
 	if len(img.shape) == 3:
 		## Number of slices in original stack
 		sl_in = img.shape[0]
-		## Number of slices in interpolated stack
-		# Discarding last data point. e.g. 56 in i.e.
-		# 55 steps * (309 nm original spacing / 161.25 nm new spacing) = 105.39 -> int() = 105 + 1 = 106
-		sl_out = int((sl_in-1)*(ss_in/ss_out)) + 1
 		## Interpolate image stack shape
-		img_int_shape = (sl_out, img.shape[1], img.shape[2])
+		img_int_shape = interpolShape(img.shape, ss_in, ss_out)
+		## Number of slices in interpolated stack
+		sl_out = img_int_shape[0]
 	else:
 		return "ERROR: I only know tiff stack image formats in z,y,x or c,z,y,x with one channel"
 
@@ -341,14 +475,27 @@ def interpol(img, ss_in, ss_out, interpolationmethod, showgraph):
 		return None
 	elif interpolationmethod == 'linear':
 		if debug is True: print(clrmsg.DEBUG, "Nr. of slices (in/out): ", sl_in, sl_out)
-		return linear(img, img_int_shape, ss_in, ss_out, sl_in, sl_out)
+		if lazy is True:
+			## Progress is reported by the consumer
+			return linearSlices(img, ss_in, ss_out, sl_in)
+		return linear(img, img_int_shape, ss_in, ss_out, sl_in, sl_out, progress=progress)
 	elif interpolationmethod == 'spline':
 		if debug is True: print(clrmsg.DEBUG, "Nr. of slices (in/out): ", sl_in, sl_out)
-		return spline(img, img_int_shape, ss_in, ss_out, sl_in, sl_out)
+		return spline(img, img_int_shape, ss_in, ss_out, sl_in, sl_out, progress=progress)
 	else:
 		return "Please specify the interpolation method ('linear', 'spline', 'none')."
 
 
+def interpolShape(shape, ss_in, ss_out):
+	"""Shape of the interpolated stack (z,y,x) for an input stack of shape z,y,x or 1,z,y,x"""
+	if len(shape) == 4 and shape[0] == 1:
+		shape = shape[1:]
+	## Discarding last data point. e.g. 56 in i.e.
+	## 55 steps * (309 nm original spacing / 161.25 nm new spacing) = 105.39 -> int() = 105 + 1 = 106
+	sl_out = int((shape[0]-1)*(ss_in/ss_out)) + 1
+	return (sl_out, shape[1], shape[2])
+
+
 def showgraph_(img, ss_in, ss_out, sl_in, sl_out, block=True):
 	"""Show graph for polyfit function to visualize fitting process"""
 	## Known x values in interpolated stack size.
@@ -377,7 +524,7 @@ def showgraph_(img, ss_in, ss_out, sl_in, sl_out, block=True):
 	plt.show(block)
 
 
-def spline(img, img_int_shape, ss_in, ss_out, sl_in, sl_out):
+def spline(img, img_int_shape, ss_in, ss_out, sl_in, sl_out, progress=None):
 	"""
 	Spline interpolation
 
@@ -402,6 +549,7 @@ def spline(img, img_int_shape, ss_in, ss_out, sl_in, sl_out):
 
 	r_sl_out = list(range(sl_out))
 
+	progress = Progress.wrap(progress)
 	ping = time.time()
 	for px in range(img.shape[-1]):
 		for py in range(img.shape[-2]):
@@ -409,35 +557,41 @@ def spline(img, img_int_shape, ss_in, ss_out, sl_in, sl_out):
 			np.put(img_int[:,py,px], r_sl_out, spl(zxnew))
 		sys.stdout.write("\r%d%%" % int(px*100/img.shape[-1]))
 		sys.stdout.flush()
+		progress(px*100/img.shape[-1])
 	pong = time.time()
 	if debug is True: print(clrmsg.DEBUG, "This interpolation took {0} seconds".format(pong - ping))
 	return img_int
 
 
-def linear(img, img_int_shape, ss_in, ss_out, sl_in, sl_out):
+def linear(img, img_int_shape, ss_in, ss_out, sl_in, sl_out, progress=None):
 	"""Linear interpolation"""
-	##  Determine interpolated slice positions
-	sl_int = np.arange(0,sl_in-1,ss_out/ss_in)  # sl_in-1 because last slice is discarded (no extrapolation)
-
 	## Create new numpy array for the interpolated image stack
 	img_int = np.zeros(img_int_shape,img.dtype)
 	if debug is True: print(clrmsg.DEBUG, "Interpolated stack shape: ", img_int.shape)
 
-	## Calculate distances from every interpolated image to its next original image
-	sl_counter = 0
 	ping = time.time()
-	for i in sl_int:
-		int_i = int(i)
-		lower = i-int_i
-		upper = 1-(lower)
-		img_int[sl_counter,:,:] = img[int_i,:,:]*upper + img[int_i+1,:,:]*lower
-		sl_counter += 1
+	for sl_counter, img_sl in enumerate(linearSlices(img, ss_in, ss_out, sl_in, progress=progress)):
+		img_int[sl_counter,:,:] = img_sl
 	pong = time.time()
 	if debug is True: print(clrmsg.DEBUG, "This interpolation took {0} seconds".format(pong - ping))
 	return img_int
 
 
-def norm_img(img,copy=False,qtprocessbar=None):
+def linearSlices(img, ss_in, ss_out, sl_in, progress=None):
+	"""Generator of the linearly interpolated slices (see linear)"""
+	progress = Progress.wrap(progress)
+	##  Determine interpolated slice positions
+	sl_int = np.arange(0,sl_in-1,ss_out/ss_in)  # sl_in-1 because last slice is discarded (no extrapolation)
+	## Calculate distances from every interpolated image to its next original image
+	for sl_counter, i in enumerate(sl_int):
+		int_i = int(i)
+		lower = i-int_i
+		upper = 1-(lower)
+		yield (img[int_i,:,:]*upper + img[int_i+1,:,:]*lower).astype(img.dtype)
+		progress((sl_counter+1)*100/len(sl_int))
+
+
+def norm_img(img,copy=False,progress=None,cancel=None,chunk=16):
 	"""Normalizing image
 
 	Supported data types are (u)int8, (u)int16, float32 and float64.
@@ -448,7 +602,11 @@ def norm_img(img,copy=False,qtprocessbar=None):
 	[z,y,x]
 	[z,c,y,x]
 	[c,z,y,x]
+
+	Each 2D plane is scaled to the data type range. Stacks are processed in chunks of slices,
+	progress is reported and cancel is checked in between chunks.
 	"""
+	progress = Progress.wrap(progress, cancel)
 	if copy is True:
 		img = np.copy(img)
 	else:
@@ -469,52 +627,44 @@ def norm_img(img,copy=False,qtprocessbar=None):
 		## tiffimage reads z,y,x for stacks but y,x,c if it is multichannel image (or z,c,y,x if it is a multicolor image stack)
 		if img.shape[-1] > 4:
 			if debug is True: print(clrmsg.DEBUG, "Image stack")
-			if qtprocessbar:
-				maximum = int(int(img.shape[0])*1.25)
-				qtprocessbar.setMaximum(maximum)
-				qtprocessbar.setValue(maximum*0.1)
-				QtWidgets.QApplication.processEvents()
-			for i in range(int(img.shape[0])):
-				img[i,:,:] = np.multiply(img[i,:,:], typesize/img[i,:,:].max(), casting='unsafe')
-				if qtprocessbar:
-					qtprocessbar.setValue(qtprocessbar.value()+1)
-					QtWidgets.QApplication.processEvents()
+			normPlanes(img, typesize, progress, chunk)
 		else:
 			if debug is True: print(clrmsg.DEBUG, "Multichannel image")
-			if qtprocessbar:
-				maximum = int(int(img.shape[2])*1.25)
-				qtprocessbar.setMaximum(maximum)
-				qtprocessbar.setValue(maximum*0.1)
-				QtWidgets.QApplication.processEvents()
-			for i in range(int(img.shape[2])):
-				img[:,:,i] = np.multiply(img[:,:,i], typesize/img[:,:,i].max(), casting='unsafe')
-				if qtprocessbar:
-					qtprocessbar.setValue(qtprocessbar.value()+1)
-					QtWidgets.QApplication.processEvents()
+			img[:] = np.multiply(img, typesize/img.max(axis=(0,1)), casting='unsafe')
 	## 3D and multichannel image
 	elif len(img.shape) == 4:
 		if debug is True: print(clrmsg.DEBUG, "3D and multichannel image")
-		if qtprocessbar:
-			maximum = int((int(img.shape[0])+int(img.shape[1]))*1.25)
-			qtprocessbar.setMaximum(maximum)
-			qtprocessbar.setValue(maximum*0.1)
-			QtWidgets.QApplication.processEvents()
-		for i in range(int(img.shape[0])):
-			for ii in range(int(img.shape[1])):
-				img[i,ii,:,:] = np.multiply(img[i,ii,:,:], typesize/img[i,ii,:,:].max(), casting='unsafe')
-				if qtprocessbar:
-					qtprocessbar.setValue(qtprocessbar.value()+1)
-					QtWidgets.QApplication.processEvents()
+		normPlanes(img, typesize, progress, chunk)
+	progress(100)
 	return img.astype(dtype)
 
 
-def normalize(path,qtprocessbar=None, flip=False, customSaveDir=None):
+def normPlanes(img, typesize, progress, chunk=16):
+	"""Scale every 2D plane (last two axes) of img in place to typesize, chunk slices along the first axis at a time"""
+	for start in range(0, img.shape[0], chunk):
+		block = img[start:start+chunk]
+		block[:] = np.multiply(block, typesize/block.max(axis=(-2,-1), keepdims=True), casting='unsafe')
+		progress((start+block.shape[0])*100/img.shape[0])
+
+
+def maxProjection(img, axis, progress, chunk=16):
+	"""Maximum intensity projection along axis, chunk slices at a time so progress is reported and cancel is checked"""
+	img = np.moveaxis(img, axis, 0)
+	img_mip = np.amax(img[:chunk], axis=0)
+	progress(min(chunk, img.shape[0])*100/img.shape[0])
+	for start in range(chunk, img.shape[0], chunk):
+		np.maximum(img_mip, np.amax(img[start:start+chunk], axis=0), out=img_mip)
+		progress(min(start+chunk, img.shape[0])*100/img.shape[0])
+	return img_mip
+
+
+def normalize(path,progress=None, flip=False, customSaveDir=None, cancel=None, compression=None, ome=False, bigtiff=None):
+	"""Normalize image (stack) file, see norm_img. compression, ome and bigtiff set the output format, see writeStack."""
+	progress = Progress.wrap(progress, cancel)
 	if debug is True: print(clrmsg.DEBUG, "Normalizing:", path)
 	img = tf.imread(path)
-	if qtprocessbar:
-		qtprocessbar.setValue(10)
-		QtWidgets.QApplication.processEvents()
-	img = norm_img(img,qtprocessbar=qtprocessbar)
+	progress(10)
+	img = norm_img(img,progress=progress.sub(10,90))
 	fpath,fname = os.path.split(path)
 	fname_norm = os.path.join(fpath,"flip_norm_"+fname) if flip else os.path.join(fpath,"norm_"+fname)
 	if customSaveDir:
@@ -525,20 +675,21 @@ def normalize(path,qtprocessbar=None, flip=False, customSaveDir=None):
 	if flip:
 		if debug is True: print(clrmsg.DEBUG, "Flipping...")
 		img = np.flip(img, axis=-1)
-	if len(img.shape) == 4:
-		tf.imsave(fname_norm, img, imagej=True)
-	else:
-		tf.imsave(fname_norm, img)
+	meta = readMetadata(path)
+	writeStack(
+		fname_norm, img, pixelSize=meta.pixelSize, focusStepSize=meta.focusStepSize, compression=compression,
+		imagej=len(img.shape) == 4 and not ome, ome=ome, bigtiff=bigtiff, progress=progress.sub(90,100))
 	if debug is True: print(clrmsg.DEBUG, "		...done")
 	if debug is True: print(clrmsg.DEBUG, "Finished normalizing.")
+	progress(100)
 
 
-def mip(path,qtprocessbar=None, customSaveDir=None, flip=False, normalize=False):
+def mip(path,progress=None, customSaveDir=None, flip=False, normalize=False, cancel=None, compression=None, ome=False, bigtiff=None):
+	"""Maximum intensity projection of an image stack file. compression, ome and bigtiff set the output format, see writeStack."""
+	progress = Progress.wrap(progress, cancel)
 	if debug is True: print(clrmsg.DEBUG, "Creating normalized Maximum Intensity Projection (MIP):", path)
 	img = tf.imread(path)
-	if qtprocessbar:
-		qtprocessbar.setValue(10)
-		QtWidgets.QApplication.processEvents()
+	progress(10)
 	fpath,fname = os.path.split(path)
 	fname_mip = "flip_MIP_"+fname if flip else "MIP_"+fname
 	fname_mip_norm = "flip_MIP_norm_"+fname if flip else "MIP_norm_"+fname
@@ -549,7 +700,7 @@ def mip(path,qtprocessbar=None, customSaveDir=None, flip=False, normalize=False)
 		fname_mip = os.path.join(fpath, fname_mip)
 		fname_mip_norm = os.path.join(fpath, fname_mip_norm)
 	if len(img.shape) == 4:
-		img = np.amax(img, axis=1)
+		img = maxProjection(img, 1, progress.sub(10,80))
 		if flip:
 			if debug is True: print(clrmsg.DEBUG, "Flipping...")
 			img = np.flip(img, axis=-1)
@@ -557,10 +708,12 @@ def mip(path,qtprocessbar=None, customSaveDir=None, flip=False, normalize=False)
 			if debug is True: print(clrmsg.DEBUG, "Normalizing...")
 			img = norm_img(img)
 		if debug is True: print(clrmsg.DEBUG, "Saving...")
-		tf.imsave(fname_mip_norm if normalize else fname_mip, img, imagej=True)
+		writeStack(
+			fname_mip_norm if normalize else fname_mip, img, pixelSize=readMetadata(path).pixelSize,
+			compression=compression, imagej=not ome, ome=ome, bigtiff=bigtiff, progress=progress.sub(80,100))
 		if debug is True: print(clrmsg.DEBUG, "		...done")
 	elif len(img.shape) == 3:
-		img = np.amax(img, axis=0)
+		img = maxProjection(img, 0, progress.sub(10,80))
 		if flip:
 			if debug is True: print(clrmsg.DEBUG, "Flipping...")
 			img = np.flip(img, axis=-1)
@@ -568,9 +721,12 @@ def mip(path,qtprocessbar=None, customSaveDir=None, flip=False, normalize=False)
 			if debug is True: print(clrmsg.DEBUG, "Normalizing...")
 			img = norm_img(img)
 		if debug is True: print(clrmsg.DEBUG, "Saving...")
-		tf.imsave(fname_mip_norm if normalize else fname_mip, img)
+		writeStack(
+			fname_mip_norm if normalize else fname_mip, img, pixelSize=readMetadata(path).pixelSize,
+			compression=compression, ome=ome, bigtiff=bigtiff, progress=progress.sub(80,100))
 		if debug is True: print(clrmsg.DEBUG, "		...done")
 	else: print(clrmsg.ERROR, "I'm sorry, I don't know this image shape: {0}".format(img.shape))
+	progress(100)
 
 
 if __name__ == '__main__':
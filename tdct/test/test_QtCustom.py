@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+
+# @Title			: test_QtCustom
+# @Project			: 3DCTv2
+# @Description		: pytest test
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: pytest, TDCT_BENCHMARK=1 pytest -s (prints marker click latency benchmark)
+# @Notes			:
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+import os
+import time
+import pytest
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+try:
+    from tdct import QtCustom, correlation
+    QtCustom_error = ""
+    QtCustom.debug = False
+except Exception as e:
+    QtCustom_error = e
+
+
+class MainWidgetDummy():
+    """Minimal stand-in for the GUI elements of TDCT_correlation.MainWidget accessed by the scene"""
+    def __init__(self):
+        self.checkBox_MIP = QtWidgets.QCheckBox()
+        self.checkBox_MIP.setChecked(True)
+        self.spinBox_slice = QtWidgets.QSpinBox()
+
+    def colorModels(self):
+        pass
+
+
+def makeScene():
+    view = QtWidgets.QGraphicsView()
+    model = QtCustom.QStandardItemModelCustom()
+    scene = QtCustom.QGraphicsSceneCustom(view,mainWidget=MainWidgetDummy(),side='left',model=model)
+    scene.imagetype = 21
+    scene._z = False
+    scene.addPixmap(QtGui.QPixmap()).setZValue(-10)
+    return view, scene, model
+
+
+class MouseEventDummy():
+    """QGraphicsSceneMouseEvent cannot be instantiated from Python"""
+    def __init__(self,button,x,y):
+        self._button = button
+        self._scenePos = QtCore.QPointF(x,y)
+
+    def button(self):
+        return self._button
+
+    def scenePos(self):
+        return self._scenePos
+
+
+def mouseEvent(scene,button,x,y):
+    scene.mousePressEvent(MouseEventDummy(button,x,y))
+
+
+def modelCoordinates(model):
+    return [(float(model.data(model.index(row, 0))), float(model.data(model.index(row, 1)))) for row in range(model.rowCount())]
+
+
+@pytest.mark.skipif(QtCustom_error != "", reason="QtCustom import failed: {0}".format(QtCustom_error))
+def test_markerRegistry():
+    view, scene, model = makeScene()
+    for i in range(5):
+        mouseEvent(scene,QtCore.Qt.RightButton,10*i,20*i)
+    assert modelCoordinates(model) == [(10.*i, 20.*i) for i in range(5)]
+    assert [scene.markerDecor[item][0].text() for item in scene.markers] == ['1','2','3','4','5']
+    ## Delete marker 2 (middle click): rows and numbers of the following markers shift
+    mouseEvent(scene,QtCore.Qt.MiddleButton,10,20)
+    assert modelCoordinates(model) == [(0., 0.), (20., 40.), (30., 60.), (40., 80.)]
+    assert [scene.markerDecor[item][0].text() for item in scene.markers] == ['1','2','3','4']
+    assert [scene.markers.row(item) for item in scene.markers] == [0,1,2,3]
+    ## Move marker and write back its row only
+    scene.markers[1].setPos(5,6)
+    scene.markerToModel(scene.markers[1])
+    assert modelCoordinates(model)[1] == (5., 6.)
+    ## Editing the model moves the marker
+    model.item(2, 0).setText('7')
+    scene.modelToMarker(2)
+    assert scene.markers[2].x() == 7.
+    ## Number and crosshair are reused when relayouting
+    decor = dict(scene.markerDecor)
+    scene.markerSize = 20
+    scene.enumeratePoints()
+    assert scene.markerDecor == decor
+    assert scene.markers[0].rect().width() == 40
+
+
+@pytest.mark.skipif(QtCustom_error != "", reason="QtCustom import failed: {0}".format(QtCustom_error))
+def test_markerStore():
+    view, scene, model = makeScene()
+    for x, y in [(0, 0), (30, 0), (200, 200), (205, 200), (-70, -70)]:
+        scene.markerToModel(scene.addCircle(x,y))
+    markers = scene.markers
+    assert markers.itemsAt(3, 0, 10) == [markers[0]]
+    assert markers.itemsAt(204, 200, 10) == [markers[3], markers[2]]
+    assert markers.itemsAt(100, 100, 10) == []
+    assert markers.itemsAt(-65, -65, 10) == [markers[4]]
+    assert markers.itemsInRect(QtCore.QRectF(-100, -100, 150, 150)) == [markers[0], markers[1], markers[4]]
+    ## Moving a marker (e.g. dragging) updates the spatial index
+    markers[0].setPos(500, 500)
+    assert markers.itemsAt(0, 0, 10) == []
+    assert markers.itemsAt(500, 505, 10) == [markers[0]]
+    ## Rubber band selection only selects markers
+    scene.selectMarkers(QtCore.QRectF(190, 190, 5, 5))
+    assert set(scene.selectedItems()) == set([markers[2], markers[3]])
+    ## Removing markers keeps row lookup and index consistent
+    item = markers[2]
+    scene.deleteMarkers([item])
+    assert item not in markers
+    assert markers.itemsAt(204, 200, 10) == [markers[2]]
+    assert [markers.row(item) for item in markers] == [0,1,2,3]
+    assert model.rowCount() == 4
+    ## Arrows are tracked, other path items are left untouched
+    other = scene.addPath(QtGui.QPainterPath())
+    scene.addArrow((0,0),(10,10))
+    scene.deleteArrows()
+    assert scene.arrows == []
+    assert other.scene() is scene
+
+
+@pytest.mark.skipif(QtCustom_error != "", reason="QtCustom import failed: {0}".format(QtCustom_error))
+@pytest.mark.skipif(not os.environ.get('TDCT_BENCHMARK'), reason="benchmark, set TDCT_BENCHMARK=1 to run")
+def test_markerClickLatency():
+    """Benchmark: latency of adding/deleting a marker by mouse click vs. number of markers already present"""
+    latency = {}
+    for nrMarkers in [10, 50, 100, 200]:
+        view, scene, model = makeScene()
+        for i in range(nrMarkers):
+            scene.markerToModel(scene.addCircle(i,i))
+        start = time.perf_counter()
+        for i in range(20):
+            mouseEvent(scene,QtCore.Qt.RightButton,-100,-100-i)
+            mouseEvent(scene,QtCore.Qt.MiddleButton,-100,-100-i)
+        latency[nrMarkers] = (time.perf_counter() - start) / 40
+        assert model.rowCount() == nrMarkers
+        print("{0:4} markers: {1:.3f} ms per click".format(nrMarkers, 1000 * latency[nrMarkers]))
+
+
+@pytest.mark.skipif(QtCustom_error != "", reason="QtCustom import failed: {0}".format(QtCustom_error))
+def test_addCircles():
+    view, scene, model = makeScene()
+    scene._z = True
+    scene.markerToModel(scene.addCircle(1,2))
+    items = scene.addCircles([[3,4,5],[6,7,8]])
+    scene.markersToModel(items)
+    assert list(scene.markers) == [scene.markers[0]] + items
+    assert modelCoordinates(model) == [(1,2),(3,4),(6,7)]
+    assert [scene.zValuesDict[item][0] for item in items] == [5,8]
+    assert scene.itemIndexMethod() == QtWidgets.QGraphicsScene.BspTreeIndex
+    assert scene.items(QtCore.QRectF(5,6,2,2)) != []
+
+
+@pytest.mark.skipif(QtCustom_error != "", reason="QtCustom import failed: {0}".format(QtCustom_error))
+def test_uncertaintyEstimator():
+    rng = np.random.RandomState(1)
+    markers_3d = rng.rand(8,3)*[400,400,60]
+    markers_2d = 1.4*markers_3d[:,:2] + [100,80] + rng.randn(8,2)*0.3
+    spots_3d = np.array([[200.,200,30]])
+    transf = correlation.main(markers_3d, markers_2d, spots_3d, [0,0,0], '')[0]
+    ## Resampling fits run in spawned processes started from a worker thread
+    results = []
+    estimator = QtCustom.UncertaintyEstimator(markers_3d, markers_2d, spots_3d, transf, method='jackknife')
+    estimator.signals.finished.connect(results.append)
+    estimator.signals.failed.connect(results.append)
+    pool = QtCore.QThreadPool()
+    pool.start(estimator)
+    assert pool.waitForDone(120000)
+    QtCore.QCoreApplication.processEvents()
+    assert len(results) == 1
+    desired = correlation.poi_uncertainty(markers_3d, markers_2d, spots_3d, transf, method='jackknife', workers=1)
+    np.testing.assert_allclose(results[0], desired)
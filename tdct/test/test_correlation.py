@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+
+# @Title			: test_correlation
+# @Project			: 3DCTv2
+# @Description		: pytest test
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: pytest
+# @Notes			:
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+import json
+import pytest
+import numpy as np
+from pyto.rigid_3d import Rigid3D
+from pyto import transform_record
+from tdct import correlation
+
+
+@pytest.fixture
+def markers():
+    """20 markers (n x 3 and n x 2) related by a known rotation, scale and translation, marker 7 misplaced"""
+    rng = np.random.RandomState(1)
+    markers_3d = rng.rand(20,3)*[400,400,60]
+    q = Rigid3D.make_r_euler(np.radians([30,50,-20]), mode='x')
+    markers_2d = (1.4*np.dot(q, markers_3d.T) + np.array([[100],[80],[0]])).T[:,:2] + rng.randn(20,2)*0.3
+    markers_2d[7] += [15,-10]
+    return markers_3d, markers_2d
+
+
+def test_leave_one_out(markers, capsys):
+    markers_3d, markers_2d = markers
+    transf = correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '')[0]
+    capsys.readouterr()
+    residuals = correlation.leave_one_out(markers_3d, markers_2d, transf)
+    assert residuals.shape == (2,20)
+    ## Sub-fits do not print optimization reports
+    assert 'Optimization terminated' not in capsys.readouterr().out
+    ## The misplaced marker stands out clearly when it is not part of the fit
+    distances = np.hypot(*residuals)
+    assert distances.argmax() == 7
+    assert distances[7] > 3*np.sort(distances)[-2]
+    ## Same as a full multi-start fit without the marker
+    keep = np.arange(20) != 7
+    full = Rigid3D.find_32(
+        x=markers_3d[keep].T, y=markers_2d[keep].T, randome=True, einit='gl2', randoms=True, sinit='gl2')
+    assert np.allclose(
+        full.transform(x=markers_3d[[7]].T)[:2,0] - markers_2d[7], residuals[:,7], atol=0.05)
+    ## Too few markers for sub-fits
+    assert np.isnan(correlation.leave_one_out(markers_3d[:3], markers_2d[:3], transf)).all()
+
+
+def test_robust(markers, tmpdir):
+    markers_3d, markers_2d = markers
+    markers_2d[12] += [-6,30]
+    fn = str(tmpdir.join('results.txt'))
+    transf, transf_3d, spots_2d, delta2D = correlation.main(
+        markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], fn, robust='ransac')[:4]
+    assert np.flatnonzero(~transf.inliers).tolist() == [7,12]
+    ## Inliers fit within the noise, outliers keep their full deviation
+    assert np.abs(delta2D[:, transf.inliers]).max() < 1.5
+    assert np.hypot(*delta2D[:, 7]) > 15
+    with open(fn) as res_file:
+        assert "18 of 20 markers used, outliers: [7, 12]" in res_file.read()
+    ## The least squares correlation of all markers is pulled off by the outliers
+    plain = correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '')[3]
+    assert np.abs(plain[:, transf.inliers]).max() > 2
+    with pytest.raises(ValueError):
+        correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '', robust='median')
+
+
+def test_warm_start(markers):
+    markers_3d, markers_2d = markers
+    warm_start = correlation.WarmStart()
+    first = correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '', warm_start=warm_start)[0]
+    assert (warm_start.n_local, warm_start.n_multi) == (0, 1)
+    ## Moving the misplaced marker closer to its position improves the fit: single local optimization
+    markers_2d[7] -= [10,-7]
+    transf = correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '', warm_start=warm_start)[0]
+    assert (warm_start.n_local, warm_start.n_multi) == (1, 1)
+    assert transf.optimizeResult.fun < first.optimizeResult.fun
+    full = correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '')[0]
+    assert np.allclose(transf.gl, full.gl, atol=1e-4)
+    assert np.allclose(transf.d, full.d, atol=0.05)
+    ## A worse fit falls back to the multi-start optimization, so does a changed number of markers
+    markers_2d[3] += [40,40]
+    correlation.main(markers_3d, markers_2d, np.zeros((0,3)), [0,0,0], '', warm_start=warm_start)
+    assert (warm_start.n_local, warm_start.n_multi) == (1, 2)
+    correlation.main(markers_3d[:-1], markers_2d[:-1], np.zeros((0,3)), [0,0,0], '', warm_start=warm_start)
+    assert (warm_start.n_local, warm_start.n_multi) == (1, 3)
+
+
+def test_poi_uncertainty(markers, tmpdir):
+    markers_3d, markers_2d = markers
+    markers_2d[7] -= [15,-10]
+    spots_3d = np.array([[200.,200,30],[1000,-500,30]])
+    fn = str(tmpdir.join('results.txt'))
+    results = correlation.main(
+        markers_3d, markers_2d, spots_3d, [0,0,0], fn, imageProps=[[884,1024],0.01,(60,400,400)],
+        uncertainty='bootstrap')
+    cov = results[6]
+    assert cov.shape == (2,2,2)
+    ## Spots far from the markers are less certain, the marker noise is 0.3 px
+    ellipses = correlation.confidence_ellipses(cov)
+    assert (ellipses[:,0] >= ellipses[:,1]).all()
+    assert 0.05 < ellipses[0,0] < 1 < ellipses[1,0]
+    with open(fn) as res_file:
+        assert "# Uncertainty of correlated spots" in res_file.read()
+    ## The samples are drawn before fitting, the result does not depend on the number of processes
+    transf = results[0]
+    assert np.allclose(
+        correlation.poi_uncertainty(markers_3d, markers_2d, spots_3d, transf, n_samples=20, workers=1, seed=0),
+        correlation.poi_uncertainty(markers_3d, markers_2d, spots_3d, transf, n_samples=20, workers=2, seed=0))
+    ## Jackknife gives ellipses of about the same size
+    jackknife = correlation.poi_uncertainty(markers_3d, markers_2d, spots_3d, transf, method='jackknife', workers=1)
+    assert np.allclose(correlation.confidence_ellipses(jackknife)[:,:2], ellipses[:,:2], rtol=0.5)
+    assert np.isnan(correlation.poi_uncertainty(markers_3d[:3], markers_2d[:3], spots_3d, transf)).all()
+
+
+def test_confidence_ellipses():
+    cov = np.array([[[4.,0],[0,1]], [[1,0],[0,9]], [[np.nan]*2]*2])
+    ellipses = correlation.confidence_ellipses(cov, confidence=1 - np.exp(-0.5))
+    assert np.allclose(ellipses[:2], [[2,1,0],[3,1,90]])
+    assert np.isnan(ellipses[2]).all()
+
+
+def test_write_results_sidecar(markers, tmpdir):
+    markers_3d, markers_2d = markers
+    spots_3d = np.array([[200.,200,30],[1000,-500,30]])
+    fn = str(tmpdir.join('results.txt'))
+    results = correlation.main(
+        markers_3d, markers_2d, spots_3d, [0,0,0], fn, imageProps=[[884,1024],0.01,(60,400,400)], sidecar='json')
+    with open(fn) as res_file:
+        report = res_file.read()
+    with open(str(tmpdir.join('results.json'))) as sidecar_file:
+        sidecar = json.load(sidecar_file)
+    ## Same data as the text report, in full precision
+    assert sidecar['transformation']['scale'] == results[0].s_scalar
+    assert "#   - scale = %6.3f" % sidecar['transformation']['scale'] in report
+    markers_table = np.array(sidecar['tables']['markers']['rows'])
+    assert markers_table.shape == (20,10)
+    assert np.array_equal(markers_table[:,:3], markers_3d)
+    assert np.array_equal(markers_table[:,8:], results[3].T)
+    assert "\t%7.2f\t%7.2f\t%7.2f\t\t" % tuple(markers_table[7,:3]) in report
+    assert sidecar['tables']['distances']['columns'] == ['dx_px', 'dy_px', 'dx_um', 'dy_um']
+    assert 'uncertainty' not in sidecar['tables']
+    records = transform_record.from_json(json.dumps([sidecar['transformation']['record']]))
+    transf = transform_record.make_transforms(records)[0]
+    assert np.array_equal(transf.transform(x=spots_3d.T), results[2])
+    ## One csv file per table
+    results = correlation.main(markers_3d, markers_2d, spots_3d, [0,0,0], fn, sidecar='csv')
+    spots_table = np.loadtxt(str(tmpdir.join('results_spots.csv')), delimiter=',', skiprows=1)
+    assert np.array_equal(spots_table[:,3:], results[2].T)
+    assert tmpdir.join('results_transformation.csv').check()
+    with pytest.raises(ValueError):
+        correlation.main(markers_3d, markers_2d, spots_3d, [0,0,0], fn, sidecar='xml')
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+
+# @Title			: test_csvHandler
+# @Project			: 3DCTv2
+# @Description		: pytest test
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: pytest
+# @Notes			:
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+import pytest
+import numpy as np
+from PyQt5 import QtGui
+from tdct import csvHandler
+
+
+def writeFile(tmpdir, name, text):
+    fn = str(tmpdir.join(name))
+    with open(fn, 'w') as f:
+        f.write(text)
+    return fn
+
+
+def test_csv2array(tmpdir):
+    ## Tab separated with z, sniffed comma separated without z
+    fn = writeFile(tmpdir, 'tab.txt', "1.5\t2\t3\n4\t5.25\t6\n")
+    assert np.array_equal(csvHandler.csv2array(fn), [[1.5, 2, 3], [4, 5.25, 6]])
+    fn = writeFile(tmpdir, 'comma.csv', "1,2\n3,4\n")
+    assert np.array_equal(csvHandler.csv2array(fn, delimiter="\t", sniff=True), [[1, 2, 0], [3, 4, 0]])
+    ## Nothing to sniff, the given delimiter is used
+    fn = writeFile(tmpdir, 'column.txt', "1\n2\n")
+    assert np.array_equal(csvHandler.csv2array(fn, sniff=True), [[1, 0, 0], [2, 0, 0]])
+    ## Single row, rows with and without z, extra columns
+    fn = writeFile(tmpdir, 'one.txt', "1\t2\t3\t9\n")
+    assert np.array_equal(csvHandler.csv2array(fn), [[1, 2, 3]])
+    fn = writeFile(tmpdir, 'ragged.txt', "1\t2\n3\t4\t5\n\n6\t7\t8\t9\n")
+    assert np.array_equal(csvHandler.csv2array(fn), [[1, 2, 0], [3, 4, 5], [6, 7, 8]])
+    ## Empty file, non numeric fields
+    fn = writeFile(tmpdir, 'empty.txt', "")
+    assert csvHandler.csv2array(fn).shape == (0, 3)
+    assert csvHandler.csv2array(fn, sniff=True).shape == (0, 3)
+    fn = writeFile(tmpdir, 'text.txt', "x\ty\tz\n1\t2\t3\n")
+    with pytest.raises(ValueError):
+        csvHandler.csv2array(fn)
+
+
+def test_csv2array_sameAsList(tmpdir):
+    ## Same coordinates as parsing the rows with csv2list
+    markers = np.random.RandomState(0).rand(1000, 3) * 1000
+    fn = str(tmpdir.join('markers.txt'))
+    np.savetxt(fn, markers, delimiter="\t")
+    desired = np.array(csvHandler.csv2list(fn, delimiter="\t")).astype(float)
+    assert np.array_equal(csvHandler.csv2array(fn, sniff=True), desired)
+
+
+def test_array2csv(tmpdir):
+    markers = np.random.RandomState(0).rand(100, 3) * 1000
+    markers[:10, 2] = 0
+    ## Same file as exporting the model (cells hold the coordinates as str(float))
+    model = QtGui.QStandardItemModel()
+    for row in markers.tolist():
+        model.appendRow([QtGui.QStandardItem(str(value)) for value in row])
+    for delimiter in ["\t", ","]:
+        fn = str(tmpdir.join('array.txt'))
+        csvHandler.array2csv(markers, fn, delimiter=delimiter)
+        fnModel = str(tmpdir.join('model.txt'))
+        csvHandler.model2csv(model, fnModel, delimiter=delimiter)
+        with open(fn) as f, open(fnModel) as fModel:
+            assert f.read() == fModel.read()
+        assert np.array_equal(csvHandler.csv2array(fn, delimiter=delimiter), markers)
+    ## No markers
+    csvHandler.array2csv(np.array([]), fn)
+    assert csvHandler.csv2array(fn).shape == (0, 3)
@@ -19,8 +19,10 @@
 # @Python_version	: 2.7.12
 """
 # ======================================================================================================================
+import pytest
 from tdct import stackProcessing
 import numpy as np
+import tifffile as tf
 
 stackProcessing.debug = False
 
@@ -31,6 +33,22 @@ def test_norm_img():
     assert np.testing.assert_array_equal(retArray, compArray) is None
 
 
+def test_norm_img_progress():
+    calcArray = np.ones([40,2,3,3], dtype='uint16')
+    calcArray[:,1] *= 5
+    calcArray[:,:,0,0] = 257
+    progress = []
+    retArray = stackProcessing.norm_img(calcArray, progress=progress.append, chunk=16)
+    assert retArray.dtype == calcArray.dtype
+    assert (retArray.max(axis=(-2,-1)) == 65535).all()
+    assert progress[-1] == 100
+    ## Cancel is checked between chunks
+    token = stackProcessing.CancelToken()
+    token.cancel()
+    with pytest.raises(stackProcessing.Cancelled):
+        stackProcessing.norm_img(calcArray, cancel=token)
+
+
 def test_pxSize(image_RGB, image_Grey):
     pixelSize = stackProcessing.pxSize(str(image_RGB),z=False)
     assert pixelSize == 123.
@@ -103,3 +121,22 @@ def test_interpolation():
     compArray[0] += 1
     retArray = stackProcessing.interpol(calcArray, 300., 100., "linear", showgraph=False)
     assert np.testing.assert_array_equal(retArray, compArray) is None
+
+
+def test_writeStack(tmpdir):
+    img = (np.arange(6*16*20) % 1000).reshape(6,16,20).astype('uint16')
+    fn = str(tmpdir.join('stack.tif'))
+    ## Pages from a generator, missing pages at the end are written as zeros
+    stackProcessing.writeStack(
+        fn, (page for page in img[:5]), shape=img.shape, dtype=img.dtype, pixelSize=0.1, focusStepSize=0.3,
+        compression='zlib')
+    with tf.TiffFile(fn) as tif:
+        assert tif.pages[0].compression == 8
+        assert np.testing.assert_array_equal(tif.asarray()[:5], img[:5]) is None
+        assert (tif.asarray()[5] == 0).all()
+    assert stackProcessing.pxSize(fn) == 0.1
+    assert stackProcessing.pxSize(fn, z=True) == 0.3
+    ## ImageJ hyperstack
+    stackProcessing.writeStack(fn, img, pixelSize=0.1, focusStepSize=0.3, imagej=True)
+    assert np.testing.assert_array_equal(tf.imread(fn), img) is None
+    assert stackProcessing.pxSize(fn, z=True) == 0.3
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+
+# @Title			: test_tiffMetadata
+# @Project			: 3DCTv2
+# @Description		: pytest test
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: pytest
+# @Notes			:
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+import os
+import numpy as np
+import tifffile as tf
+from tdct import tiffMetadata
+
+tiffMetadata.debug = False
+
+
+def test_read(image_RGB, image_Grey):
+    meta = tiffMetadata.read(str(image_RGB))
+    assert (meta.pixelSize, meta.pixelSizeKey) == (123., 'PhysicalSizeX')
+    assert (meta.focusStepSize, meta.focusStepSizeKey) == (456., 'FocusStepSize')
+    assert meta.feiPixelWidth is None
+    meta = tiffMetadata.read(str(image_Grey))
+    assert (meta.pixelSize, meta.pixelSizeKey) == (4.56e-006, 'PixelWidth')
+    assert meta.focusStepSize == 0.123
+
+
+def test_cache(tmpdir):
+    fn = str(tmpdir.join('img.tif'))
+    tf.imsave(fn, np.zeros((4, 8, 8), dtype='uint8'), metadata={"PhysicalSizeX": "1"})
+    meta = tiffMetadata.read(fn)
+    assert meta.pixelSize == 1.
+    assert tiffMetadata.read(fn) is meta
+    ## Rewritten file is parsed again
+    tf.imsave(fn, np.zeros((4, 8, 8), dtype='uint8'), metadata={"PhysicalSizeX": "22", "FocusStepSize": "3"})
+    os.utime(fn, ns=(meta.mtime + 10**9, meta.mtime + 10**9))
+    meta = tiffMetadata.read(fn)
+    assert (meta.pixelSize, meta.focusStepSize) == (22., 3.)
+
+
+def test_fei(tmpdir):
+    fn = str(tmpdir.join('img_FIB.tif'))
+    tf.imsave(
+        fn, np.zeros((8, 8), dtype='uint8'),
+        extratags=[(34682, 's', 0, "[User]\r\nUser=test\r\n[Scan]\r\nPixelWidth=1.5e-009\r\n", True)])
+    meta = tiffMetadata.read(fn)
+    assert meta.feiPixelWidth == 1.5e-009
+    assert (meta.pixelSize, meta.pixelSizeKey) == (1.5e-009, 'PixelWidth')
+    assert meta.focusStepSize is None
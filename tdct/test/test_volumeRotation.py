@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+
+# @Title			: test_volumeRotation
+# @Project			: 3DCTv2
+# @Description		: pytest test
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: pytest
+# @Notes			:
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+import numpy as np
+import tifffile as tf
+from scipy import ndimage
+from tdct import volumeRotation
+
+volumeRotation.debug = False
+
+
+def test_transformMip():
+    vol = np.zeros((40,60,80), dtype='uint16')
+    points = [(10,20,5),(70,50,30),(40,30,20)]
+    for x, y, z in points:
+        vol[z,y,x] = 1000
+    gl, d = volumeRotation.eulerTransform(-59.5, 77.8, 179.7, scale=1.2, translation=(100,60,0))
+    mip = volumeRotation.transformMip(vol, (gl, d), (150,150), slab=7, workers=3)
+    ## Beads end up at the correlated positions
+    for point in points:
+        x, y = np.rint(gl.dot(point) + d)[:2].astype(int)
+        assert mip[y-1:y+2, x-1:x+2].max() > 100
+    ## Rendering only the footprint of each slab gives the projection of the full transformed volume
+    zmin, zmax = volumeRotation.zRange(vol.shape, gl, d)
+    matrix, offset = volumeRotation.affineParameters(gl, d, (zmin,0,0))
+    reference = ndimage.affine_transform(
+        vol.astype('float32'), matrix, offset=offset, output_shape=(zmax-zmin,150,150), order=1).max(axis=0)
+    assert np.allclose(mip, reference, atol=1e-3)
+    assert volumeRotation.slabRegion(volumeRotation.corners(vol.shape, gl, d), zmax+1, zmax+5, (150,150)) is None
+    ## Slabs give the same volume as one affine_transform
+    matrix, offset = volumeRotation.affineParameters(gl, d, (0,0,0))
+    full = volumeRotation.transformVolume(vol, (gl, d), (60,70,90), slab=5, workers=2)
+    assert np.allclose(full, ndimage.affine_transform(
+        vol.astype('float32'), matrix, offset=offset, output_shape=(60,70,90), order=1), atol=1e-3)
+
+
+def test_rotate(tmpdir):
+    vol = np.zeros((40,60,80), dtype='uint16')
+    vol[20,30,40] = vol[10,10,10] = 1000
+    transf = volumeRotation.eulerTransform(30, 40, 50, scale=1.1, translation=(60,50,0))
+    fileout = str(tmpdir.join('vol'))
+    ## Lamella box around the first bead only
+    x, y = (transf[0].dot((40,30,20)) + transf[1])[:2]
+    images = volumeRotation.rotate(
+        vol, transf, shape=(120,120), fileout=fileout, lamella=[x-2,x+2,y-2,y+2],
+        transfSEM=volumeRotation.eulerTransform(10, 20, 30), shapeSEM=(90,90))
+    assert images['max'].shape == (80,80)
+    assert images['max_scale_shift'].shape == (120,120)
+    assert images['max_cut_SEM_scale_shift'].shape == (90,90)
+    assert tmpdir.join('vol_max_cut_SEM.tif').check()
+    assert (np.count_nonzero(images['max_cut_FIB_scale_shift']) < np.count_nonzero(images['max_scale_shift']))
+    ## The centered rotation keeps the volume center in the cube center
+    d, cube = volumeRotation.centered(vol.shape, transf[0]/1.1)
+    assert cube == (80,80,80)
+    assert np.allclose((transf[0]/1.1).dot((39.5,29.5,19.5)) + d, 39.5)
+
+
+def test_exportOverlay(tmpdir):
+    vol = (np.arange(10*20*30) % 97).reshape(10,20,30).astype('uint16')
+    transf = (np.identity(3), (5,3,0))
+    fn = str(tmpdir.join('overlay.tif'))
+    image = np.full((30,40), 7, dtype='uint8')
+    data = volumeRotation.exportOverlay(fn, [vol, vol*2], transf, image=image, projection='mean')
+    assert data.shape == (3,30,40)
+    assert np.testing.assert_array_equal(tf.imread(fn), data) is None
+    assert (data[0] == 7).all()
+    assert np.allclose(data[1,3:23,5:35], vol.mean(axis=0))
+    assert np.allclose(data[2,3:23,5:35], 2*vol.mean(axis=0))
+    assert (data[1,:3] == 0).all()
+    ## Slab projection of the output slices 2 to 4 only
+    slab = volumeRotation.transformProjection(vol, transf, (30,40), 'slab', depth=(2,4))
+    assert np.testing.assert_array_equal(slab[3:23,5:35], vol[2:5].max(axis=0)) is None
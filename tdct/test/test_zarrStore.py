@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+
+# @Title			: test_zarrStore
+# @Project			: 3DCTv2
+# @Description		: pytest test
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: pytest
+# @Notes			:
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+import pytest
+import numpy as np
+from tdct import zarrStore, beadPos
+
+pytest.importorskip('zarr')
+zarrStore.debug = False
+
+
+def test_write(tmpdir):
+    img = (np.arange(20*50*70) % 3000).reshape(20,50,70).astype('uint16')
+    fn = str(tmpdir.join('stack.zarr'))
+    ## Slices from a generator, missing slices at the end are written as zeros
+    progress = []
+    zarrStore.write(
+        fn, (page for page in img[:18]), shape=img.shape, dtype=img.dtype, pixelSize=0.1, focusStepSize=0.3,
+        chunks=(8,16,16), progress=progress.append, workers=4)
+    assert zarrStore.isZarr(fn)
+    level0 = zarrStore.read(fn)
+    assert level0.chunks == (8,16,16)
+    assert np.testing.assert_array_equal(level0[:18], img[:18]) is None
+    assert (level0[18:] == 0).all()
+    assert progress[-1] == 100
+    ## Resolution levels binned 2x2 in y,x down to about one chunk
+    level1 = zarrStore.read(fn, level=1)
+    assert level1.shape == (20,25,35)
+    assert np.testing.assert_array_equal(level1[:18], zarrStore.binXY(img[:18])) is None
+    assert zarrStore.read(fn, level=3).shape == (20,7,9)
+    datasets = zarrStore.zarr.open_group(fn, mode='r').attrs['multiscales'][0]['datasets']
+    assert datasets[1]['coordinateTransformations'][0]['scale'] == [0.3, 0.2, 0.2]
+
+
+def test_readSubVolume(tmpdir, testVolume):
+    fn = str(tmpdir.join('beads.zarr'))
+    zarrStore.write(fn, testVolume, chunks=(16,32,32))
+    vol, offset = zarrStore.readSubVolume(fn, 70, 20, 40, size=(10,10,10))
+    assert offset == (35,15,65)
+    assert np.testing.assert_array_equal(vol, testVolume[35:45,15:25,65:75]) is None
+    ## Clipped at the volume boundaries, all slices without z
+    vol, offset = zarrStore.readSubVolume(fn, 98, 2, size=(10,10,10))
+    assert offset == (0,0,93)
+    assert vol.shape == (100,7,7)
+    ## Bead fitting on the lazily opened store gives the same result as on the array
+    assert beadPos.getzGauss(70,20,fn) == beadPos.getzGauss(70,20,testVolume)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pixel size meta data of tiff images
+
+Only the tags of the first page are parsed, once per file. Results are cached and re-parsed only when the file's
+modification time or size changes.
+
+Usage:
+    from tdct import tiffMetadata
+    >>> meta = tiffMetadata.read('image_stack.tif')
+    >>> meta.pixelSize, meta.focusStepSize
+
+# @Title			: tiffMetadata
+# @Project			: 3DCTv2
+# @Description		: Pixel size meta data of tiff images
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: from tdct import tiffMetadata
+# 					: e.g.: >>> meta = tiffMetadata.read('image_stack.tif')
+# @Notes			: Keywords screened for in string tags are PhysicalSizeX, PixelWidth and PixelSize (xy) as well as
+# 					  PhysicalSizeZ and FocusStepSize (z), written by FEI CorrSight/LA and OME. Dual beam images are
+# 					  additionally read from the parsed FEI_HELIOS/FEI_SFEG tags.
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+
+import os
+import threading
+import tifffile as tf
+
+try:
+    from . import clrmsg
+    from . import TDCT_debug
+except:
+    pass
+
+debug = TDCT_debug.debug
+
+## Keywords in order of preference, the first match within a tag wins
+keywordsXY = ['PhysicalSizeX','PixelWidth','PixelSize']
+keywordsZ = ['PhysicalSizeZ','FocusStepSize']
+
+_cache = {}
+_cacheLock = threading.Lock()
+
+
+class TiffMetadata():
+    def __init__(self, path, mtime=None, size=None):
+        """
+        Pixel size information of one tiff file. Values are returned as stored in the file, i.e. in microns for
+        CorrSight/OME keys (PhysicalSizeX/Z, PixelSize, FocusStepSize) and in meters for PixelWidth (dual beam).
+
+        pixelSize:			xy pixel size or None
+        pixelSizeKey:		keyword the xy pixel size was found with
+        focusStepSize:		z step size or None
+        focusStepSizeKey:	keyword the z step size was found with
+        feiPixelWidth:		pixel width in meters from the FEI_HELIOS/FEI_SFEG tag or None
+        """
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.pixelSize = None
+        self.pixelSizeKey = None
+        self.focusStepSize = None
+        self.focusStepSizeKey = None
+        self.feiPixelWidth = None
+
+    def __repr__(self):
+        return "TiffMetadata({0}, pixelSize={1} ({2}), focusStepSize={3} ({4}), feiPixelWidth={5})".format(
+            self.path, self.pixelSize, self.pixelSizeKey, self.focusStepSize, self.focusStepSizeKey, self.feiPixelWidth)
+
+
+def read(path):
+    """Return the (cached) TiffMetadata of the tiff file at path"""
+    path = os.path.abspath(str(path))
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _cacheLock:
+        meta = _cache.get(path)
+    if meta is not None and (meta.path, meta.mtime, meta.size) == key:
+        return meta
+    meta = parse(path, mtime=stat.st_mtime_ns, size=stat.st_size)
+    with _cacheLock:
+        _cache[path] = meta
+    return meta
+
+
+def clearCache():
+    with _cacheLock:
+        _cache.clear()
+
+
+def parse(path, mtime=None, size=None):
+    """Parse the pixel size information from the tags of the first page (uncached, see read)"""
+    meta = TiffMetadata(path, mtime, size)
+    with tf.TiffFile(path) as tif:
+        tags = tif.pages[0].tags
+        for tag in tags.values():
+            if isinstance(tag.value, str):
+                if meta.pixelSize is None:
+                    meta.pixelSize, meta.pixelSizeKey = findValue(tag.value, keywordsXY)
+                if meta.focusStepSize is None:
+                    meta.focusStepSize, meta.focusStepSizeKey = findValue(tag.value, keywordsZ)
+        for name in ['FEI_HELIOS','FEI_SFEG']:
+            if name in tags and isinstance(tags[name].value, dict):
+                try:
+                    meta.feiPixelWidth = float(tags[name].value['Scan']['PixelWidth'])
+                    break
+                except (KeyError, TypeError, ValueError):
+                    pass
+        ## ImageJ hyperstacks store the z spacing in the description and the xy pixel size as resolution
+        if tif.is_imagej:
+            ijmeta = tif.imagej_metadata or {}
+            if meta.focusStepSize is None and 'spacing' in ijmeta:
+                meta.focusStepSize, meta.focusStepSizeKey = float(ijmeta['spacing']), 'spacing'
+            if meta.pixelSize is None and ijmeta.get('unit') in ['micron','um'] and 'XResolution' in tags:
+                numerator, denominator = tags['XResolution'].value
+                if numerator:
+                    meta.pixelSize, meta.pixelSizeKey = denominator/numerator, 'XResolution'
+    ## Recent tifffile versions parse the FEI tags into dicts, so PixelWidth is not found as string
+    if meta.pixelSize is None and meta.feiPixelWidth is not None:
+        meta.pixelSize, meta.pixelSizeKey = meta.feiPixelWidth, 'PixelWidth'
+    if debug is True: print(clrmsg.DEBUG + "Tiff meta data:", meta)
+    return meta
+
+
+def findValue(text, keywords):
+    """
+    Return (value, keyword) of the first keyword in text followed by a number, either quoted (e.g. xml/json:
+    PhysicalSizeX="0.123") or as key=value line (e.g. FEI: PixelWidth=4.56e-006). Returns (None, None) otherwise.
+    """
+    for keyword in keywords:
+        separator = '=' if keyword == 'PixelWidth' else '"'
+        pos = text.find(keyword)
+        while pos != -1:
+            for piece in text[pos:pos+30].split(separator):
+                try:
+                    return float(piece.strip().split('\r\n')[0].split(r'\r\n')[0]), keyword
+                except ValueError:
+                    pass
+            pos = text.find(keyword, pos+1)
+    return None, None
@@ -0,0 +1,411 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rotate the original light microscope volume into the frame of a correlated (e.g. FIB/SEM) image.
+
+The correlation transformation x' = s*q*x + d (Rigid3D/Affine from correlation.main, x = voxel coordinates [x,y,z])
+is applied with scipy.ndimage.affine_transform. The output volume is computed in slabs of z slices by a thread
+pool, so only a few slabs are held in memory at a time, and maximum intensity projections (MIPs) are reduced slab
+by slab without ever holding the rotated volume.
+
+Since s and d are part of the transformation, the "scale_shift" MIPs are rendered directly in the pixel grid of the
+correlated image instead of scaling (imresize) and shifting (tom_shift) the MIP of the rotated volume afterwards.
+
+Usage:
+    from tdct import volumeRotation
+    >>> images = volumeRotation.rotate(vol, transf, shape=fibImage.shape, fileout='/path/to/dir/filename')
+
+# @Title			: volumeRotation
+# @Project			: 3DCTv2
+# @Description		: Rotate original light microscope volume
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			: Florian Beck, Max-Planck-Institute of Biochemistry (MATLAB tom_rotate workflow)
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: from tdct import volumeRotation
+# 					: e.g.: >>> images = volumeRotation.rotate(vol, transf, shape=fibImage.shape, fileout='filename')
+# @Notes			: Replaces the MATLAB script generated by matlab3Drotation (tom_rotate, tom_shift, imresize, quadvol)
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+
+import os
+import collections
+import numpy as np
+import tifffile as tf
+from scipy import ndimage
+from concurrent.futures import ThreadPoolExecutor
+from pyto.rigid_3d import Rigid3D
+
+try:
+    from . import clrmsg
+    from . import TDCT_debug
+    from . import stackProcessing
+except:
+    pass
+
+debug = TDCT_debug.debug
+
+
+def eulerTransform(phi, theta, psi, scale=1., translation=(0,0,0)):
+    """
+    Linear part (s*q) and translation of the transformation given by Euler angles in degrees (pyto 'x' mode, i.e.
+    extrinsic rotations around z by phi, x by theta and z by psi). Note that the results file lists the angles in
+    the order phi, psi, theta.
+    """
+    q = Rigid3D.make_r_euler(np.radians([phi, theta, psi]), mode='x')
+    return scale*q, np.asarray(translation, dtype=float)
+
+
+def transformParameters(transf):
+    """Linear part and translation of a Rigid3D/Affine transformation or of a (gl, d) tuple"""
+    if isinstance(transf, (tuple, list)):
+        gl, d = transf
+    else:
+        gl, d = transf.getGlD()
+    gl = np.asarray(gl, dtype=float)
+    d = np.zeros(3) if d is None else np.asarray(d, dtype=float).ravel()
+    if gl.shape != (3,3) or d.shape != (3,):
+        raise ValueError("I need a 3D transformation, got gl {0} and d {1}".format(gl.shape, d.shape))
+    return gl, d
+
+
+def centered(volShape, gl):
+    """
+    Translation rotating the volume (z,y,x) around its center into a cube with the edge length of the volume's
+    longest dimension (like MATLAB quadvol + tom_rotate). Returns the translation and the cube's shape.
+    """
+    size = max(volShape)
+    center = (np.array(volShape[::-1], dtype=float)-1)/2
+    d = (size-1)/2. - np.asarray(gl).dot(center)
+    return d, (size, size, size)
+
+
+## Corners of a box indexed by the bits x,y,z, edges connect corners differing in one bit
+edges = [(i, i | bit) for i in range(8) for bit in [1,2,4] if not i & bit]
+
+
+def corners(volShape, gl, d):
+    """Output coordinates (x,y,z) of the 8 corners of the transformed volume (z,y,x), 3x8"""
+    bits = np.array([[(i >> 2) & 1, (i >> 1) & 1, i & 1] for i in range(8)]).T
+    box = bits * (np.array(volShape[::-1])-1)[:,np.newaxis]
+    return np.asarray(gl).dot(box) + np.asarray(d)[:,np.newaxis]
+
+
+def zRange(volShape, gl, d):
+    """First and last+1 output z slice covered by the transformed volume (z,y,x)"""
+    z = corners(volShape, gl, d)[2]
+    return int(np.floor(z.min())), int(np.ceil(z.max()))+1
+
+
+def zLimits(volShape, gl, d, depth=None):
+    """Output z range covered by the transformed volume (see zRange), restricted to depth (z start, z end)"""
+    zmin, zmax = zRange(volShape, gl, d)
+    if depth is not None:
+        zmin, zmax = max(zmin, int(np.floor(depth[0]))), min(zmax, int(np.ceil(depth[1]))+1)
+    return zmin, zmax
+
+
+def slabRegion(points, z0, z1, shape):
+    """
+    Output region (y start, y end, x start, x end) of the slices z0 to z1 (inclusive) covered by the transformed
+    volume given by its corners (see corners), with a margin of one pixel for the interpolation and clipped to
+    shape (y,x). Returns None if the slices do not intersect the volume.
+
+    The intersection of the box with the slab is the convex hull of the corners within the slab and the crossings
+    of the box edges with the planes z0 and z1, so these points give the exact footprint.
+    """
+    inside = [points[:2,i] for i in range(8) if z0 <= points[2,i] <= z1]
+    for a, b in edges:
+        za, zb = points[2,a], points[2,b]
+        for plane in [z0, z1]:
+            if za != zb and min(za, zb) <= plane <= max(za, zb):
+                inside.append(points[:2,a] + (points[:2,b]-points[:2,a])*(plane-za)/(zb-za))
+    if not inside:
+        return None
+    inside = np.array(inside)
+    x0, y0 = np.floor(inside.min(axis=0)).astype(int) - 1
+    x1, y1 = np.ceil(inside.max(axis=0)).astype(int) + 2
+    y0, y1, x0, x1 = max(y0, 0), min(y1, shape[0]), max(x0, 0), min(x1, shape[1])
+    if y0 >= y1 or x0 >= x1:
+        return None
+    return y0, y1, x0, x1
+
+
+def affineParameters(gl, d, origin):
+    """
+    Matrix and offset for scipy.ndimage.affine_transform (index order z,y,x) computing the output voxels starting at
+    the output index origin (z,y,x) for the transformation x' = gl*x + d (coordinate order x,y,z).
+    """
+    inverse = np.linalg.inv(gl)
+    matrix = inverse[::-1, ::-1]
+    offset = matrix.dot(origin) - inverse.dot(d)[::-1]
+    return matrix, offset
+
+
+def transformSlabs(vol, transf, shape, order=1, slab=16, workers=None, cancel=None, depth=None):
+    """
+    Generator of (z, (y, x), slab) of the transformed volume in the output grid shape (z,y,x), z,y,x is the index of
+    the first voxel of the slab. Each slab only covers the footprint of the transformed volume within its slices (see
+    slabRegion), slabs without any voxel of the volume are skipped, so no padded or rotated cube is ever allocated.
+    Slabs are computed by a thread pool (scipy releases the GIL), at most two per worker are held in memory. Voxels
+    outside the input volume are 0, slabs are float32.
+
+    shape:		output shape (z,y,x) or (y,x). For (y,x) only the slices covered by the transformed volume are computed
+                and z is relative to the first covered slice.
+    order:		spline interpolation order (0-5)
+    cancel:		callable raising an exception to stop (e.g. stackProcessing.Progress.check), checked per slab
+    depth:		(z start, z end) output slices to compute for an output shape (y,x), None for all covered slices
+    """
+    gl, d = transformParameters(transf)
+    if len(shape) == 2:
+        zmin, zmax = zLimits(vol.shape, gl, d, depth)
+        shape = (max(0, zmax-zmin),) + tuple(shape)
+    else:
+        zmin = 0
+    if order > 1:
+        ## Prefilter once instead of per slab
+        vol = ndimage.spline_filter(vol, order=order, output=np.float32)
+    workers = workers or os.cpu_count() or 1
+    points = corners(vol.shape, gl, d)
+    if debug is True: print(clrmsg.DEBUG + "Transforming volume {0} -> {1} | slab: {2} | workers: {3}".format(
+        vol.shape, shape, slab, workers))
+
+    def compute(z, depth, region):
+        y0, y1, x0, x1 = region
+        matrix, offset = affineParameters(gl, d, (zmin+z, y0, x0))
+        return ndimage.affine_transform(
+            vol, matrix, offset=offset, output_shape=(depth, y1-y0, x1-x0), output=np.float32,
+            order=order, mode='constant', cval=0., prefilter=False)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for z in range(0, shape[0], slab):
+            if cancel: cancel()
+            depth = min(slab, shape[0]-z)
+            region = slabRegion(points, zmin+z, zmin+z+depth-1, shape[1:])
+            if region is None:
+                continue
+            pending.append((z, region, executor.submit(compute, z, depth, region)))
+            if len(pending) >= 2*workers:
+                z, region, future = pending.popleft()
+                yield z, region[::2], future.result()
+        while pending:
+            z, region, future = pending.popleft()
+            yield z, region[::2], future.result()
+
+
+def transformMip(vol, transf, shape, order=1, slab=16, workers=None, progress=None, cancel=None):
+    """
+    Maximum intensity projection along z of the transformed volume in the output grid shape (y,x), e.g. the shape
+    of the correlated image with transf = correlation_results[0]. The projection is rendered directly slab by slab
+    along the view direction, memory use is bounded by the slabs in flight (see transformSlabs).
+    """
+    return transformProjection(vol, transf, shape, 'max', None, order, slab, workers, progress, cancel)
+
+
+def transformProjection(
+        vol, transf, shape, projection='max', depth=None, order=1, slab=16, workers=None, progress=None, cancel=None):
+    """
+    Projection along z of the transformed volume in the output grid shape (y,x), see transformMip.
+
+    projection:		'max' for the maximum intensity projection, 'mean' for the average of the voxels along z that
+                    are within the volume, 'slab' for the maximum intensity projection of the output slices depth only
+    depth:			(z start, z end) output slices for 'slab', e.g. the depth of the lamella in the correlated frame
+    """
+    if projection not in ['max','mean','slab']:
+        raise ValueError("Unknown projection '{0}', use 'max', 'mean' or 'slab'".format(projection))
+    if projection == 'slab' and depth is None:
+        raise ValueError("Slab projections need the depth (z start, z end)")
+    progress = stackProcessing.Progress.wrap(progress, cancel)
+    gl, d = transformParameters(transf)
+    depth = depth if projection == 'slab' else None
+    zmin, zmax = zLimits(vol.shape, gl, d, depth)
+    if projection == 'mean':
+        projected = np.zeros(shape, dtype=np.float64)
+    else:
+        projected = np.zeros(shape, dtype=np.float32)
+    for z, (y, x), data in transformSlabs(vol, (gl, d), shape, order, slab, workers, progress.check, depth):
+        region = projected[y:y+data.shape[1], x:x+data.shape[2]]
+        if projection == 'mean':
+            region += data.sum(axis=0)
+        else:
+            np.maximum(region, data.max(axis=0), out=region)
+        progress((z+data.shape[0])*100/max(1, zmax-zmin))
+    if projection == 'mean':
+        count = rayCount(vol.shape, gl, d, shape)
+        projected = np.divide(projected, count, out=np.zeros(shape), where=count > 0).astype(np.float32)
+    progress(100)
+    return projected
+
+
+def rayCount(volShape, gl, d, shape, rows=256):
+    """
+    Number of output slices along z in which each pixel of the output grid shape (y,x) lies within the transformed
+    volume (z,y,x). Computed analytically from the ray through each pixel, in blocks of rows.
+    """
+    inverse = np.linalg.inv(gl)
+    upper = np.array(volShape[::-1], dtype=float) - 1
+    x = np.arange(shape[1], dtype=float)[np.newaxis, :]
+    count = np.zeros(shape, dtype=np.int64)
+    for y0 in range(0, shape[0], rows):
+        y = np.arange(y0, min(y0+rows, shape[0]), dtype=float)[:, np.newaxis]
+        low = np.full((y.shape[0], x.shape[1]), -np.inf)
+        high = np.full((y.shape[0], x.shape[1]), np.inf)
+        for axis in range(3):
+            ## Input coordinate along the ray: a + b*z
+            a = inverse[axis,0]*(x-d[0]) + inverse[axis,1]*(y-d[1]) - inverse[axis,2]*d[2]
+            b = inverse[axis,2]
+            if b == 0:
+                outside = (a < 0) | (a > upper[axis])
+                low[np.broadcast_to(outside, low.shape)] = np.inf
+            else:
+                bounds = np.sort([-a/b, (upper[axis]-a)/b], axis=0)
+                np.maximum(low, bounds[0], out=low)
+                np.minimum(high, bounds[1], out=high)
+        ## Small tolerance for voxels exactly on the volume boundary
+        count[y0:y0+y.shape[0]] = np.maximum(0, np.floor(high+1e-9) - np.ceil(low-1e-9) + 1)
+    return count
+
+
+def exportOverlay(
+        path, channels, transf, shape=None, image=None, projection='max', depth=None, order=1, slab=16, workers=None,
+        progress=None, cancel=None):
+    """
+    Project light microscope channels into the pixel grid of the correlated image and save them as multichannel
+    ImageJ tiff (c,y,x, float32) aligned with the image, e.g. for overlays of the fluorescence signal on the FIB image.
+
+    channels:		(z,y,x) stack or list of stacks, one per channel
+    transf:			correlation_results[0] (Rigid3D from correlation.main) or (gl, d)
+    shape:			(y,x) shape of the correlated image, None for the shape of image
+    image:			correlated 2D image, saved as first channel if given (RGB images are converted to gray scale)
+    projection:		'max', 'mean' or 'slab' with depth (z start, z end), see transformProjection
+    Returns the saved (c,y,x) array.
+    """
+    progress = stackProcessing.Progress.wrap(progress, cancel)
+    if isinstance(channels, np.ndarray) and channels.ndim == 3:
+        channels = [channels]
+    if shape is None:
+        if image is None:
+            raise ValueError("I need the shape of the correlated image or the image itself")
+        shape = image.shape[:2]
+    shape = tuple(shape[:2])
+    data = []
+    if image is not None:
+        image = np.asarray(image, dtype=np.float32)
+        data.append((image.mean(axis=2) if image.ndim == 3 else image)[:shape[0], :shape[1]])
+    for i, vol in enumerate(channels):
+        data.append(transformProjection(
+            vol, transf, shape, projection, depth, order, slab, workers,
+            progress.sub(100*i/len(channels), 100*(i+1)/len(channels))))
+    data = np.stack(data)
+    tf.imwrite(path, data, imagej=True, metadata={'axes': 'CYX', 'mode': 'composite'})
+    if debug is True: print(clrmsg.DEBUG + "Saved correlated overlay:", path, data.shape)
+    progress(100)
+    return data
+
+
+def transformVolume(vol, transf, shape, out=None, order=1, slab=16, workers=None, progress=None, cancel=None):
+    """
+    Transformed volume in the output grid shape (z,y,x). out can be any array supporting slice assignment (e.g. a
+    numpy.memmap or zarr array filled with zeros) to keep the result out of memory, otherwise a float32 array is
+    returned. Only the voxels covered by the transformed volume are written.
+    """
+    progress = stackProcessing.Progress.wrap(progress, cancel)
+    if out is None:
+        out = np.zeros(shape, dtype=np.float32)
+    for z, (y, x), data in transformSlabs(vol, transf, shape, order, slab, workers, progress.check):
+        out[z:z+data.shape[0], y:y+data.shape[1], x:x+data.shape[2]] = data
+        progress((z+data.shape[0])*100/shape[0])
+    progress(100)
+    return out
+
+
+def cutLamella(vol, transf, box, slab=16):
+    """
+    Copy of the volume (z,y,x) with all voxels set to 0 that are not projected into the lamella box
+    [x start, x end, y start, y end] (pixel coordinates of the correlated image) by transf.
+    """
+    gl, d = transformParameters(transf)
+    x0, x1, y0, y1 = box
+    x = np.arange(vol.shape[2])[np.newaxis, np.newaxis, :]
+    y = np.arange(vol.shape[1])[np.newaxis, :, np.newaxis]
+    cut = np.zeros_like(vol)
+    for z0 in range(0, vol.shape[0], slab):
+        z = np.arange(z0, min(z0+slab, vol.shape[0]))[:, np.newaxis, np.newaxis]
+        px = gl[0,0]*x + gl[0,1]*y + gl[0,2]*z + d[0]
+        py = gl[1,0]*x + gl[1,1]*y + gl[1,2]*z + d[1]
+        inside = (px >= x0) & (px < x1) & (py >= y0) & (py < y1)
+        np.copyto(cut[z0:z0+inside.shape[0]], vol[z0:z0+inside.shape[0]], where=inside)
+    return cut
+
+
+def norm(img):
+    """Scale to 0-1 (like MATLAB tom_norm(img,1))"""
+    img = np.asarray(img, dtype=np.float32)
+    span = img.max() - img.min()
+    return (img - img.min())/span if span else np.zeros_like(img)
+
+
+def rotate(
+        vol, transf, shape=None, fileout=None, lamella=None, transfSEM=None, shapeSEM=None, order=1, slab=16,
+        workers=None, progress=None, cancel=None):
+    """
+    Rotate the volume (z,y,x) with the correlation transformation and compute the MIPs of the MATLAB rotation
+    script. Returns a dict of images normalized to 0-1, saved as 8 bit tiffs fileout + '_<name>.tif' if fileout
+    is given:
+
+    max							MIP of the volume rotated around its center (cube of the longest volume dimension)
+    max_scale_shift				MIP in the pixel grid of the correlated image (rotation, scale and shift)
+
+    With lamella = [x start, x end, y start, y end] (pixel coordinates of the correlated image) the volume is cut to
+    the voxels projected into the lamella box first:
+
+    max_cut_FIB					MIP of the cut volume rotated around its center
+    max_cut_FIB_scale_shift		MIP of the cut volume in the pixel grid of the correlated image
+
+    and with a second correlation transfSEM (e.g. SEM image of the same lamella) additionally:
+
+    max_cut_SEM					MIP of the cut volume rotated around its center with the rotation of transfSEM
+    max_cut_SEM_scale_shift		MIP of the cut volume in the pixel grid of the second image
+
+    transf, transfSEM:	Rigid3D/Affine from correlation.main or (gl, d), see eulerTransform
+    shape, shapeSEM:	(y,x) shape of the correlated images, None for the volume's y,x shape
+    order:				spline interpolation order (0-5)
+    slab:				number of output slices computed per task
+    workers:			number of threads, None for the number of CPUs
+    progress:			callable(percent), e.g. stackProcessing.Progress which also handles cancelling
+    """
+    progress = stackProcessing.Progress.wrap(progress, cancel)
+    gl, d = transformParameters(transf)
+    shape = tuple(shape or vol.shape[1:])
+    jobs = [('max', vol, gl, None, None), ('max_scale_shift', vol, gl, d, shape)]
+    if lamella is not None:
+        jobs += [('max_cut_FIB', None, gl, None, None), ('max_cut_FIB_scale_shift', None, gl, d, shape)]
+        if transfSEM is not None:
+            glSEM, dSEM = transformParameters(transfSEM)
+            shapeSEM = tuple(shapeSEM or vol.shape[1:])
+            jobs += [('max_cut_SEM', None, glSEM, None, None), ('max_cut_SEM_scale_shift', None, glSEM, dSEM, shapeSEM)]
+    cut = None
+    images = {}
+    for i, (name, data, glJob, dJob, shapeJob) in enumerate(jobs):
+        if data is None:
+            if cut is None:
+                cut = cutLamella(vol, (gl, d), lamella, slab)
+            data = cut
+        if dJob is None:
+            ## Centered projections are rotation only, like tom_rotate
+            glJob = glJob/np.cbrt(abs(np.linalg.det(glJob)))
+            dJob, cube = centered(data.shape, glJob)
+            shapeJob = cube[1:]
+        images[name] = norm(transformMip(
+            data, (glJob, dJob), shapeJob, order, slab, workers, progress.sub(100*i/len(jobs), 100*(i+1)/len(jobs))))
+        if fileout:
+            tf.imwrite(fileout + '_' + name + '.tif', np.round(images[name]*255).astype(np.uint8))
+        if debug is True: print(clrmsg.DEBUG + "Rotated volume MIP:", name, images[name].shape)
+    progress(100)
+    return images
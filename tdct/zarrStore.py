@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Chunked, multiscale Zarr directory stores for image stacks (z,y,x)
+
+The layout follows OME-NGFF 0.4 (resolution levels "0", "1", ... binned 2x2 in y,x, multiscales meta data), so the
+stores can be opened in napari and other viewers. Reading is lazy: only the chunks touched by a slice are loaded.
+
+Usage:
+    from tdct import zarrStore
+    >>> zarrStore.write('stack.zarr', img, pixelSize=0.1, focusStepSize=0.3)
+    >>> vol, offset = zarrStore.readSubVolume('stack.zarr', x, y, z)
+
+# @Title			: zarrStore
+# @Project			: 3DCTv2
+# @Description		: Chunked, multiscale Zarr directory stores for image stacks
+# @Author			: Jan Arnold
+# @Email			: jan.arnold (at) coraxx.net
+# @Copyright		: Copyright (C) 2016  Jan Arnold
+# @License			: GPLv3 (see LICENSE file)
+# @Credits			:
+# @Date				: 2021/04
+# @Version			: 3DCT 3.0.0 module rev. 1
+# @Status			: stable
+# @Usage			: from tdct import zarrStore
+# 					: e.g.: >>> zarrStore.write('stack.zarr', img, pixelSize=0.1, focusStepSize=0.3)
+# @Notes			: Needs zarr (pip install zarr), local file system stores only
+# @Python_version	: 3.8.9
+"""
+# ======================================================================================================================
+
+import os
+import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from . import clrmsg
+    from . import TDCT_debug
+except:
+    pass
+## Optional dependency, only needed when Zarr stores are used
+try:
+    import zarr
+    from numcodecs import Blosc
+except ImportError:
+    zarr = None
+
+debug = TDCT_debug.debug
+
+
+def checkZarr():
+    if zarr is None:
+        raise ImportError("Zarr stores need the zarr package, e.g.: pip install zarr")
+
+
+def isZarr(path):
+    """True if path is a Zarr directory store"""
+    return isinstance(path, str) and os.path.isdir(path) and (
+        os.path.isfile(os.path.join(path, '.zgroup')) or os.path.isfile(os.path.join(path, '.zarray')))
+
+
+def write(
+        path, data, shape=None, dtype=None, pixelSize=None, focusStepSize=None, chunks=(16,256,256), levels=None,
+        compression='zstd', workers=None, progress=None):
+    """
+    Write an image stack (z,y,x) as chunked, multiscale Zarr directory store.
+
+    data:			numpy array or iterable yielding the 2D slices (y,x) in order. Iterables need shape and dtype.
+                    Missing slices at the end of an iterable are filled with zeros.
+    pixelSize:		xy pixel size in microns
+    focusStepSize:	z step size in microns
+    chunks:			chunk size (z,y,x). Slices are collected to slabs of chunks[0] slices, each slab is written
+                    (all resolution levels) in parallel while the next one is collected.
+    levels:			number of resolution levels, None for binning down to about one chunk in y,x
+    compression:	Blosc compressor ('zstd', 'lz4', 'zlib') or None
+    workers:		number of threads writing chunks, None for the number of CPUs
+    progress:		callable(percent), e.g. stackProcessing.Progress which also handles cancelling
+    """
+    checkZarr()
+    if isinstance(data, np.ndarray):
+        shape, dtype = data.shape, data.dtype
+    if len(shape) != 3:
+        raise ValueError("I can only write z,y,x stacks to Zarr stores, not the shape {0}".format(shape))
+    shape = tuple(int(i) for i in shape)
+    dtype = np.dtype(dtype)
+    chunks = tuple(min(chunk, size) for chunk, size in zip(chunks, shape))
+    if levels is None:
+        levels = 1 + max(0, int(math.ceil(math.log2(max(shape[1]/chunks[1], shape[2]/chunks[2])))))
+    compressor = Blosc(cname=compression, clevel=5, shuffle=Blosc.SHUFFLE) if compression else None
+
+    root = zarr.open_group(path, mode='w')
+    arrays = []
+    levelShape = shape
+    for level in range(levels):
+        arrays.append(root.create_dataset(
+            str(level), shape=levelShape, chunks=chunks, dtype=dtype, compressor=compressor, dimension_separator='/'))
+        levelShape = (shape[0], (levelShape[1]+1)//2, (levelShape[2]+1)//2)
+    root.attrs['multiscales'] = [{
+        'version': '0.4',
+        'name': os.path.splitext(os.path.basename(os.path.normpath(path)))[0],
+        'axes': [{'name': axis, 'type': 'space', 'unit': 'micrometer'} for axis in 'zyx'],
+        'datasets': [{
+            'path': str(level),
+            'coordinateTransformations': [{
+                'type': 'scale',
+                'scale': [focusStepSize or 1., (pixelSize or 1.)*2**level, (pixelSize or 1.)*2**level]}]}
+            for level in range(levels)]}]
+    if pixelSize: root.attrs['PixelSize'] = pixelSize
+    if focusStepSize: root.attrs['FocusStepSize'] = focusStepSize
+    if debug is True: print(clrmsg.DEBUG + "Writing Zarr store {0} | shape: {1} | chunks: {2} | levels: {3}".format(
+        path, shape, chunks, levels))
+
+    def writeSlab(z, slab):
+        futures = []
+        for level, array in enumerate(arrays):
+            if level > 0:
+                slab = binXY(slab)
+            ## One task per chunk row, tasks never share a chunk
+            for y in range(0, array.shape[1], chunks[1]):
+                futures.append(executor.submit(
+                    array.__setitem__, (slice(z, z+slab.shape[0]), slice(y, y+chunks[1])), slab[:, y:y+chunks[1]]))
+        return futures
+
+    slices = iter(data)
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for z in range(0, shape[0], chunks[0]):
+            slab = np.zeros((min(chunks[0], shape[0]-z),)+shape[1:], dtype=dtype)
+            for i in range(slab.shape[0]):
+                img = next(slices, None)
+                if img is None:
+                    break
+                slab[i] = img
+            ## Keep at most one slab in flight: wait for the previous one before submitting the next
+            for future in pending:
+                future.result()
+            pending = writeSlab(z, slab)
+            if progress: progress((z+slab.shape[0])*100/shape[0])
+        for future in pending:
+            future.result()
+
+
+def binXY(img):
+    """2x2 binning (mean) in y,x of a z,y,x stack. Odd sizes are padded by repeating the last row/column."""
+    if img.shape[1] % 2 or img.shape[2] % 2:
+        img = np.pad(img, ((0,0),(0,img.shape[1] % 2),(0,img.shape[2] % 2)), mode='edge')
+    binned = img.reshape(img.shape[0], img.shape[1]//2, 2, img.shape[2]//2, 2).mean(axis=(2,4))
+    if img.dtype.kind in 'iu':
+        binned = np.rint(binned)
+    return binned.astype(img.dtype)
+
+
+def read(path, level=0):
+    """Open a resolution level of a Zarr store (or a plain Zarr array) without reading any data"""
+    checkZarr()
+    store = zarr.open(path, mode='r')
+    if isinstance(store, zarr.Array):
+        return store
+    datasets = [dataset['path'] for dataset in store.attrs.get('multiscales', [{}])[0].get('datasets', [])]
+    return store[datasets[level] if datasets else str(level)]
+
+
+def readSubVolume(img, x, y, z=None, size=(16,32,32), level=0):
+    """
+    Sub-volume of size (z,y,x) around the pixel position x,y(,z), clipped to the image boundaries. Only the chunks
+    within the sub-volume are read. Without z all slices are returned.
+
+    img:	path to a Zarr store, zarr array or numpy.ndarray
+    Returns the sub-volume and the offset (z,y,x) of its first voxel.
+    """
+    if isinstance(img, str):
+        img = read(img, level)
+    center = [z, y, x]
+    offset, region = [], []
+    for axis in range(3):
+        if center[axis] is None:
+            start, stop = 0, img.shape[axis]
+        else:
+            start = int(round(center[axis])) - size[axis]//2
+            start, stop = max(0, start), min(img.shape[axis], start + size[axis])
+        offset.append(start)
+        region.append(slice(start, stop))
+    return np.asarray(img[tuple(region)]), tuple(offset)